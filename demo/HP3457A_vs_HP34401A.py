@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 from labequipment.device.DMM.HP3457A import HP3457A, acdc, TriggerType, Terminals
 from labequipment.device.DMM.HP34401A import HP34401A
 from labequipment.device.PSU.HP6632B import HP6632B
+from labequipment.framework.readingbuffer import ReadingBuffer
 from labequipment.framework.log import setup_custom_logger
 setup_custom_logger()
 
@@ -47,11 +48,12 @@ def main():
     hp3457a.configure_voltage(ac_dc_mode=acdc.DC, meas_range=3)
     hp3457a.configure_trigger(TriggerType.single)
     # TODO: implement hp34401a configure volt.
-    voltages = []
+    voltages = ReadingBuffer()  # channel 0: HP3457A, channel 1: HP34401A
     for i in range(50):
-        voltages.append([float(hp3457a.single_trigger_and_get_value()), hp34401a.voltage(meas_range=3)])
+        voltages.append(time.time(), float(hp3457a.single_trigger_and_get_value()), channel=0)
+        voltages.append(time.time(), hp34401a.voltage(meas_range=3), channel=1)
 
-    print(voltages)
+    print([v for v in voltages])
 
     psu.disable_output()
 
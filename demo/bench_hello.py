@@ -0,0 +1,23 @@
+import sys
+
+from labequipment.framework.registry import Bench
+from labequipment.framework.log import setup_custom_logger
+setup_custom_logger()
+
+
+def main(path: str):
+    bench = Bench.from_file(path)
+    print(f"Bench instruments: {bench.names()}")
+
+    # Only the PSU and the DMM are constructed and connected, the generator driver is never imported
+    psu = bench["psu"]
+    dmm = bench["dmm"]
+    psu.set_voltage(5.0, 1)
+    psu.enable_output(1)
+    print(f"PSU output: {psu.get_measured_voltage(1)} V, DMM: {dmm.voltage()}")
+    print(f"Connected: {list(bench.connected())}")
+    bench.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "bench.toml")
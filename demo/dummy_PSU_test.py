@@ -21,7 +21,7 @@ def test():
     psu.set_current(0.1, 3)
 
     print("ENABLE ALL")
-    psu.enableAllOutputs()
+    psu.enable_outputs()
 
     time.sleep(0.5)
     print_info(psu)
@@ -33,7 +33,7 @@ def test():
     print_info(psu)
 
     print("DISABLE ALL")
-    psu.disableAllOutputs()
+    psu.enable_outputs([False] * psu.num_outputs)
 
     time.sleep(0.5)
     print_info(psu)
@@ -45,7 +45,7 @@ def test():
     print_info(psu)
 
     print("ENABLE ALL")
-    psu.enableAllOutputs()
+    psu.enable_outputs()
 
     time.sleep(0.5)
     print_info(psu)
@@ -0,0 +1,21 @@
+import sys
+
+from labequipment.utils.measurement_plan import MeasurementPlan, compile_plan, run_schedule
+from labequipment.utils.timing_model import predict
+from labequipment.framework.log import setup_custom_logger
+setup_custom_logger()
+
+
+def main(path: str):
+    plan = MeasurementPlan.from_toml(path)
+    schedule = compile_plan(plan)
+    print("Schedule:")
+    for step in schedule.steps:
+        print(f"  {step}")
+    print(predict(plan))
+    results = run_schedule(schedule)
+    print(results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "measurement_plan.toml")
@@ -0,0 +1,27 @@
+import time
+from labequipment.device.PSU import dummyPSU
+from labequipment.utils.poller import OverrunPolicy, PeriodicPoller
+
+from labequipment.framework.log import setup_custom_logger
+
+setup_custom_logger()
+
+
+def test():
+    psu = dummyPSU.dummyPSU(output_states=[1, 1], get_voltages=[5.0, 12.0], count_type=1)
+    psu.connect()
+
+    poller = PeriodicPoller()
+    # Sample both outputs every 0.5s, the slow job does not shift these sampling instants
+    poller.add_job("outputs", lambda: print(psu.measure_outputs()), interval=0.5)
+    poller.add_job("slow", lambda: time.sleep(1.5), interval=1.0, policy=OverrunPolicy.SKIP)
+    poller.start()
+    time.sleep(5)
+    poller.stop()
+
+    for name, stats in poller.get_stats().items():
+        print(f"{name}: {stats}")
+
+
+if __name__ == "__main__":
+    test()
@@ -1,5 +1,9 @@
+from array import array
 from enum import IntEnum, Enum
-from math import trunc
+from math import trunc, log10
+from typing import Any, Callable, Sequence
+import statistics
+import time
 
 from labequipment.device.connection import USBTMCConnection, DummyConnection
 from labequipment.device.AWG import AWG
@@ -21,6 +25,9 @@ class VoltageUnits(Enum):
     VOLT = "VL"
 
 
+_FREQ_UNIT_FACTORS = {FreqUnits.MEGAHERTZ: 1E6, FreqUnits.KILOHERTZ: 1E3, FreqUnits.HERTZ: 1}
+
+
 class AmplitudeInputUnit(IntEnum):
     VOLTS = 0
     DECIBELS = 1
@@ -94,6 +101,137 @@ def _convert_volt_units(v: float) -> (float, VoltageUnits):
     return v_conv, v_unit
 
 
+class HopList:
+    """
+    Precompiled frequency hop list (see MARCONI_2019.compile_hop_list)
+    """
+
+    def __init__(self, frequencies: list[float], commands: list[str]):
+        self.frequencies = frequencies  # frequencies after truncation to the instrument resolution
+        self.commands = commands
+
+    def __len__(self):
+        return len(self.commands)
+
+
+class HopResult:
+    """
+    Per-hop record of a hop list run (times in s relative to the start of the run)
+    """
+
+    def __init__(self, dwell: float):
+        self.dwell = dwell
+        self.frequencies = array('d')
+        self.planned = array('d')
+        self.timestamps = array('d')  # time the CF command was written
+        self.values = []  # callback results
+
+    def append(self, frequency: float, planned: float, timestamp: float, value: Any = None):
+        self.frequencies.append(frequency)
+        self.planned.append(planned)
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+
+    def delays(self) -> list[float]:
+        """
+        Actual minus planned hop time per hop
+        """
+        return [t - p for t, p in zip(self.timestamps, self.planned)]
+
+    def dwell_times(self) -> list[float]:
+        """
+        Actual dwell time per channel (time between consecutive hops)
+        """
+        return [b - a for a, b in zip(self.timestamps, self.timestamps[1:])]
+
+    def jitter(self) -> dict:
+        """
+        Dwell time statistics
+        :return:  dict with mean, std, min and max dwell time and max. delay in s
+        """
+        dwells = self.dwell_times()
+        if not dwells:
+            return {}
+        return {"mean": statistics.fmean(dwells), "std": statistics.pstdev(dwells), "min": min(dwells),
+                "max": max(dwells), "max_delay": max(self.delays())}
+
+
+class MarconiState:
+    """
+    Decoded instrument state string
+    """
+    __slots__ = ("carrier_frequency", "fm_deviation", "am_mod_index", "rf_level_dbm", "rf_level_log_unit",
+                 "rf_level_lin_unit", "mod_osc_freq", "fm_on", "ext_fm_src", "fm_alc_on", "am_on", "ext_am_src",
+                 "am_alc_on", "pulse_mod_on", "carrier_on", "ext_std", "offset_on")
+
+    def __repr__(self):
+        return f"MarconiState({', '.join(f'{k}={getattr(self, k)}' for k in self.__slots__)})"
+
+    def __eq__(self, other):
+        return isinstance(other, MarconiState) and all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+
+# RF level in the state string is relative to half the minimum level (-127 dBm - 6.02 dB)
+_RF_LEVEL_REF_DBM = -127 - 20 * log10(2)
+_STATE_FLAGS = ("fm_on", "ext_fm_src", "fm_alc_on", "am_on", "ext_am_src", "am_alc_on", "pulse_mod_on",
+                "carrier_on", "ext_std", "offset_on")
+
+
+def decode_state_string(state_str: str | None) -> MarconiState | None:
+    """
+    Decode the 42 character state string sent by the instrument
+    It contains various values representing the current operating mode
+    See Manual Chap. 3, Page 15
+
+    AAAAAAAAAA BBBBBBBB CC DDDDDD EE FF GG PRSTUVWXYZ
+
+    A: Carrier frequency in decahertz
+    B: FM deviation in decahertz
+    C: AM modulation index in percent
+    D: RF level in dB relative to half the minimum level with fixed decimal point (DDD.DDD)
+    E: RF level logarithmic units (00 - 06)
+    F: RF level linear units (07, 08)
+    G: Internal modulation oscillator frequency (00 - 04)
+
+    The remaining positions are binary flags
+    P: FM ON
+    R: EXT FM source selected
+    S: FM ALC ON
+    T: AM ON
+    U: EXT AM source selected
+    V: AM ALC ON
+    W: PULSE MOD ON
+    X: CARRIER ON
+    Y: EXT STD (freq. source) selected
+    Z: OFFSET ON
+
+    Example: 010400000000000000000060210608020000000000 -> 1040MHz, -127dBm, 1kHz mod. oscillator, carrier off
+
+    @param state_str:  state string received from the instrument
+    @return:  MarconiState or None if the string is invalid
+    """
+    if not state_str or len(state_str) != MARCONI_2019.state_string_length or not state_str.isdigit():
+        return None
+    flags_str = state_str[32:]
+    if flags_str.strip("01"):
+        return None
+    mod_osc = int(state_str[30:32])
+    if mod_osc not in MARCONI_2019.internal_mod_freq:
+        return None
+
+    state = MarconiState()
+    state.carrier_frequency = int(state_str[0:10]) * 10
+    state.fm_deviation = int(state_str[10:18]) * 10
+    state.am_mod_index = int(state_str[18:20]) / 100
+    state.rf_level_dbm = round(int(state_str[20:26]) / 1000 + _RF_LEVEL_REF_DBM, 2)
+    state.rf_level_log_unit = int(state_str[26:28])
+    state.rf_level_lin_unit = int(state_str[28:30])
+    state.mod_osc_freq = ModFrequencies(mod_osc)
+    for name, flag in zip(_STATE_FLAGS, flags_str):
+        setattr(state, name, flag == "1")
+    return state
+
+
 class MARCONI_2019(AWG.AWG):
     """
     MARCONI INSTRUMENTS  signal generator 2019
@@ -118,6 +256,7 @@ class MARCONI_2019(AWG.AWG):
     mod_idx_max = 0.99  # maximum AM mod. index
     internal_mod_freq = {0: 300, 1: 400, 2: 1000, 3: 3000, 4: 6000}  # internal modulation frequencies
     state_string_length = 42
+    track_state = True  # read the state string after every command
 
     _set_cf: float  # currently set carrier frequency
     _set_amp: float  # currently set amplitude
@@ -144,6 +283,18 @@ class MARCONI_2019(AWG.AWG):
             self._connection = DummyConnection()
             self._is_dummy_dev = True
 
+        self._state: MarconiState | None = None
+        self._set_cf = 0
+        self._set_amp = self.ampl_db_min
+        self._set_amp_unit = AmplitudeInputUnit.DECIBELS
+        self._rf_level_dbm = self.ampl_db_min
+        self._set_fm_dev = 0
+        self._set_am_mod_idx = 0
+        self._set_int_mod_freq = ModFrequencies.F1k0
+        self._fm_on = self._ext_fm_src = self._fm_alc_on = False
+        self._am_on = self._ext_am_src = self._am_alc_on = False
+        self._pulse_mod_on = self._carrier_on = self._ext_std = self._offset_on = False
+
     def connect(self):
         """
         Connect to the instrument and check the length of the received data.
@@ -155,8 +306,7 @@ class MARCONI_2019(AWG.AWG):
             connect_success = self._connection.connect()
             if connect_success == 0:
                 rx = self.receive_data()  # 010400000000000000000060210608020000000000
-                # TODO: parse + validate state string
-                if len(rx) == self.state_string_length:
+                if self._decode_state_string(rx) or (self._is_dummy_dev and rx):
                     self._ok = True
                     logger.info(f"Connected to {self._friendly_name}")
                 else:
@@ -172,21 +322,97 @@ class MARCONI_2019(AWG.AWG):
         @param output_nr: not used
         @return:
         """
+        command = self._frequency_command(frequency)
+        if command is None:
+            return
+
+        with self._lock:
+            self._send_setting("frequency", command[0])
+            self._set_cf = command[1]
+
+    def _frequency_command(self, frequency: float) -> tuple[str, float] | None:
+        """
+        Build the CF command for a frequency
+        @param frequency:  in Hz
+        @return:  (command, frequency after truncation in Hz) or None if out of range
+        """
         if not (frequency >= self.freq_min and frequency <= self.freq_max):
             logger.error(f"Frequency  {frequency} outside range [{self.freq_min} {self.freq_max}]")
-            return
+            return None
 
         f_unit: FreqUnits
 
         frequency, f_unit = _convert_freq_units(frequency)
 
         f_str = str(trunc(frequency * 1E8) / 1E8)  # Truncate Frequency to max. 5 digits
-
-        with self._lock:
-            self.send_command(f"CF {f_str} {f_unit.value}")
+        return f"CF {f_str} {f_unit.value}", float(f_str) * _FREQ_UNIT_FACTORS[f_unit]
 
     def get_frequency(self, output_nr: float = 0) -> float:
-        return self._set_cf  # TODO: check with values from device whenever updated (cache)
+        return self._set_cf
+
+    def compile_hop_list(self, frequencies: Sequence[float]) -> HopList | None:
+        """
+        Precompile the CF commands of a frequency hop list (see run_hop_list)
+        @param frequencies:  hop frequencies in Hz
+        @return:  HopList or None if a frequency is out of range
+        """
+        commands = [self._frequency_command(f) for f in frequencies]
+        if None in commands:
+            return None
+        return HopList([c[1] for c in commands], [c[0] for c in commands])
+
+    def run_hop_list(self, hop_list: HopList, dwell: float, callback: Callable[[int, float], Any] | None = None,
+                     repeat: int = 1, spin_time: float = 0.002) -> HopResult:
+        """
+        Hop through a precompiled list of frequencies.
+        Hop n is sent at start + n * dwell (host deadlines), the state string is not read between hops.
+        Hops that can not be sent in time are sent late, never skipped.
+
+        @param hop_list:   compiled with compile_hop_list()
+        @param dwell:      time per hop in s
+        @param callback:   called after every hop with (hop index, frequency), e.g. a receiver measurement,
+                           the return values are collected in the result. Must return within the dwell time
+        @param repeat:     number of passes through the list
+        @param spin_time:  the last part of the wait is busy-waiting for better timing (s)
+        @return:  HopResult with planned / actual hop times
+        """
+        result = HopResult(dwell)
+        if not hop_list.commands:
+            return result
+
+        with self._lock:
+            track_state = self.track_state
+            self.track_state = False
+            try:
+                start = time.perf_counter()
+                idx = 0
+                for _ in range(repeat):
+                    for frequency, command in zip(hop_list.frequencies, hop_list.commands):
+                        deadline = start + idx * dwell
+                        remaining = deadline - time.perf_counter()
+                        if remaining > spin_time:
+                            time.sleep(remaining - spin_time)
+                        while time.perf_counter() < deadline:
+                            pass
+
+                        self.send_command(command)
+                        sent = time.perf_counter() - start
+                        value = callback(idx, frequency) if callback is not None else None
+                        result.append(frequency, idx * dwell, sent, value)
+                        idx += 1
+            finally:
+                self.track_state = track_state
+
+            # Only the last hop is still in effect
+            self._record_setting("frequency", hop_list.commands[-1])
+            self._set_cf = hop_list.frequencies[-1]
+            if track_state and not self._is_dummy_dev:
+                self.read_state_string()
+
+        late = [d for d in result.delays() if d > spin_time]
+        if late:
+            logger.warning(f"{len(late)} of {len(result.timestamps)} hops late, max. {max(late) * 1E3:.1f}ms")
+        return result
 
     def set_amplitude(self, amp: float, output_nr: int = 0, unit: AmplitudeInputUnit = AmplitudeInputUnit.DECIBELS,
                       keep_output_off: bool = False) -> None:
@@ -229,10 +455,8 @@ class MARCONI_2019(AWG.AWG):
                 # allow three digits after comma
                 amp_str = str(trunc(amp * 1000) / 1000)
 
-            if keep_output_off:
-                amp_str += ', OF'
             with self._lock:
-                self.send_command(f"LV {amp_str} {voltage_unit.value}{', OF' if keep_output_off else ''}")
+                self._send_level(f"LV {amp_str} {voltage_unit.value}", keep_output_off)
         elif unit == AmplitudeInputUnit.DECIBELS:
             if not (self.ampl_db_min <= amp <= self.amp_db_max):
                 logger.error(f"Amplitude {amp} db outside decibel range [{self.ampl_db_min} {self.amp_db_max}]")
@@ -244,9 +468,26 @@ class MARCONI_2019(AWG.AWG):
             amp_str = str(trunc(amp))
 
             with self._lock:
-                self.send_command(f"LV {amp_str} DB{', OF' if keep_output_off else ''}")
+                self._send_level(f"LV {amp_str} DB", keep_output_off)
+
+    def _send_level(self, level_cmd: str, keep_output_off: bool):
+        """
+        Send the RF level, the level command also switches the output (on, or off with ', OF')
+        """
+        if keep_output_off:
+            level_cmd += ", OF"
+        self._send_setting("level", level_cmd)
+        self._record_setting("output", "LV OF" if keep_output_off else "LV ON")
+        self._carrier_on = not keep_output_off
+        if self._set_amp_unit == AmplitudeInputUnit.DECIBELS:
+            self._rf_level_dbm = self._set_amp
 
     def get_amplitude(self, output_nr: int = 0) -> float:
+        """
+        RF level in the unit it was set with (level in dBm is reported by the instrument)
+        """
+        if self._set_amp_unit == AmplitudeInputUnit.DECIBELS:
+            return self._rf_level_dbm
         return self._set_amp
 
     def enable_output(self, output_nr: int = 0) -> None:
@@ -256,7 +497,9 @@ class MARCONI_2019(AWG.AWG):
         @return:
         """
         with self._lock:
-            self.send_command("LV ON")
+            if self._send_setting("output", "LV ON"):
+                self._record_setting("level", None)  # level command would switch the output again
+            self._carrier_on = True
 
     def disable_output(self, output_nr: int = 0) -> None:
         """
@@ -265,8 +508,11 @@ class MARCONI_2019(AWG.AWG):
         @return:
         """
         with self._lock:
-            self.send_command("LV OF")  # Need to switch to RF output level or frequency command to turn output off
+            # Need to switch to RF output level or frequency command to turn output off
             # Otherwise ony the modulation or other parameter would be disabled
+            if self._send_setting("output", "LV OF"):
+                self._record_setting("level", None)
+            self._carrier_on = False
 
     def get_output_state(self, output_nr: int = 0) -> bool:
         return self._carrier_on
@@ -297,7 +543,8 @@ class MARCONI_2019(AWG.AWG):
             dev_str = str(trunc(deviation * 100) / 100)
 
         with self._lock:
-            self.send_command(f"FM {dev_str} {dev_unit.value}")
+            self._send_setting("modulation", f"FM {dev_str} {dev_unit.value}")
+            self._set_fm_dev = float(dev_str) * _FREQ_UNIT_FACTORS[dev_unit]
             self._fm_on = True
             self._am_on = False
 
@@ -314,7 +561,8 @@ class MARCONI_2019(AWG.AWG):
 
         mod_idx_str = str(trunc(mod_idx * 100))
         with self._lock:
-            self.send_command(f"AM {mod_idx_str} PC")
+            self._send_setting("modulation", f"AM {mod_idx_str} PC")
+            self._set_am_mod_idx = int(mod_idx_str) / 100
             self._fm_on = False
             self._am_on = True
 
@@ -331,11 +579,18 @@ class MARCONI_2019(AWG.AWG):
             mod_src_str = f"{'FM' if self._fm_on and not self._am_on else 'AM'} XT"
 
         with self._lock:
-            self.send_command(mod_src_str)
+            self._send_setting("modulation_src", mod_src_str)
+            ext = mod_src == ModFrequencies.ext
+            if self._fm_on and not self._am_on:
+                self._ext_fm_src = ext
+            else:
+                self._ext_am_src = ext
+            if not ext:
+                self._set_int_mod_freq = mod_src
 
     def set_alc(self, on_off: bool = True):
         with self._lock:
-            self.send_command(f"A{1 if on_off else 0}")
+            self._send_setting(f"alc_{'fm' if self._fm_on else 'am'}", f"A{1 if on_off else 0}")
             if self._fm_on:
                 self._fm_alc_on = on_off
             else:
@@ -344,81 +599,60 @@ class MARCONI_2019(AWG.AWG):
     def get_alc(self) -> bool:
         return self._fm_alc_on if (self._fm_on and not self._am_on) else self._am_alc_on
 
-    def _decode_state_string(self, state_str: str):
-        """
-        Decode the state string sent by the instrument and update the internal states
-        It contains various values representing the current operating mode
-        See Manual Chap. 3, Page 15
-
-        AAAAAAAAAA BBBBBBBB CC DDDDDD EE FF GG PRSTUVWXYZ
-
-        A: Carrier frequency in decahertz
-        B: FM deviation in decahertz
-        C: AM modulation index in percent
-        D: RF level in dB relative to half the minimum level with fixed decimal point (DDD.DDD)
-        E: RF level logarithmic units (00 - 06)
-        F: RF level linear units (07, 07)
-        G: Internal modulation oscillator frequency (00 - 04)
-
-        The remaining positions are binary flags
-        P: FM ON
-        R: EXT FM source selected
-        S: FM ALC ON
-        U: EXT AM source selected
-        V: AM ALC ON
-        W: PULSE MOD ON
-        X: CARRIER ON
-        Y: EXT STD (freq. source) selected
-        Z: OFFSET ON
-
+    def _decode_state_string(self, state_str: str | None) -> bool:
+        """
+        Decode the state string sent by the instrument and update the internal states (see decode_state_string)
         @param state_str:  state string received from the instrument
-        @return:
+        @return:  True if the string was valid
+        """
+        state = decode_state_string(state_str)
+        if state is None:
+            return False
+
+        self._state = state
+        self._set_cf = state.carrier_frequency
+        self._set_fm_dev = state.fm_deviation
+        self._set_am_mod_idx = state.am_mod_index
+        self._rf_level_dbm = state.rf_level_dbm
+        self._set_int_mod_freq = state.mod_osc_freq
+        self._fm_on = state.fm_on
+        self._ext_fm_src = state.ext_fm_src
+        self._fm_alc_on = state.fm_alc_on
+        self._am_on = state.am_on
+        self._ext_am_src = state.ext_am_src
+        self._am_alc_on = state.am_alc_on
+        self._pulse_mod_on = state.pulse_mod_on
+        self._carrier_on = state.carrier_on
+        self._ext_std = state.ext_std
+        self._offset_on = state.offset_on
+        return True
+
+    def read_state_string(self) -> MarconiState | None:
+        """
+        Read the state string from the instrument and update the internal states
+        @return:  decoded state or None if the string was invalid
         """
-        # TODO : error fixing here
-        if state_str == "":
-            return
-        if not state_str.isnumeric():
-            return
-        if not len(state_str) == self.state_string_length:
-            return
-
-        # This can be solved more elegant (struct + datatype sizes + binary),
-        # but since it's only used once and not subject to change I will leave it this way
-        cf_str = state_str[0:10]
-        fm_dev_str = state_str[10:18]
-        am_mod_idx_str = state_str[18:20]
-        rf_lvl_db_str = state_str[20:26]
-        rf_lvl_log_units_str = state_str[26:28]
-        rf_lvl_lin_units_str = state_str[28:30]
-        mod_osc_freq_str = state_str[30:32]
-        flags_str = state_str[32:]
-
-        cf = int(cf_str) * 10
-        fm_dev = int(fm_dev_str) * 10
-        am_mod_idx = int(am_mod_idx_str) / 100
-
-        # TODO: rf level decoding
-
-        mod_osc_freq_i = int(mod_osc_freq_str)
-        mod_osc_freq_enum: ModFrequencies
-        if mod_osc_freq_i in iter(ModFrequencies):
-            if mod_osc_freq_i != ModFrequencies.ext:
-                mod_osc_freq_enum = ModFrequencies(mod_osc_freq_i)
-            else:
-                logger.error(f"Got wrong value for internal mod oscillator index: {mod_osc_freq_i}")
-
-        # TODO: decode flags
-
-        # If everything decoded successfully set the internal values
-        self._set_cf = cf
-        self._set_fm_dev = fm_dev
-        self._set_int_mod_freq = mod_osc_freq_enum if True else ModFrequencies.ext  # TODO: ext source is split in AM / FM, check device behaviour
-
-    def read_state_string(self):
         state_str: str = ""
         with self._lock:
             state_str = self.receive_data()
+            if self._decode_state_string(state_str):
+                return self._state
+        logger.warning(f"Invalid state string: '{state_str}'")
+        return None
 
-        self._decode_state_string(state_str)
+    def get_state(self) -> MarconiState | None:
+        """
+        Last state reported by the instrument (no bus access)
+        @return:  MarconiState or None if no state string has been received yet
+        """
+        return self._state
+
+    def send_command(self, command: str):
+        """
+        The instrument prepares its state string after every command, read it to keep the internal states in sync
+        """
+        super().send_command(command)
+        if self.track_state and not self._is_dummy_dev:
+            self.read_state_string()
 
     # TODO: implement device error retrieval (SRQ mask etc.) + second level functions if needed
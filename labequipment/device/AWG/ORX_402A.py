@@ -1,6 +1,6 @@
 import time
 from enum import Enum
-from math import trunc
+from math import trunc, isclose
 import threading
 
 from labequipment.device.connection import USBTMCConnection, DummyConnection
@@ -115,6 +115,10 @@ def _extract_parameter(param: (list[str], str), param_prefix: str, extract_funct
     return ret
 
 
+# Observed time until the instrument accepts commands per resource, None: the unit does not answer the probe query
+_learned_ready_time: dict[str, float | None] = {}
+
+
 class ORX_402A(AWG.AWG):
     """
     OR-X  Model 402A - Programmable waveform generator
@@ -129,6 +133,11 @@ class ORX_402A(AWG.AWG):
     min_ampl_V = 10E-3
     max_ampl_V = 9.99
 
+    ready_delay = 3.0  # fixed wait after Z488 in s, for units that don't answer the probe query
+    ready_timeout = 5.0  # maximum time to wait for the instrument after Z488 when probing in s
+    ready_poll_min = 0.05  # first poll interval in s, doubled after every failed probe
+    command_pacing = 0.05  # the device misses commands that follow each other faster
+
     _set_freq: float
     _set_ampl: float
     _set_offset: float
@@ -137,6 +146,7 @@ class ORX_402A(AWG.AWG):
 
     def __init__(self, visa_resource: str = ""):
         super().__init__()
+        self._visa_resource = visa_resource
         if not visa_resource == "":
             self._connection = USBTMCConnection(visa_resource=visa_resource)
         else:
@@ -152,6 +162,12 @@ class ORX_402A(AWG.AWG):
         self._block_send = threading.Event()
         self._block_send.set()
 
+        self._register_shadow_verifier("frequency", lambda f: isclose(self.get_frequency_from_device(), f, rel_tol=1E-3))
+        self._register_shadow_verifier("amplitude", lambda a: isclose(self.get_amplitude_from_device(), a, rel_tol=1E-2))
+        self._register_shadow_verifier("offset", lambda o: isclose(self.get_offset_from_device(), o, abs_tol=1E-2))
+        self._register_shadow_verifier("waveform", lambda w: self.get_waveform_from_device() == w)
+        self._register_shadow_verifier("output", lambda o: self.get_output_state_from_device() == o)
+
     def connect(self):
         """
         Connect to the instrument.
@@ -167,7 +183,9 @@ class ORX_402A(AWG.AWG):
                 self.send_command("Z488")  # TODO: error handling
 
                 if not self._is_dummy_dev:
-                    time.sleep(3)  # Wait after first command / connect otherwise "ERROR 9-1" (Syntax error) happens
+                    # Commands sent too early after Z488 cause "ERROR 9-1" (Syntax error), poll until ready
+                    if not self._wait_until_ready():
+                        logger.error(f"Instrument not ready after {self.ready_timeout} s")
                     self.send_command("N0")
                     self._ok = self._get_all_and_ok()
                 if self._ok:
@@ -179,6 +197,69 @@ class ORX_402A(AWG.AWG):
 
         return self._ok
 
+    def _wait_until_ready(self) -> bool:
+        """
+        Wait until the instrument accepts commands after Z488.
+        Probes ('?N') sent too early can cause "ERROR 9-1" themselves and some units don't answer queries at all,
+        so the probe is only used once it is known to work for the resource:
+        - unknown resource: wait ready_delay, then probe once to find out whether the unit answers
+        - unit does not answer: wait ready_delay (no probes)
+        - unit answers: start probing at 0.8 * the last observed ready time, the interval starts at ready_poll_min
+          and doubles after every failed probe (bounded by ready_timeout). The ready time is only updated if a
+          probe failed before the answer
+        :return:  True: instrument is ready, False: deadline exceeded
+        """
+        t_start = time.monotonic()
+        if self._visa_resource not in _learned_ready_time:
+            cached = self._get_cached_handshake()
+            if cached and "ready_time" in cached["state"]:
+                _learned_ready_time[self._visa_resource] = cached["state"]["ready_time"]
+        learned = _learned_ready_time.get(self._visa_resource, -1)  # -1: unknown, None: does not answer probes
+
+        if learned is None or learned < 0:
+            time.sleep(self.ready_delay)
+            if learned is not None:
+                answers = self._probe_ready()
+                self._remember_ready_time(self.ready_delay if answers else None)
+                logger.debug(f"Ready probe {'answered' if answers else 'not answered, using fixed delay'}")
+            return True
+
+        deadline = t_start + self.ready_timeout
+        time.sleep(min(0.8 * learned, self.ready_timeout))
+        interval = self.ready_poll_min
+        failed_probes = 0
+        while not self._probe_ready():
+            failed_probes += 1
+            now = time.monotonic()
+            if now >= deadline:
+                _learned_ready_time.pop(self._visa_resource, None)  # find out again on the next connect
+                return False
+            time.sleep(min(interval, deadline - now))
+            interval *= 2
+        ready_time = time.monotonic() - t_start
+        if failed_probes:
+            # A failed probe bounds the ready time, an immediate answer only shows the unit was ready earlier
+            # (storing that would move the first probe earlier on every connect, into the "ERROR 9-1" region)
+            self._remember_ready_time(ready_time)
+        logger.debug(f"Instrument ready after {ready_time:.3f} s ({failed_probes} failed probes)")
+        return True
+
+    def _probe_ready(self) -> bool:
+        self.send_command("?N")
+        reply = self.receive_data()
+        try:
+            OutputState(reply)
+            return True
+        except ValueError:
+            return False
+
+    def _remember_ready_time(self, ready_time: float | None):
+        """
+        @param ready_time:  observed ready time in s, None: the unit does not answer the probe
+        """
+        _learned_ready_time[self._visa_resource] = ready_time
+        self._store_handshake("", state={"ready_time": ready_time})  # no identity query available
+
     def set_frequency(self, frequency: float, output_nr=0):
         """
         Set output frequency
@@ -225,9 +306,11 @@ class ORX_402A(AWG.AWG):
         else:
             freq_for_cmd = str(freq_trunc)
 
+        # Frequency in Hz as set by the command (after truncation)
+        set_freq = float(freq_for_cmd) * (1E3 if freq_unit_for_cmd == FreqUnits.KILOHERTZ else 1)
         with self._lock:
-            self.send_command(f"F{freq_for_cmd}{freq_unit_for_cmd.value}")  # F1234KHZ
-            self._set_freq = frequency
+            self._send_setting("frequency", f"F{freq_for_cmd}{freq_unit_for_cmd.value}", value=set_freq)  # F1234KHZ
+            self._set_freq = set_freq
 
     def get_frequency(self, output_nr=0) -> float:
         """
@@ -254,7 +337,7 @@ class ORX_402A(AWG.AWG):
         @return:
         """
         with self._lock:
-            self.send_command(f"{waveform.value}")
+            self._send_setting("waveform", f"{waveform.value}", value=waveform)
             self._set_waveform = waveform
 
     def get_waveform(self, output_nr: int = 0) -> Waveforms:
@@ -301,7 +384,7 @@ class ORX_402A(AWG.AWG):
             amp_unit_for_cmd = VoltageUnits.MILLIVOLT
 
         with self._lock:
-            self.send_command(f"A{amp_for_cmd}{amp_unit_for_cmd.value}")
+            self._send_setting("amplitude", f"A{amp_for_cmd}{amp_unit_for_cmd.value}", value=amp)
             self._set_ampl = amp
 
     def get_amplitude(self, output_nr: int = 0) -> float:
@@ -347,7 +430,7 @@ class ORX_402A(AWG.AWG):
             offset_for_cmd = f"{(offset_round * 1E3):.0f}"
 
         with self._lock:
-            self.send_command(f"O{offset_for_cmd}{offset_unit_for_cmd.value}")
+            self._send_setting("offset", f"O{offset_for_cmd}{offset_unit_for_cmd.value}", value=offset_round)
             self._set_offset = offset_round  # TODO: check???
 
     def get_offset(self, output_nr: int = 0) -> float:
@@ -374,7 +457,7 @@ class ORX_402A(AWG.AWG):
         """
         with self._lock:
             self._set_output_on = OutputState.ON
-            self.send_command(self._set_output_on.value)
+            self._send_setting("output", self._set_output_on.value, value=self._set_output_on)
 
     def disable_output(self, output_nr=0) -> None:
         """
@@ -384,7 +467,7 @@ class ORX_402A(AWG.AWG):
         """
         with self._lock:
             self._set_output_on = OutputState.OFF
-            self.send_command(self._set_output_on.value)
+            self._send_setting("output", self._set_output_on.value, value=self._set_output_on)
 
     def get_output_state(self, output_nr: int = 0) -> OutputState:
         """
@@ -440,7 +523,7 @@ class ORX_402A(AWG.AWG):
         self._block_send.wait(timeout=0.1)
         self._block_send.clear()
         super().send_command(command)
-        r = threading.Timer(0.05, self._reset_command_block)
+        r = threading.Timer(self.command_pacing, self._reset_command_block)
         r.start()
 
     def receive_data(self) -> str:
@@ -1,5 +1,12 @@
 from labequipment.device import device
+from labequipment.device.DMM.range_control import AdaptiveRangeController
+from labequipment.framework.globals import GlobalDefaults
+from labequipment.framework.readingbuffer import ReadingBuffer
 from abc import ABCMeta
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator, Callable
+import time
 import logging
 
 logger = logging.getLogger('root')
@@ -10,11 +17,63 @@ class acdc(metaclass=ABCMeta):
     AC = "AC"
 
 
+class MeasFunction(Enum):
+    """Measurement functions (values are the SCPI function names)"""
+    DCV = "VOLT:DC"
+    ACV = "VOLT:AC"
+    DCI = "CURR:DC"
+    ACI = "CURR:AC"
+    OHM = "RES"
+    OHMF = "FRES"
+    FREQ = "FREQ"
+    PER = "PER"
+
+
+class SpeedProfile(Enum):
+    MAX_SPEED = "max_speed"
+    BALANCED = "balanced"
+    MAX_ACCURACY = "max_accuracy"
+
+
 class DMM(device.device, metaclass=ABCMeta):
     CONST_AUTO: int = -1
     CONST_MIN: int = -2
     CONST_MAX: int = -3
 
+    _measurement_commands = ("MEAS", "READ?", "FETC?")
+
+    # Functions supported by measure()
+    measure_functions: tuple[MeasFunction, ...] = (MeasFunction.DCV, MeasFunction.ACV, MeasFunction.DCI,
+                                                   MeasFunction.ACI)
+
+    stream_block_size: int = 64  # maximum number of readings buffered (and fetched at once) while streaming
+
+    # Settings of the speed profiles (nplc, autozero, display), set by the drivers
+    _speed_profiles: dict[SpeedProfile, dict] = {}
+    # Settings after reset (used by the timing model when the configured settings are unknown)
+    _default_speed_settings: dict = {"nplc": 10, "autozero": True, "display": True}
+    _reading_overhead: float = 1E-3  # time per reading in addition to the integration time in s
+
+    overload_threshold: float = 9E37  # readings with a magnitude above this are overloads (+9.9E37)
+    _fixed_ranges: dict[MeasFunction, list[float]] = {}  # available fixed ranges per function, set by the drivers
+    _autorange_penalty: float = 5E-3  # additional time of an autorange reading in s
+    function_switch_time: float = 50E-3  # reconfiguration + settling after a function change in s
+    range_switch_time: float = 20E-3  # relay switching + settling after a range change in s
+
+    # AC filters (lowest signal frequency, settling time in s), fastest first, set by the drivers
+    _ac_filters: list[tuple[float, float]] = []
+    _ac_settling_default: float = 1.0  # settling time if the driver can not select an AC filter
+
+    _function: MeasFunction = MeasFunction.DCV  # last configured measurement function
+    _nplc: float | None = None  # None: unknown / not configured
+    _autozero: bool | None = None
+    _display: bool | None = None
+    _streaming: bool = False  # inside the with block of stream()
+
+    def __init__(self):
+        super().__init__()
+        self._range_controllers: dict[MeasFunction, AdaptiveRangeController] = {}
+
     # Simple (auto-range) measurement functions
     def capacitance(self):
         """measure capacitance with autorange and no configured resolution (standard behaviour)"""
@@ -42,7 +101,11 @@ class DMM(device.device, metaclass=ABCMeta):
                             eg. 0.00001 for 6 digits when the range is 1
         :return:            measured current or None
         """
+        function = MeasFunction.DCI if ac_dc_mode == acdc.DC else MeasFunction.ACI
+        return self._measure_range_controlled(function, meas_range,
+                                              lambda r: self._measure_current(ac_dc_mode, r, res))
 
+    def _measure_current(self, ac_dc_mode: acdc, meas_range: float | int, res: float | int):
         ret = 0
         command = f"MEAS:CURR:{ac_dc_mode}?"
 
@@ -55,6 +118,10 @@ class DMM(device.device, metaclass=ABCMeta):
         with self._lock:
             self.send_command(command)
             ret = float(self.receive_data())
+            # MEAS? configures function, range, integration time and AC filter
+            self.invalidate_shadow("function")
+            self.invalidate_shadow("nplc")
+            self.invalidate_shadow("ac_filter")
 
         return ret
 
@@ -122,6 +189,11 @@ class DMM(device.device, metaclass=ABCMeta):
                             eg. 0.00001 for 6 digits when the range is 1
         :return:            measured voltage or None
         """
+        function = MeasFunction.DCV if ac_dc_mode == acdc.DC else MeasFunction.ACV
+        return self._measure_range_controlled(function, meas_range,
+                                              lambda r: self._measure_voltage(ac_dc_mode, r, res))
+
+    def _measure_voltage(self, ac_dc_mode: acdc, meas_range: float | int, res: float | int):
         ret = 0
         command = f"MEAS:VOLT:{ac_dc_mode}?"
 
@@ -134,9 +206,366 @@ class DMM(device.device, metaclass=ABCMeta):
         with self._lock:
             self.send_command(command)
             ret = float(self.receive_data())
+            # MEAS? configures function, range, integration time and AC filter
+            self.invalidate_shadow("function")
+            self.invalidate_shadow("nplc")
+            self.invalidate_shadow("ac_filter")
 
         return ret
 
+    def measure(self, function: MeasFunction, meas_range: float | int = CONST_AUTO) -> float:
+        """
+        Take a single reading of <function> (generic entry point for plans and sweeps)
+        :param function:    see MeasFunction-enum
+        :param meas_range:  range or CONST_AUTO
+        :return:  reading
+        """
+        if function in (MeasFunction.DCV, MeasFunction.ACV):
+            return self.voltage(acdc.DC if function == MeasFunction.DCV else acdc.AC, meas_range)
+        if function in (MeasFunction.DCI, MeasFunction.ACI):
+            return self.current(acdc.DC if function == MeasFunction.DCI else acdc.AC, meas_range)
+        raise NotImplementedError(f"{type(self).__name__} can not measure {function}")
+
+    def read(self) -> float:
+        """
+        Take a single reading with the configured function and settings (see configure_function).
+        Unlike MEAS? (voltage(), current()) READ? keeps settings such as the AC filter
+        :return:  reading or 0 on error
+        """
+        with self._lock:
+            self.send_command("READ?")
+            answer = self.receive_data()
+        try:
+            return float(answer)
+        except (TypeError, ValueError):
+            logger.error(f"Could not convert instrument reply to float: '{answer}'")
+            return 0
+
+    def enable_range_locking(self, function: MeasFunction = MeasFunction.DCV, headroom: float = 0.95,
+                             hysteresis: float = 0.8, window: int = 5):
+        """
+        Let an AdaptiveRangeController choose the range of autorange measurements of <function>.
+        It locks to the tightest fixed range that holds the recent readings and only returns to autorange on overload.
+
+        :param function:    see MeasFunction-enum
+        :param headroom:    fraction of a range a reading may use
+        :param hysteresis:  additional factor (< 1) for ranging down
+        :param window:      number of recent readings taken into account
+        :return:
+        """
+        if function not in self._fixed_ranges:
+            logger.error(f"No fixed ranges known for {function} on {self._friendly_name}")
+            return
+        self._range_controllers[function] = AdaptiveRangeController(
+            self._fixed_ranges[function], headroom=headroom, hysteresis=hysteresis, window=window,
+            autorange_penalty=self._autorange_penalty)
+
+    def disable_range_locking(self, function: MeasFunction = MeasFunction.DCV):
+        self._range_controllers.pop(function, None)
+
+    def get_range_locking_metrics(self, function: MeasFunction = MeasFunction.DCV) -> dict | None:
+        """
+        :param function:  see MeasFunction-enum
+        :return:  metrics of the range controller (see AdaptiveRangeController.get_metrics) or None
+        """
+        controller = self._range_controllers.get(function)
+        return controller.get_metrics() if controller else None
+
+    def _is_overload(self, reading: float) -> bool:
+        return abs(reading) >= self.overload_threshold
+
+    def _measure_range_controlled(self, function: MeasFunction, meas_range: float | int,
+                                  measure: Callable[[float | int], float]) -> float:
+        """
+        Take a reading with measure(range), autorange readings use the range of the range controller (if enabled)
+        A locked reading that overloads is repeated with autorange.
+        """
+        controller = self._range_controllers.get(function) if meas_range == self.CONST_AUTO else None
+        if controller is None:
+            return measure(meas_range)
+
+        with self._lock:
+            locked_range = controller.get_range()
+            value = measure(locked_range)
+            overload = self._is_overload(value)
+            controller.update(value, overload)
+            if overload and locked_range != self.CONST_AUTO:
+                value = measure(self.CONST_AUTO)
+                controller.update(value, self._is_overload(value))
+        return value
+
+    def configure_function(self, function: MeasFunction, meas_range: float | int = CONST_AUTO):
+        """
+        Configure the measurement function and range without taking a measurement
+
+        :param function:    see MeasFunction-enum
+        :param meas_range:  maximum range or CONST_AUTO
+        :return:
+        """
+        with self._lock:
+            if self._send_setting("function", f"CONF:{function.value} {self._get_scpi_range(meas_range)}"):
+                # CONF sets the default integration time and AC filter
+                self.invalidate_shadow("nplc")
+                self.invalidate_shadow("ac_filter")
+                self._nplc = None
+            self._function = function
+
+    def configure_nplc(self, nplc: float):
+        """
+        Configure the integration time of the current measurement function
+        :param nplc:  number of power line cycles
+        :return:
+        """
+        if self._function in (MeasFunction.FREQ, MeasFunction.PER):
+            logger.error(f"Integration time (NPLC) not available for {self._function.name}, use the gate time")
+            return
+        with self._lock:
+            self._send_setting("nplc", f"{self._function.value}:NPLC {nplc}")
+            self._nplc = nplc
+
+    def configure_autozero(self, on: bool):
+        with self._lock:
+            self._send_setting("autozero", f"ZERO:AUTO {'ON' if on else 'OFF'}")
+            self._autozero = on
+
+    def configure_display(self, on: bool):
+        with self._lock:
+            self._send_setting("display", f"DISP {'ON' if on else 'OFF'}")
+            self._display = on
+
+    def configure_ac_filter(self, low_frequency: float) -> float:
+        """
+        Select the fastest AC filter that is suitable for signals down to <low_frequency>
+        :param low_frequency:  lowest frequency of the measured signal in Hz
+        :return:  settling time of the selected filter in s
+        """
+        for filter_low, settling in self._ac_filters:
+            if low_frequency >= filter_low:
+                with self._lock:
+                    self._send_ac_filter(filter_low)
+                return settling
+        if self._ac_filters:
+            filter_low, settling = self._ac_filters[-1]
+            logger.warning(f"No AC filter for {low_frequency}Hz, using the slowest ({filter_low}Hz)")
+            with self._lock:
+                self._send_ac_filter(filter_low)
+            return settling
+        return self._ac_settling_default
+
+    def _send_ac_filter(self, filter_low: float):
+        self._send_setting("ac_filter", f"DET:BAND {filter_low}")
+
+    def apply_speed_profile(self, profile: SpeedProfile, function: MeasFunction | None = None,
+                            meas_range: float | int = CONST_AUTO):
+        """
+        Apply the settings (NPLC, autozero, display) of a speed profile.
+        Autorange costs time on every reading, give a fixed range for MAX_SPEED.
+
+        :param profile:     see SpeedProfile-enum
+        :param function:    measurement function to configure first or None (keep current function)
+        :param meas_range:  maximum range or CONST_AUTO (only used with function)
+        :return:
+        """
+        if profile not in self._speed_profiles:
+            logger.error(f"Speed profile {profile} not supported by {self._friendly_name}")
+            return
+        with self._lock:
+            if function is not None:
+                self.configure_function(function, meas_range)
+            self._apply_speed_settings(self._speed_profiles[profile])
+
+    @contextmanager
+    def speed_profile(self, profile: SpeedProfile, function: MeasFunction | None = None,
+                      meas_range: float | int = CONST_AUTO):
+        """
+        Context manager: apply a speed profile and restore the previous NPLC, autozero and display settings on exit
+        Settings not configured through the driver are queried from the instrument on entry, settings that can not be
+        queried are restored to the defaults after reset (_default_speed_settings).
+
+        Example:  with dmm.speed_profile(SpeedProfile.MAX_SPEED, MeasFunction.DCV, 10): dmm.acquire(count=1000)
+        """
+        with self._lock:
+            prior = self._get_speed_settings()
+            self.apply_speed_profile(profile, function, meas_range)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._apply_speed_settings(prior)
+
+    def expected_readings_per_second(self, profile: SpeedProfile) -> float:
+        """
+        Estimate the reading rate of a speed profile (fixed range, integration time at the configured line frequency)
+        :param profile:  see SpeedProfile-enum
+        :return:  readings per second
+        """
+        settings = self._speed_profiles[profile]
+        integration = settings["nplc"] / GlobalDefaults.line_frequency
+        if settings["autozero"]:
+            integration *= 2  # zero reading after every reading
+        return 1 / (integration + self._reading_overhead)
+
+    def _get_speed_settings(self) -> dict:
+        """
+        :return:  current speed settings: configured, else queried, else the default after reset
+                  (nplc is None for functions without integration time)
+        """
+        settings = {"nplc": self._nplc, "autozero": self._autozero, "display": self._display}
+        for name, value in settings.items():
+            if name == "nplc" and self._function in (MeasFunction.FREQ, MeasFunction.PER):
+                continue
+            if value is None:
+                value = self._query_speed_setting(name)
+            settings[name] = self._default_speed_settings[name] if value is None else value
+        return settings
+
+    def _query_speed_setting(self, name: str) -> float | bool | None:
+        """
+        Read a speed setting from the instrument
+        :param name:  'nplc', 'autozero' or 'display'
+        :return:  value or None if the instrument can not be queried / the answer is invalid
+        """
+        queries = {"nplc": f"{self._function.value}:NPLC?", "autozero": "ZERO:AUTO?", "display": "DISP?"}
+        return self._parse_speed_setting(name, self._query_setting(queries[name]))
+
+    def _query_setting(self, query: str) -> str | None:
+        with self._lock:
+            self.send_command(query)
+            return self.receive_data()
+
+    @staticmethod
+    def _parse_speed_setting(name: str, answer: str | None) -> float | bool | None:
+        try:
+            value = float(answer)
+        except (TypeError, ValueError):
+            logger.error(f"Could not convert instrument reply to {name}: '{answer}'")
+            return None
+        return value if name == "nplc" else bool(value)
+
+    def _apply_speed_settings(self, settings: dict):
+        """
+        :param settings:  speed settings, settings that are None are not changed
+        """
+        if settings["nplc"] is not None:
+            self.configure_nplc(settings["nplc"])
+        if settings["autozero"] is not None:
+            self.configure_autozero(settings["autozero"])
+        if settings["display"] is not None:
+            self.configure_display(settings["display"])
+
+    @contextmanager
+    def stream(self, function: MeasFunction = MeasFunction.DCV, rate: float | None = None, count: int | None = None,
+               meas_range: float | int = CONST_AUTO) -> Iterator[Iterator[tuple[float, float]]]:
+        """
+        Context manager: take readings continuously, the readings are an iterator of (timestamp, reading)
+
+        Readings are fetched in blocks of at most stream_block_size readings. The next block is only requested when
+        the consumer has taken all readings of the previous one, so a slow consumer throttles the acquisition instead
+        of filling up memory. Drivers implement the fastest native mode in _stream_start / _stream_read_block.
+        The instrument lock is held inside the with block, other threads can not interleave commands between the
+        blocks. Leaving the with block (also with break or an exception) ends the stream and releases the lock.
+
+        Example:
+            with dmm.stream(MeasFunction.DCV, count=1000) as readings:
+                for t, v in readings: ...
+
+        :param function:    see MeasFunction-enum
+        :param rate:        readings per second or None for as fast as possible
+        :param count:       number of readings or None for an endless stream
+        :param meas_range:  maximum range or CONST_AUTO
+        :return:            iterator of (timestamp [s since epoch], reading)
+        """
+        if (count is not None and count <= 0) or (rate is not None and rate <= 0):
+            if rate is not None and rate <= 0:
+                logger.error(f"Invalid use: rate {rate} is not greater than 0")
+            yield iter(())
+            return
+
+        with self._lock:
+            self._stream_start(function, rate, meas_range)
+            self._streaming = True
+            try:
+                yield self._stream_readings(rate, count)
+            finally:
+                self._streaming = False
+                self._stream_stop()
+
+    def _stream_readings(self, rate: float | None, count: int | None) -> Iterator[tuple[float, float]]:
+        remaining = count
+        while remaining is None or remaining > 0:
+            if not self._streaming:
+                logger.error("Invalid use: stream readings taken after the end of the stream (with block)")
+                return
+            n = self.stream_block_size if remaining is None else min(remaining, self.stream_block_size)
+            t_start = time.time()
+            values = self._stream_read_block(n)[:n]
+            t_end = time.time()
+            if not values:
+                logger.error("Streaming stopped, no readings received")
+                return
+
+            # Readings are spread evenly over the block, the last one is taken (at the latest) at t_end
+            dt = 1 / rate if rate else (t_end - t_start) / len(values)
+            for i, value in enumerate(values):
+                if not self._streaming:
+                    return  # remaining readings of the block are dropped with the stream
+                yield t_end - (len(values) - 1 - i) * dt, value
+            if remaining is not None:
+                remaining -= len(values)
+
+    def acquire(self, function: MeasFunction = MeasFunction.DCV, count: int = 1, rate: float | None = None,
+                meas_range: float | int = CONST_AUTO, buffer: ReadingBuffer | None = None,
+                channel: int = 0) -> ReadingBuffer:
+        """
+        Take a fixed number of readings (see stream) into a ReadingBuffer
+
+        :param function:    see MeasFunction-enum
+        :param count:       number of readings
+        :param rate:        readings per second or None for as fast as possible
+        :param meas_range:  maximum range or CONST_AUTO
+        :param buffer:      buffer to append the readings to, a new one is created if None
+        :param channel:     channel id stored with the readings
+        :return:            the filled buffer
+        """
+        if buffer is None:
+            buffer = ReadingBuffer(count)
+        with self.stream(function, rate, count, meas_range) as readings:
+            buffer.extend(readings, channel=channel)
+        return buffer
+
+    def _stream_start(self, function: MeasFunction, rate: float | None, meas_range: float | int):
+        """
+        Prepare the instrument for streaming (generic SCPI implementation: one READ? per reading, paced by the host)
+        """
+        self.configure_function(function, meas_range)
+        self._stream_interval = 1 / rate if rate else 0
+        self._stream_next = time.monotonic()
+
+    def _stream_read_block(self, n: int) -> list[float]:
+        """
+        Take up to n readings
+        :param n:  maximum number of readings
+        :return:   list of readings (empty on error)
+        """
+        values: list[float] = []
+        for i in range(n):
+            delay = self._stream_next - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._stream_next = max(self._stream_next + self._stream_interval, time.monotonic())
+            self.send_command("READ?")
+            answer = self.receive_data()
+            try:
+                values.append(float(answer))
+            except (TypeError, ValueError):
+                logger.error(f"Could not convert instrument reply to float: '{answer}'")
+                break
+        return values
+
+    def _stream_stop(self):
+        """Return the instrument to single measurements after streaming"""
+        pass
+
     def lockPanel(self):
         print("lockPanel ERROR NOT IMPLEMENTED")
         raise NotImplementedError
@@ -145,6 +574,37 @@ class DMM(device.device, metaclass=ABCMeta):
         print("setLocal ERROR NOT IMPLEMENTED")
         raise NotImplementedError
 
+    @staticmethod
+    def _parse_reading_list(answer: str | None) -> list[float]:
+        """
+        Parse a comma separated list of readings
+        :param answer:  answer from the instrument
+        :return:  list of readings (empty if the answer could not be converted)
+        """
+        if not answer:
+            return []
+        try:
+            return [float(v) for v in answer.split(',')]
+        except ValueError:
+            logger.error(f"Could not convert instrument reply to list of floats: '{answer}'")
+            return []
+
+    def _get_scpi_range(self, meas_range) -> str:
+        """
+        Get the range parameter for SCPI CONF / SENS commands
+        :param meas_range:  maximum range, CONST_AUTO, CONST_MIN or CONST_MAX
+        :return:  range parameter ("DEF" selects autorange)
+        """
+        match meas_range:
+            case self.CONST_AUTO:
+                return "DEF"
+            case self.CONST_MAX:
+                return "MAX"
+            case self.CONST_MIN:
+                return "MIN"
+            case _:
+                return f"{meas_range}"
+
     def _get_command_from_range_and_res(self, meas_range, res):
         command = ""
         ok = True
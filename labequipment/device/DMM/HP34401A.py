@@ -9,6 +9,26 @@ class HP34401A(DMM.DMM):
     _expected_device_type = "34401A"
     _friendly_name = "HP 34401A Multimeter"
 
+    # available integration times: 0.02, 0.2, 1, 10, 100 NPLC
+    _speed_profiles = {
+        DMM.SpeedProfile.MAX_SPEED: {"nplc": 0.02, "autozero": False, "display": False},
+        DMM.SpeedProfile.BALANCED: {"nplc": 1, "autozero": True, "display": True},
+        DMM.SpeedProfile.MAX_ACCURACY: {"nplc": 100, "autozero": True, "display": True},
+    }
+    _default_speed_settings = {"nplc": 10, "autozero": True, "display": True}
+
+    _fixed_ranges = {
+        DMM.MeasFunction.DCV: [0.1, 1, 10, 100, 1000],
+        DMM.MeasFunction.ACV: [0.1, 1, 10, 100, 750],
+        DMM.MeasFunction.DCI: [0.01, 0.1, 1, 3],
+        DMM.MeasFunction.ACI: [1, 3],
+        DMM.MeasFunction.OHM: [100, 1E3, 10E3, 100E3, 1E6, 10E6, 100E6],
+        DMM.MeasFunction.OHMF: [100, 1E3, 10E3, 100E3, 1E6, 10E6, 100E6],
+    }
+
+    # DET:BAND slow / medium / fast filter (Manual: AC Signal Filter)
+    _ac_filters = [(200, 0.12), (20, 1.0), (3, 7.0)]
+
     def __init__(self, visa_resource: str = "", serial_dev: str = ""):
         super().__init__()
         if not visa_resource == "":
@@ -38,4 +58,27 @@ class HP34401A(DMM.DMM):
                 if not self._ok:
                     logger.error("Connected but no answer")
 
+    def _stream_start(self, function: DMM.MeasFunction, rate: float | None, meas_range: float | int):
+        """
+        Stream in blocks: SAMP:COUN readings per INIT, fetched from the reading memory with one FETC?
+        With a rate the trigger delay is set to 1 / rate, it is inserted between the samples (plus integration time)
+        """
+        self.configure_function(function, meas_range)
+        self.send_command("TRIG:SOUR IMM")
+        if rate:
+            self.send_command(f"TRIG:DEL {1 / rate}")
+        self._stream_samples = 0
+
+    def _stream_read_block(self, n: int) -> list[float]:
+        if n != self._stream_samples:
+            self.send_command(f"SAMP:COUN {n}")
+            self._stream_samples = n
+        self.send_command("INIT")
+        self.send_command("FETC?")
+        return self._parse_reading_list(self.receive_data())
+
+    def _stream_stop(self):
+        self.send_command("SAMP:COUN 1")
+        self.send_command("TRIG:DEL:AUTO ON")
+
     # TODO: check manual for further functions to implement
@@ -1,16 +1,20 @@
 from enum import IntEnum, Enum
+import time
 
-from labequipment.device.DMM.DMM import DMM
+from labequipment.device.DMM.DMM import DMM, MeasFunction, SpeedProfile
 from labequipment.device.DMM.DMM import acdc as dmm_acdc
 from labequipment.device.connection import USBTMCConnection, DummyConnection, XyphroUSBGPIBConfig
+from labequipment.device.device import cached_query
+from labequipment.framework.readingbuffer import ReadingBuffer
 import logging
 
 logger = logging.getLogger('root')
 
 
 class acdc(dmm_acdc):
-    DC = 0
-    AC = 1
+    # Same values as the DMM base class, generic code (utils) passes DMM.acdc
+    DC = dmm_acdc.DC
+    AC = dmm_acdc.AC
 
 
 class TriggerType(IntEnum):
@@ -48,6 +52,59 @@ class ErrorCodes(Enum):
     AUTOCAL_REQ = "Auto calibration required"      # 1024
 
 
+class MathOperation(Enum):
+    OFF = "OFF"
+    NULL = "NULL"        # reading - OFFSET
+    SCALE = "SCALE"      # (reading - OFFSET) / SCALE
+    STAT = "STAT"        # running MEAN, SDEV, MIN, MAX, NSAMP
+    FILTER = "FILTER"    # digital low pass filter (DEGREE)
+    DB = "DB"            # dB relative to REF
+    DBM = "DBM"          # dBm into RES
+    PERC = "PERC"        # percent of PERC
+    PFAIL = "PFAIL"      # pass / fail against UPPER / LOWER
+
+
+class MathRegister(Enum):
+    DEGREE = "DEGREE"
+    LOWER = "LOWER"
+    MAX = "MAX"
+    MEAN = "MEAN"
+    MIN = "MIN"
+    NSAMP = "NSAMP"
+    OFFSET = "OFFSET"
+    PERC = "PERC"
+    REF = "REF"
+    RES = "RES"
+    SCALE = "SCALE"
+    SDEV = "SDEV"
+    UPPER = "UPPER"
+
+
+class ScanResult:
+    """
+    Result of a scanner card scan: one row of readings (and timestamps) per channel, one column per scan
+    """
+
+    def __init__(self, channels: list[int], values: list[list[float]], timestamps: list[list[float]]):
+        self.channels = channels
+        self.values = values
+        self.timestamps = timestamps
+
+    def to_buffer(self, buffer: ReadingBuffer | None = None) -> ReadingBuffer:
+        """
+        Copy the readings into a ReadingBuffer (in the order they were taken) with the channel numbers as channel ids
+        :param buffer:  buffer to append the readings to, a new one is created if None
+        :return:  the filled buffer
+        """
+        if buffer is None:
+            buffer = ReadingBuffer(sum(len(row) for row in self.values))
+        readings = []
+        for channel, values, timestamps in zip(self.channels, self.values, self.timestamps):
+            readings += [(t, v, channel, 0) for t, v in zip(timestamps, values)]
+        buffer.extend(sorted(readings))
+        return buffer
+
+
 class HP3457A(DMM):
     _expected_device_type = "HP3457A"
     _friendly_name = "HP 3457A Multimeter"
@@ -63,12 +120,50 @@ class HP3457A(DMM):
     res_max = 100
     nplc_min = 0
     nplc_max = 100
+    nplc_values = [0.0005, 0.005, 0.1, 1, 10, 100]  # available integration times
+    scan_channel_min = 0  # 44491A / 44492A multiplexer channels
+    scan_channel_max = 9
+    reading_memory_size = 500  # readings that fit into the reading memory (conservative)
+    subprogram_name_max_len = 10
+    _function_commands = {MeasFunction.DCV: "DCV", MeasFunction.ACV: "ACV", MeasFunction.DCI: "DCI",
+                          MeasFunction.ACI: "ACI", MeasFunction.OHM: "OHM", MeasFunction.OHMF: "OHMF",
+                          MeasFunction.FREQ: "FREQ", MeasFunction.PER: "PER"}
+    stat_registers = [MathRegister.MEAN, MathRegister.SDEV, MathRegister.MIN, MathRegister.MAX, MathRegister.NSAMP]
 
     _reset_after_connect: bool = False
+    _measurement_commands = (f"TRIG {TriggerType.single.value}", "RMEM")  # readings are returned after a trigger
+    measure_functions = tuple(MeasFunction)
+
+    # Output format stays ASCII (OFORMAT) in all profiles, readings are parsed as text
+    _speed_profiles = {
+        SpeedProfile.MAX_SPEED: {"nplc": 0.0005, "autozero": False, "display": False},
+        SpeedProfile.BALANCED: {"nplc": 1, "autozero": True, "display": True},
+        SpeedProfile.MAX_ACCURACY: {"nplc": 100, "autozero": True, "display": True},
+    }
+    _default_speed_settings = {"nplc": 10, "autozero": True, "display": True}
+    _reading_overhead = 0.7E-3
+
+    _fixed_ranges = {
+        MeasFunction.DCV: [30E-3, 300E-3, 3, 30, 300],
+        MeasFunction.ACV: [30E-3, 300E-3, 3, 30, 300],
+        MeasFunction.DCI: [300E-6, 3E-3, 30E-3, 300E-3, 1],
+        MeasFunction.ACI: [300E-6, 3E-3, 30E-3, 300E-3, 1],
+        MeasFunction.OHM: [30, 300, 3E3, 30E3, 300E3, 3E6, 30E6, 3E9],
+        MeasFunction.OHMF: [30, 300, 3E3, 30E3, 300E3, 3E6, 30E6, 3E9],
+    }
+
+    # ACBAND selects the fast AC filter for signals >= 400Hz (Manual: ACBAND)
+    _ac_filters = [(400, 0.1), (1, 1.0)]
 
     def __init__(self, visa_resource="", reset_after_connect=False):
         super().__init__()
         self._reset_after_connect = reset_after_connect
+        self._subprograms: dict[str, tuple[str, ...]] = {}  # subprograms resident in the instrument
+        self._scan_groups: list[tuple[MeasFunction, list[int]]] = []  # scan list of configure_scan, []: no scan
+        self._terminals: Terminals | None = None  # None: unknown (front after reset)
+        self._terminals_before_scan: Terminals | None = None
+        self._register_shadow_verifier("nplc", lambda nplc: self.get_nplc_from_device() == nplc)
+        self._register_shadow_verifier("impedance", lambda fixed: self.get_impedance_fixed() == fixed)
         if not visa_resource == "":
             self._connection: USBTMCConnection = USBTMCConnection(visa_resource=visa_resource)
         else:
@@ -78,20 +173,37 @@ class HP3457A(DMM):
     def connect(self):
         super().connect()
         with self._lock:
+            self._subprograms = {}  # unknown after (re)connect, defined again on first use
             connect_success = self._connection.connect()
 
             if connect_success == 0:
-                if isinstance(self._connection, USBTMCConnection):
-                    self._connection.xyphro_usb_gpib_adaptor_settings(XyphroUSBGPIBConfig.SET_READ_TERM_LF)
-                self.send_command("ID?")
-                idn = self.receive_data()
+                idn = None
+                cached = self._get_cached_handshake()
+                if cached and cached["adaptor"].get("read_term") == XyphroUSBGPIBConfig.SET_READ_TERM_LF.value:
+                    # Fast reconnect: adaptor is already configured, only verify the identity
+                    self.send_command("ID?")
+                    idn = self.receive_data()
+                    if idn != cached["identity"]:
+                        logger.debug("Cached handshake does not match, doing full handshake")
+                        self._invalidate_handshake()
+                        idn = None
+
+                if idn is None:
+                    if isinstance(self._connection, USBTMCConnection):
+                        self._connection.xyphro_usb_gpib_adaptor_settings(XyphroUSBGPIBConfig.SET_READ_TERM_LF)
+                    self.send_command("ID?")
+                    idn = self.receive_data()
                 if idn:
                     if self._check_device_type(idn, self._expected_device_type):
                         self._ok = True
                         logger.info(f"Connected to {self._friendly_name}")
+                        if isinstance(self._connection, USBTMCConnection):
+                            self._store_handshake(idn, adaptor={
+                                "read_term": XyphroUSBGPIBConfig.SET_READ_TERM_LF.value})
                         if self._reset_after_connect:
                             logger.info("Resetting instrument")
                             self.send_command("RESET")
+                            self.invalidate_shadow()
                 if not self._ok:
                     logger.error("Connected but no answer")
 
@@ -107,8 +219,14 @@ class HP3457A(DMM):
         @param res:          resolution (% of range)
         @return:
         """
+        function = MeasFunction.DCV if ac_dc_mode == acdc.DC else MeasFunction.ACV
+        return self._measure_range_controlled(function, meas_range,
+                                              lambda r: self._measure_voltage(ac_dc_mode, r, res))
+
+    def _measure_voltage(self, ac_dc_mode: acdc, meas_range: float | int, res: float | int) -> float:
         answer: str = ""
         with self._lock:
+            self._end_scan()
             self.configure_voltage(ac_dc_mode=ac_dc_mode, meas_range=meas_range, res=res)
             self.configure_trigger(TriggerType.single)
             answer = self.receive_data()
@@ -151,7 +269,7 @@ class HP3457A(DMM):
             command_str += f",{res}"
 
         with self._lock:
-            self.send_command(command_str)
+            self._send_setting("function", command_str)
 
     def current(self, ac_dc_mode: acdc = acdc.DC, meas_range: float | int = DMM.CONST_AUTO,
                 res: float | int = DMM.CONST_AUTO) -> float:
@@ -165,8 +283,14 @@ class HP3457A(DMM):
         @param res:          resolution (% of range)
         @return:
         """
+        function = MeasFunction.DCI if ac_dc_mode == acdc.DC else MeasFunction.ACI
+        return self._measure_range_controlled(function, meas_range,
+                                              lambda r: self._measure_current(ac_dc_mode, r, res))
+
+    def _measure_current(self, ac_dc_mode: acdc, meas_range: float | int, res: float | int) -> float:
         answer: str = ""
         with self._lock:
+            self._end_scan()
             self.configure_current(ac_dc_mode=ac_dc_mode, meas_range=meas_range, res=res)
             self.configure_trigger(TriggerType.single)
             answer = self.receive_data()
@@ -209,12 +333,68 @@ class HP3457A(DMM):
             command_str += f",{res}"
 
         with self._lock:
-            self.send_command(command_str)
+            self._send_setting("function", command_str)
+
+    def configure_function(self, function: MeasFunction, meas_range: float | int = DMM.CONST_AUTO):
+        """
+        Configure the measurement function and range without taking a measurement
+        :param function:    see MeasFunction-enum
+        :param meas_range:  maximum range or CONST_AUTO
+        :return:
+        """
+        match function:
+            case MeasFunction.DCV:
+                self.configure_voltage(ac_dc_mode=acdc.DC, meas_range=meas_range)
+            case MeasFunction.ACV:
+                self.configure_voltage(ac_dc_mode=acdc.AC, meas_range=meas_range)
+            case MeasFunction.DCI:
+                self.configure_current(ac_dc_mode=acdc.DC, meas_range=meas_range)
+            case MeasFunction.ACI:
+                self.configure_current(ac_dc_mode=acdc.AC, meas_range=meas_range)
+            case MeasFunction.OHM:
+                self.configure_resistance(meas_range=meas_range)
+            case MeasFunction.OHMF:
+                self.configure_resistance(meas_range=meas_range, four_wire=True)
+            case MeasFunction.FREQ:
+                self.configure_frequency(max_input=meas_range)
+            case MeasFunction.PER:
+                self.configure_period(max_input=meas_range)
+        self._function = function
+
+    def _stream_start(self, function: MeasFunction, rate: float | None, meas_range: float | int):
+        """
+        Stream in blocks: NRDGS readings per trigger are stored in the reading memory and drained with one RMEM
+        With a rate the readings are paced by the internal timer (TIMER 1 / rate)
+        Each block is started with TRIG SGL instead of a continuous trigger: RMEM does not remove readings from the
+        memory, so a continuously filling memory could not be drained without losing or repeating readings.
+        There is a gap of one RMEM transfer between the blocks.
+        """
+        self._end_scan()
+        self.configure_function(function, meas_range)
+        if rate:
+            self.send_command(f"TIMER {1 / rate}")
+        self._stream_sample_event = "TIMER" if rate else "AUTO"
+        self._stream_samples = 0
+
+    def _stream_read_block(self, n: int) -> list[float]:
+        if n != self._stream_samples:
+            self.send_command(f"NRDGS {n},{self._stream_sample_event}")
+            self._stream_samples = n
+        self.send_command("MEM FIFO")  # clears the reading memory
+        self.configure_trigger(TriggerType.single)
+        self.send_command(f"RMEM 1,{n}")
+        return self._parse_reading_list(self.receive_data())
+
+    def _stream_stop(self):
+        self.send_command("MEM OFF")
+        self.send_command("NRDGS 1,AUTO")
+        self.configure_trigger(TriggerType.hold)
 
     def configure_impedance(self, fixed: bool):
         with self._lock:
-            self.send_command(f"FIXEDZ {1 if fixed else 0}")
+            self._send_setting("impedance", f"FIXEDZ {1 if fixed else 0}", value=fixed)
 
+    @cached_query(ttl=10, invalidated_by=("impedance",))
     def get_impedance_fixed(self):
         fixed = False
         with self._lock:
@@ -240,6 +420,7 @@ class HP3457A(DMM):
         answer: str = ""
         freq: float = 0
         with self._lock:
+            self._end_scan()
             self.configure_frequency(max_input=max_input, fsource=fsource)
             self.configure_trigger(TriggerType.single)
             answer = self.receive_data()
@@ -265,8 +446,8 @@ class HP3457A(DMM):
                     return
 
         with self._lock:
-            self.send_command(f"FSOURCE {fsource.value}")
-            self.send_command(f"FREQ {max_input if max_input != DMM.CONST_AUTO else ''}")
+            self._send_setting("fsource", f"FSOURCE {fsource.value}")
+            self._send_setting("function", f"FREQ {max_input if max_input != DMM.CONST_AUTO else ''}")
 
     def fResistance(self):
         raise NotImplementedError
@@ -275,6 +456,7 @@ class HP3457A(DMM):
         answer: str = ""
         per: float = 0
         with self._lock:
+            self._end_scan()
             self.configure_period(max_input=max_input, fsource=fsource)
             self.configure_trigger(TriggerType.single)
             answer = self.receive_data()
@@ -300,12 +482,39 @@ class HP3457A(DMM):
                     return
 
         with self._lock:
-            self.send_command(f"FSOURCE {fsource.value}")
-            self.send_command(f"PER {max_input}")
+            self._send_setting("fsource", f"FSOURCE {fsource.value}")
+            self._send_setting("function", f"PER {max_input}")
+
+    def measure(self, function: MeasFunction, meas_range: float | int = DMM.CONST_AUTO) -> float:
+        if function in (MeasFunction.OHM, MeasFunction.OHMF):
+            return self.resistance(meas_range, four_wire=function == MeasFunction.OHMF)
+        if function == MeasFunction.FREQ:
+            return self.frequency(meas_range)
+        if function == MeasFunction.PER:
+            return self.period(meas_range)
+        return super().measure(function, meas_range)
+
+    def read(self) -> float:
+        """
+        Take a single reading with the configured function and settings (single trigger)
+        :return:  reading or 0 on error
+        """
+        answer = self.single_trigger_and_get_value()
+        try:
+            return float(answer)
+        except ValueError:
+            logger.error(f"Could not convert instrument reply to float: '{answer}'")
+            return 0
 
     def resistance(self, meas_range: float = DMM.CONST_AUTO, res: float = DMM.CONST_AUTO, four_wire: bool = False):
+        function = MeasFunction.OHMF if four_wire else MeasFunction.OHM
+        return self._measure_range_controlled(function, meas_range,
+                                              lambda r: self._measure_resistance(r, res, four_wire))
+
+    def _measure_resistance(self, meas_range: float, res: float, four_wire: bool) -> float:
         answer: str = ""
         with self._lock:
+            self._end_scan()
             self.configure_resistance(meas_range=meas_range, res=res, four_wire=four_wire)
             self.configure_trigger(TriggerType.single)
             answer = self.receive_data()
@@ -342,7 +551,7 @@ class HP3457A(DMM):
             command_str += f",{res}"
 
         with self._lock:
-            self.send_command(command_str)
+            self._send_setting("function", command_str)
 
     def temperature(self):
         raise NotImplementedError
@@ -354,7 +563,12 @@ class HP3457A(DMM):
         :return:
         """
         with self._lock:
-            self.send_command(f"TRIG {trigger.value}")
+            if trigger == TriggerType.single:
+                # Triggers a reading, always sent. The instrument returns to hold afterwards
+                self.send_command(f"TRIG {trigger.value}")
+                self._record_setting("trigger", None)
+            else:
+                self._send_setting("trigger", f"TRIG {trigger.value}")
 
     def single_trigger_and_get_value(self) -> str:
         """
@@ -363,6 +577,7 @@ class HP3457A(DMM):
         """
         answer: str = ""
         with self._lock:
+            self._end_scan()
             self.configure_trigger(TriggerType.single)
             answer = self.receive_data()
         return answer
@@ -373,35 +588,43 @@ class HP3457A(DMM):
     def configure_nplc(self, nplc: float):
         """
         Configure NPLC (Number of Powerline cycles) for measurements
+        The instrument selects the smallest available integration time (see nplc_values) >= nplc
         :param nplc: float: [ 0 - 100 ]
         :return:
         """
-        # TODO: allow only specific NPLC values (see manual)
-        if not nplc >= self.nplc_min and nplc <= self.nplc_max:
-            logger.error(f"NPLC {nplc} outside of range [{self.nplc_min} {self.nplc_max}")
+        if not self.nplc_min <= nplc <= self.nplc_max:
+            logger.error(f"NPLC {nplc} outside of range [{self.nplc_min} {self.nplc_max}]")
             return
 
-        if nplc > 0.005:
-            match nplc:
-                case 0.005:
-                    pass
-                case 0.1:
-                    pass
-                case 1:
-                    pass
-                case 10:
-                    pass
-                case 100:
-                    pass
-                case _:
-                    logger.error("NPLC needs to be <=0.005 0.005, 0.1, 1, 10 or 100")
-                    return
         with self._lock:
-            self.send_command(f"NPLC {nplc}")
+            self._nplc = min(v for v in self.nplc_values if v >= nplc)
+            self._send_setting("nplc", f"NPLC {nplc}", value=self._nplc)
 
     def get_nplc(self) -> float:
-        raise NotImplementedError
+        """
+        Get the integration time selected by the instrument (queried from the device if not configured yet)
+        :return: NPLC
+        """
+        if self._nplc is None:
+            self._nplc = self.get_nplc_from_device()
+        return self._nplc
+
+    def configure_autozero(self, on: bool):
+        with self._lock:
+            self._send_setting("autozero", f"AZERO {1 if on else 0}")
+            self._autozero = on
 
+    def configure_display(self, on: bool):
+        with self._lock:
+            self._send_setting("display", f"DISP {1 if on else 0}")
+            self._display = on
+
+    def _query_speed_setting(self, name: str) -> float | bool | None:
+        if name == "display":
+            return None  # DISP has no query form
+        return self._parse_speed_setting(name, self._query_setting("NPLC?" if name == "nplc" else "AZERO?"))
+
+    @cached_query(ttl=10, invalidated_by=("nplc",))
     def get_nplc_from_device(self) -> float:
         nplc: float = 0
         answer: str = ""
@@ -416,6 +639,9 @@ class HP3457A(DMM):
 
         return nplc
 
+    def _send_ac_filter(self, filter_low: float):
+        self._send_setting("ac_filter", f"ACBAND {filter_low}")
+
     def configure_terminals(self, terminals: Terminals):
         """
         Select terminal sor add-in card
@@ -423,7 +649,297 @@ class HP3457A(DMM):
         :return:
         """
         with self._lock:
-            self._connection.send_command(f"TERM {terminals.value}")
+            self._send_setting("terminals", f"TERM {terminals.value}")
+            self._terminals = terminals
+
+    def configure_scan(self, channels: list[int] | dict[int, MeasFunction], function: MeasFunction = MeasFunction.DCV,
+                       meas_range: float | int = DMM.CONST_AUTO, scans: int = 1):
+        """
+        Program a scan list for the 44491A / 44492A scanner card (rear terminals / card are selected).
+
+        Channels with the same function are scanned together with one trigger (SLIST + NRDGS), the readings are stored
+        in the reading memory and fetched with one RMEM. If all channels use the same function the instrument is only
+        programmed once here and scan() sends nothing but the trigger and the readout.
+        Other configure_* calls change the programmed setup, call configure_scan again afterwards.
+        Single readings, streaming and acquire_statistics() end the scan (see clear_scan).
+
+        :param channels:    list of channels (all use <function>) or dict channel -> MeasFunction
+        :param function:    function for channels given as a list
+        :param meas_range:  maximum range or CONST_AUTO (for all channels)
+        :param scans:       number of times the channel list is scanned per scan() call
+        :return:
+        """
+        if isinstance(channels, list):
+            channels = {ch: function for ch in channels}
+        if not channels or scans < 1:
+            logger.error(f"Invalid use: need at least one channel and one scan ({channels=} {scans=})")
+            return
+        for ch in channels:
+            if not self.scan_channel_min <= ch <= self.scan_channel_max:
+                logger.error(f"Channel {ch} outside of range [{self.scan_channel_min} {self.scan_channel_max}]")
+                return
+
+        groups: dict[MeasFunction, list[int]] = {}
+        for ch, func in channels.items():
+            groups.setdefault(func, []).append(ch)
+
+        with self._lock:
+            if not self._scan_groups:
+                self._terminals_before_scan = self._terminals
+            self._scan_groups = list(groups.items())
+            self._scan_range = meas_range
+            self._scan_count = scans
+            self.configure_terminals(Terminals.rear_or_card)
+            self._scan_programmed = False
+            if len(self._scan_groups) == 1:
+                self._program_scan_group(*self._scan_groups[0])
+                self._scan_programmed = True
+
+    def _program_scan_group(self, function: MeasFunction, channels: list[int]):
+        self.configure_function(function, self._scan_range)
+        self.send_command(f"SLIST {','.join(str(ch) for ch in channels)}")
+        self.send_command(f"NRDGS {len(channels) * self._scan_count},AUTO")
+
+    def scan(self) -> ScanResult | None:
+        """
+        Trigger the scan(s) programmed with configure_scan and read all readings in one transfer per function.
+        Timestamps are derived from the scan timing (readings spread evenly between trigger and end of the readout).
+
+        :return:  ScanResult (channel x reading matrix) or None on error
+        """
+        if not self._scan_groups:
+            logger.error("Invalid use: no scan list configured (configure_scan)")
+            return None
+
+        result: dict[int, tuple[list[float], list[float]]] = {}
+        with self._lock:
+            for function, channels in self._scan_groups:
+                if not self._scan_programmed:
+                    self._program_scan_group(function, channels)
+                n = len(channels) * self._scan_count
+                t_start = time.time()
+                self.send_command("MEM FIFO")  # clears the reading memory
+                self.configure_trigger(TriggerType.single)
+                self.send_command(f"RMEM 1,{n}")
+                values = self._parse_reading_list(self.receive_data())
+                t_end = time.time()
+                if len(values) != n:
+                    logger.error(f"Expected {n} readings from scan, got {len(values)}")
+                    return None
+
+                dt = (t_end - t_start) / n
+                for i, value in enumerate(values):
+                    row = result.setdefault(channels[i % len(channels)], ([], []))
+                    row[0].append(value)
+                    row[1].append(t_start + (i + 1) * dt)
+
+        channels = [ch for _, group in self._scan_groups for ch in group]
+        return ScanResult(channels, [result[ch][0] for ch in channels], [result[ch][1] for ch in channels])
+
+    def clear_scan(self):
+        """
+        Remove the scan list and return to single readings on the terminals used before configure_scan
+        :return:
+        """
+        with self._lock:
+            self.send_command("SLIST")
+            self.send_command("MEM OFF")
+            self.send_command("NRDGS 1,AUTO")
+            self.configure_terminals(self._terminals_before_scan or Terminals.front)
+            self._scan_groups = []
+            self._scan_programmed = False
+
+    def _end_scan(self):
+        """
+        Clear an active scan list before other readings: a trigger would start a scan burst into the reading memory
+        """
+        if self._scan_groups:
+            self.clear_scan()
+
+    def configure_math(self, operation: MathOperation, operation2: MathOperation | None = None):
+        """
+        Enable math operation(s) in the instrument (MATH), two operations can be combined (e.g. NULL and STAT)
+        :param operation:   see MathOperation-enum
+        :param operation2:  optional second operation
+        :return:
+        """
+        command = f"MATH {operation.value}"
+        if operation2 is not None:
+            command += f",{operation2.value}"
+        with self._lock:
+            self.send_command(command)
+
+    def disable_math(self):
+        self.configure_math(MathOperation.OFF)
+
+    def set_math_register(self, register: MathRegister, value: float):
+        """
+        Store a value in a math register (SMATH)
+        :param register:  see MathRegister-enum
+        :param value:     value to store
+        :return:
+        """
+        with self._lock:
+            self.send_command(f"SMATH {register.value},{value}")
+
+    def get_math_register(self, register: MathRegister) -> float | None:
+        """
+        Read a math register (RMATH)
+        :param register:  see MathRegister-enum
+        :return:  register value or None on error
+        """
+        with self._lock:
+            self.send_command(f"RMATH {register.value}")
+            answer = self.receive_data()
+        try:
+            return float(answer)
+        except (TypeError, ValueError):
+            logger.error(f"Could not convert instrument reply to float: '{answer}'")
+            return None
+
+    def configure_null(self, offset: float | None = None):
+        """
+        Subtract an offset from every reading, without offset the next reading is used as offset
+        :param offset:  offset in units of the measurement function or None
+        :return:
+        """
+        with self._lock:
+            self.configure_math(MathOperation.NULL)
+            if offset is not None:
+                self.set_math_register(MathRegister.OFFSET, offset)
+
+    def configure_scale(self, scale: float, offset: float = 0):
+        """
+        Scale every reading: (reading - offset) / scale
+        :param scale:   divisor
+        :param offset:  offset subtracted before scaling
+        :return:
+        """
+        if scale == 0:
+            logger.error("Invalid use: scale must not be 0")
+            return
+        with self._lock:
+            self.set_math_register(MathRegister.SCALE, scale)
+            self.set_math_register(MathRegister.OFFSET, offset)
+            self.configure_math(MathOperation.SCALE)
+
+    def configure_filter(self, degree: int):
+        """
+        Enable the digital low pass filter
+        :param degree:  filter degree (weight of the previous readings)
+        :return:
+        """
+        with self._lock:
+            self.set_math_register(MathRegister.DEGREE, degree)
+            self.configure_math(MathOperation.FILTER)
+
+    def get_statistics(self) -> dict[MathRegister, float | None]:
+        """
+        Read the registers of the STAT operation (MEAN, SDEV, MIN, MAX, NSAMP)
+        :return:  dict register -> value
+        """
+        with self._lock:
+            return {register: self.get_math_register(register) for register in self.stat_registers}
+
+    def acquire_statistics(self, function: MeasFunction = MeasFunction.DCV, count: int = 100,
+                           meas_range: float | int = DMM.CONST_AUTO) -> dict[MathRegister, float | None]:
+        """
+        Take <count> readings and reduce them in the instrument (MATH STAT).
+        Readings are stored in the reading memory instead of being sent, only the registers are transferred.
+
+        :param function:    see MeasFunction-enum
+        :param count:       number of readings
+        :param meas_range:  maximum range or CONST_AUTO
+        :return:  dict register -> value (MEAN, SDEV, MIN, MAX, NSAMP)
+        """
+        if count < 1:
+            logger.error(f"Invalid use: count {count} is less than 1")
+            return {}
+
+        with self._lock:
+            self._end_scan()
+            self.configure_function(function, meas_range)
+            self.configure_math(MathOperation.STAT)
+            remaining = count
+            block = 0
+            while remaining > 0:
+                n = min(remaining, self.reading_memory_size)
+                if n != block:
+                    self.send_command(f"NRDGS {n},AUTO")
+                    block = n
+                self.send_command("MEM FIFO")  # clears the reading memory, STAT keeps accumulating
+                self.configure_trigger(TriggerType.single)
+                remaining -= n
+            stats = self.get_statistics()
+            self.disable_math()
+            self.send_command("MEM OFF")
+            self.send_command("NRDGS 1,AUTO")
+        return stats
+
+    def define_subprogram(self, name: str, commands: list[str]):
+        """
+        Download a subprogram (SUB ... SUBEND) that can later be run with one short CALL command.
+        The content of resident subprograms is tracked, a subprogram is only sent again when it changed.
+
+        :param name:      name of the subprogram
+        :param commands:  instrument commands stored in the subprogram
+        :return:
+        """
+        if not (name.isalnum() and len(name) <= self.subprogram_name_max_len):
+            logger.error(f"Invalid subprogram name '{name}', must be alphanumeric with max. "
+                         f"{self.subprogram_name_max_len} characters")
+            return
+        commands = tuple(commands)
+        with self._lock:
+            if self._subprograms.get(name) == commands:
+                logger.debug(f"Subprogram {name} already resident")
+                return
+            self.send_command(";".join((f"SUB {name}",) + commands + ("SUBEND",)))
+            self._subprograms[name] = commands
+
+    def define_measurement_mode(self, name: str, function: MeasFunction, meas_range: float | int = DMM.CONST_AUTO,
+                                nplc: float | None = None, autozero: bool | None = None,
+                                trigger: TriggerType | None = None):
+        """
+        Define a subprogram that switches to a complete measurement setup (see define_subprogram)
+        :param name:        name of the subprogram
+        :param function:    see MeasFunction-enum
+        :param meas_range:  maximum range or CONST_AUTO
+        :param nplc:        integration time in power line cycles or None (unchanged)
+        :param autozero:    autozero on / off or None (unchanged)
+        :param trigger:     trigger type or None (unchanged)
+        :return:
+        """
+        commands = [self._function_commands[function]
+                    + (f" {meas_range}" if meas_range != self.CONST_AUTO else "")]
+        if nplc is not None:
+            commands.append(f"NPLC {nplc}")
+        if autozero is not None:
+            commands.append(f"AZERO {1 if autozero else 0}")
+        if trigger is not None:
+            commands.append(f"TRIG {trigger.value}")
+        self.define_subprogram(name, commands)
+
+    def call_subprogram(self, name: str):
+        """
+        Run a resident subprogram
+        :param name:  name of the subprogram
+        :return:
+        """
+        if name not in self._subprograms:
+            logger.error(f"Subprogram {name} is not defined")
+            return
+        with self._lock:
+            self.send_command(f"CALL {name}")
+            self.invalidate_shadow()  # settings changed by the subprogram
+
+    def delete_subprogram(self, name: str):
+        with self._lock:
+            self.send_command(f"DELSUB {name}")
+            self._subprograms.pop(name, None)
+
+    def get_resident_subprograms(self) -> list[str]:
+        return list(self._subprograms)
 
     def get_error_codes(self) -> list[ErrorCodes] | None:
         """
@@ -452,6 +968,8 @@ class HP3457A(DMM):
                 if idx & err_code:
                     errors.append(el)
                 idx = idx << 1
+            if errors:
+                self.invalidate_shadow()  # a command may have been rejected
             return errors
         else:
             return None
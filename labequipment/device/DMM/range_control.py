@@ -0,0 +1,102 @@
+from collections import deque
+import time
+import logging
+
+logger = logging.getLogger('root')
+
+RANGE_AUTO = -1  # same value as DMM.CONST_AUTO
+
+
+class AdaptiveRangeController:
+    """
+    Watch recent readings and lock the DMM to the tightest fixed range that holds them (saves the autorange delay).
+
+    - unlocked (autorange): as soon as <window> readings are known, lock to the tightest range >= max / headroom
+    - locked: range up as soon as a reading exceeds headroom * range,
+              range down only if all readings of the window fit into hysteresis * headroom * lower range
+    - overload: back to autorange, the window starts over
+    """
+
+    def __init__(self, ranges: list[float], headroom: float = 0.95, hysteresis: float = 0.8, window: int = 5,
+                 autorange_penalty: float = 5E-3):
+        """
+        :param ranges:             available fixed ranges of the measurement function
+        :param headroom:           fraction of a range a reading may use
+        :param hysteresis:         additional factor (< 1) for ranging down
+        :param window:             number of recent readings taken into account
+        :param autorange_penalty:  time autorange adds to a reading in s (for the time saved metric)
+        """
+        self._ranges = sorted(ranges)
+        self._headroom = headroom
+        self._hysteresis = hysteresis
+        self._recent = deque(maxlen=window)
+        self._autorange_penalty = autorange_penalty
+        self._range = RANGE_AUTO
+
+        self._t_start = time.monotonic()
+        self._switches = 0
+        self._locked_readings = 0
+        self._overloads = 0
+
+    def get_range(self) -> float | int:
+        """
+        :return:  range for the next reading or RANGE_AUTO
+        """
+        return self._range
+
+    def _tightest_range(self, value: float, fill: float) -> float | None:
+        for r in self._ranges:
+            if value <= fill * r:
+                return r
+        return None
+
+    def _switch(self, new_range: float | int):
+        if new_range != self._range:
+            logger.debug(f"Range {self._range} -> {new_range}")
+            self._range = new_range
+            self._switches += 1
+
+    def update(self, reading: float, overload: bool = False):
+        """
+        Feed a reading taken with the range returned by get_range()
+        :param reading:   the reading
+        :param overload:  True if the reading is an overload
+        :return:
+        """
+        if self._range != RANGE_AUTO:
+            self._locked_readings += 1
+        if overload:
+            self._overloads += 1
+            self._recent.clear()
+            self._switch(RANGE_AUTO)
+            return
+
+        self._recent.append(abs(reading))
+        peak = max(self._recent)
+        if self._range == RANGE_AUTO:
+            if len(self._recent) == self._recent.maxlen:
+                new_range = self._tightest_range(peak, self._headroom)
+                if new_range is not None:
+                    self._switch(new_range)
+        elif peak > self._headroom * self._range:
+            new_range = self._tightest_range(peak, self._headroom)
+            self._switch(new_range if new_range is not None else RANGE_AUTO)
+        else:
+            lower = self._tightest_range(peak, self._headroom * self._hysteresis)
+            if lower is not None and lower < self._range:
+                self._switch(lower)
+
+    def reset(self):
+        self._recent.clear()
+        self._switch(RANGE_AUTO)
+
+    def get_metrics(self) -> dict:
+        """
+        :return:  dict with switches, switches_per_second, locked_readings, overloads and time_saved (in s)
+        """
+        elapsed = time.monotonic() - self._t_start
+        return {"switches": self._switches,
+                "switches_per_second": self._switches / elapsed if elapsed > 0 else 0,
+                "locked_readings": self._locked_readings,
+                "overloads": self._overloads,
+                "time_saved": self._locked_readings * self._autorange_penalty}
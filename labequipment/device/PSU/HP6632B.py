@@ -1,19 +1,52 @@
 from labequipment.device.connection import USBTMCConnection, DummyConnection
 
 from labequipment.device.PSU import PSU
+from labequipment.device.PSU.PSU import PSUReading
 from labequipment.framework import exceptions
 
+from enum import Enum
 import logging
+import time
 
 logger = logging.getLogger('root')
 
 
+class ArrayFunction(Enum):
+    VOLTAGE = "VOLT"
+    CURRENT = "CURR"
+
+
+class AcqTriggerSource(Enum):
+    BUS = "BUS"        # triggered by trigger_acquisition()
+    INTERNAL = "INT"   # triggered by the output signal crossing the trigger level
+
+
+class AcqTriggerSlope(Enum):
+    POSITIVE = "POS"
+    NEGATIVE = "NEG"
+    EITHER = "EITH"
+
+
 class HP6632B(PSU.PSU):
     _expected_device_type = "6632B"
 
     _display_mode_normal: bool
     _display_char_max = 14
 
+    # Status register bits (Manual: Status Reporting)
+    _OPER_CV = 1 << 8
+    _OPER_CC = 1 << 10
+    _OPER_WAIT_TRIG = 1 << 5
+    _QUES_OV = 1 << 0
+    _QUES_OCP = 1 << 1
+
+    # Digitizer (Manual: SENSe:SWEep)
+    acq_points_max = 4096
+    acq_interval_min = 15.6E-6  # sample interval is a multiple of this
+    acq_interval_max = 31200
+
+    _measurement_commands = ("MEAS", "FETC")
+
     _set_voltage: float = 0
     _set_current: float = 0
     _output_state: bool = False
@@ -33,6 +66,10 @@ class HP6632B(PSU.PSU):
             self._is_dummy_dev = True
 
         self._display_mode_normal = True
+        self._acq_points = self.acq_points_max
+        self._acq_interval = self.acq_interval_min
+        self._acq_offset = 0
+        self._acq_trigger_source = AcqTriggerSource.BUS  # *RST default
 
     def connect(self):
         """
@@ -44,6 +81,7 @@ class HP6632B(PSU.PSU):
         with self._lock:
             connect_success = self._connection.connect()
             if connect_success == 0:
+                cached = self._get_cached_handshake()
                 retry_count = 3
                 while retry_count > 0 and not self._ok:
                     self.send_command("*IDN?")  # TODO: generalize this
@@ -51,12 +89,19 @@ class HP6632B(PSU.PSU):
                     idn = self.receive_data()
                     retry_count -= 1
 
-                    if idn:
+                    if cached and idn == cached["identity"]:
+                        # Same instrument (incl. serial number and firmware) as last time
+                        self._ok = True
+                        logger.info(f"Connected to {self._friendly_name}")
+                        if not cached["state"].get("display_normal", False):
+                            self.display_normal()
+                    elif idn:
                         name = idn.split(',')[1]
                         if self._check_device_type(name, self._expected_device_type):
                             self._ok = True
                             logger.info(f"Connected to {self._friendly_name}")
                             self.display_normal()
+                            self._store_handshake(idn, state={"display_normal": True})
                     else:
                         logger.warning("Retrying connect")
 
@@ -122,6 +167,89 @@ class HP6632B(PSU.PSU):
                 logger.error(f"VALUE ERROR, can not convert {a_str} to float")
         return amps
 
+    def measure_all(self, output_nr=0) -> PSUReading:
+        """
+        Measured voltage, current and CV / CC / OV / OCP status in a single compound query (one bus transaction)
+        MEAS:VOLT? starts one acquisition that digitizes voltage and current, FETC:CURR? returns the current of the
+        same acquisition (a second MEAS would start a new one)
+        @param output_nr:  not used
+        @return:  PSUReading, not valid (voltage / current -1) if the answer could not be parsed
+        """
+        with self._lock:
+            timestamp = time.time()
+            self.send_command("MEAS:VOLT?;:FETC:CURR?;:STAT:OPER:COND?;:STAT:QUES:COND?")
+            answer = self.receive_data()
+
+        try:
+            v_str, a_str, oper_str, ques_str = answer.split(';')
+            oper = int(float(oper_str))
+            ques = int(float(ques_str))
+            return PSUReading(timestamp, float(v_str), float(a_str),
+                              cv=bool(oper & self._OPER_CV), cc=bool(oper & self._OPER_CC),
+                              ov=bool(ques & self._QUES_OV), ocp=bool(ques & self._QUES_OCP))
+        except (ValueError, AttributeError):
+            logger.error(f"VALUE ERROR, can not convert {answer} to readback")
+            return PSUReading(timestamp, -1, -1, valid=False)
+
+    def _get_operation_condition(self) -> int:
+        with self._lock:
+            self.send_command("STAT:OPER:COND?")
+            answer = self.receive_data()
+        try:
+            return int(float(answer))
+        except (ValueError, TypeError):
+            logger.error(f"VALUE ERROR, can not convert {answer} to status")
+            return 0
+
+    def get_cc_status_live(self, output_nr=0) -> bool:
+        return bool(self._get_operation_condition() & self._OPER_CC)
+
+    def get_cv_status_live(self, output_nr=0) -> bool:
+        return bool(self._get_operation_condition() & self._OPER_CV)
+
+    def arm_step(self, voltage: float | None = None, current: float | None = None, output_nr=0):
+        """
+        Load the next setpoint into the instrument (VOLT:TRIG / CURR:TRIG) and arm the output trigger,
+        fire_step() applies it with a bus trigger without parsing delays
+        @param voltage:    next voltage in V (None: unchanged)
+        @param current:    next current limit in A (None: unchanged)
+        @param output_nr:  not used
+        @return:
+        """
+        commands = []
+        if voltage is not None:
+            commands.append(f"VOLT:TRIG {voltage}")
+        if current is not None:
+            commands.append(f"CURR:TRIG {current}")
+        with self._lock:
+            self._send_setting("trigger_source", "TRIG:SOUR BUS")  # only bus triggers (*TRG, GPIB GET) on this model
+            self.send_command(";:".join(commands + ["INIT"]))
+            self._armed_step = (voltage, current, output_nr)
+
+    def fire_step(self):
+        """
+        Trigger the setpoint loaded with arm_step()
+        @return:
+        """
+        with self._lock:
+            self.send_command("*TRG")
+            voltage, current, _ = self._armed_step
+            if voltage is not None:
+                self._set_voltage = voltage
+            if current is not None:
+                self._set_current = current
+            self._armed_step = (None, None, 0)
+
+    def disarm_step(self):
+        """
+        Cancel the output trigger armed by arm_step(), the staged setpoint is not applied
+        @return:
+        """
+        with self._lock:
+            if self._armed_step != (None, None, 0):
+                self.send_command("ABOR")
+            self._armed_step = (None, None, 0)
+
     def display_text(self, text):
         """
         Display text on the VFD of the instrument (disables voltage + current readout)
@@ -131,6 +259,7 @@ class HP6632B(PSU.PSU):
         if self._display_mode_normal:
             self.send_command("DISPLAY:MODE TEXT")
             self._display_mode_normal = False
+            self._update_handshake_state({"display_normal": False})
         if not len(text) > self._display_char_max:
             self.send_command(f"DISPLAY:TEXT \"{text}\"")
 
@@ -140,6 +269,8 @@ class HP6632B(PSU.PSU):
         @return:
         """
         self.send_command("DISPLAY:MODE NORMAL")
+        if not self._display_mode_normal:
+            self._update_handshake_state({"display_normal": True})
         self._display_mode_normal = True
 
     def enable_output(self, output_nr=0) -> None:
@@ -170,3 +301,122 @@ class HP6632B(PSU.PSU):
 
     def get_voltage(self, output_nr=0) -> float:
         return self._set_voltage
+
+    def configure_acquisition(self, points: int = 4096, interval: float = 15.6E-6, pre_trigger: int = 0):
+        """
+        Configure the digitizer sweep for array measurements
+        @param points:       number of samples 1 - 4096
+        @param interval:     sample interval in s (15.6us - 31200s), rounded by the instrument to multiples of 15.6us
+        @param pre_trigger:  number of samples to keep from before the trigger (0 - points)
+        @return:
+        """
+        if not 1 <= points <= self.acq_points_max:
+            logger.error(f"Points {points} out of range [1 {self.acq_points_max}]")
+            return
+        if not self.acq_interval_min <= interval <= self.acq_interval_max:
+            logger.error(f"Interval {interval} out of range [{self.acq_interval_min} {self.acq_interval_max}]")
+            return
+        if not 0 <= pre_trigger <= points:
+            logger.error(f"Pre-trigger samples {pre_trigger} out of range [0 {points}]")
+            return
+
+        with self._lock:
+            self.send_command(f"SENS:SWE:POIN {points};TINT {interval};OFFS:POIN {-pre_trigger}")
+            self._acq_points = points
+            self._acq_offset = -pre_trigger
+            # Use the interval the instrument actually applied for the time axis
+            self.send_command("SENS:SWE:TINT?")
+            answer = self.receive_data()
+            try:
+                self._acq_interval = float(answer)
+            except (ValueError, TypeError):
+                self._acq_interval = round(interval / self.acq_interval_min) * self.acq_interval_min
+
+    def configure_acquisition_trigger(self, source: AcqTriggerSource = AcqTriggerSource.BUS,
+                                      function: ArrayFunction = ArrayFunction.CURRENT, level: float = 0,
+                                      slope: AcqTriggerSlope = AcqTriggerSlope.POSITIVE, hysteresis: float = 0):
+        """
+        Configure the trigger of the digitizer
+        @param source:      BUS: trigger_acquisition(), INTERNAL: output signal crosses <level>
+        @param function:    signal the internal trigger is looking at
+        @param level:       trigger level in V / A (internal trigger)
+        @param slope:       slope of the signal at the trigger level (internal trigger)
+        @param hysteresis:  trigger hysteresis in V / A (internal trigger)
+        @return:
+        """
+        with self._lock:
+            self.send_command(f"TRIG:SEQ2:SOUR {source.value}")
+            self._acq_trigger_source = source
+            if source == AcqTriggerSource.INTERNAL:
+                fn = function.value
+                self.send_command(f"TRIG:SEQ2:LEV:{fn} {level};SLOP:{fn} {slope.value};HYST:{fn} {hysteresis}")
+
+    def arm_acquisition(self, function: ArrayFunction = ArrayFunction.CURRENT):
+        """
+        Start the digitizer, the sweep is taken on the next acquisition trigger
+        @param function:  signal to digitize
+        @return:
+        """
+        with self._lock:
+            self.send_command(f"SENS:FUNC \"{function.value}\"")
+            self.send_command("INIT:NAME ACQ")
+
+    def trigger_acquisition(self):
+        """
+        Trigger an armed acquisition (bus trigger)
+        @return:
+        """
+        with self._lock:
+            self.send_command("TRIG:ACQ")
+
+    def fetch_array(self, function: ArrayFunction = ArrayFunction.CURRENT):
+        """
+        Read the samples of the last acquisition (blocks until the sweep is complete)
+        @param function:  digitized signal
+        @return:  times (s, relative to the trigger), values (V / A) as numpy arrays
+        """
+        with self._lock:
+            self.send_command(f"FETC:ARR:{function.value}?")
+            return self._parse_array(self.receive_data())
+
+    def measure_array(self, function: ArrayFunction = ArrayFunction.CURRENT):
+        """
+        Digitize the signal immediately (no trigger) and read the samples
+        @param function:  signal to digitize
+        @return:  times (s, relative to the start), values (V / A) as numpy arrays
+        """
+        with self._lock:
+            self.send_command(f"MEAS:ARR:{function.value}?")
+            return self._parse_array(self.receive_data())
+
+    def capture_array(self, function: ArrayFunction = ArrayFunction.CURRENT, timeout: float = 10):
+        """
+        Arm the digitizer, wait for the configured trigger and read the samples
+        For bus triggers the acquisition is triggered right away
+        @param function:  signal to digitize
+        @param timeout:   max. time to wait for the trigger in s
+        @return:  times (s, relative to the trigger), values (V / A) as numpy arrays
+        """
+        with self._lock:
+            self.arm_acquisition(function)
+            if self._acq_trigger_source == AcqTriggerSource.BUS:
+                self.trigger_acquisition()
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline and not self._is_dummy_dev:
+                if not self._get_operation_condition() & self._OPER_WAIT_TRIG:
+                    break
+                time.sleep(0.01)
+            else:
+                if not self._is_dummy_dev:
+                    logger.error(f"No acquisition trigger within {timeout}s")
+            return self.fetch_array(function)
+
+    def _parse_array(self, answer: str | None):
+        import numpy as np
+        try:
+            values = np.array(answer.split(','), dtype=np.float64)
+        except (ValueError, AttributeError):
+            logger.error(f"VALUE ERROR, can not convert {answer} to array")
+            values = np.empty(0, dtype=np.float64)
+        times = (np.arange(len(values)) + self._acq_offset) * self._acq_interval
+        return times, values
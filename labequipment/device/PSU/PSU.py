@@ -1,9 +1,50 @@
 from labequipment.device import device
 import abc
 from abc import abstractmethod
+from array import array
+from typing import Sequence
+import time
+import logging
+
+logger = logging.getLogger('root')
+
+
+class PSUReading:
+    """
+    Readback of one PSU output: measured voltage / current and regulation / protection status
+    """
+    __slots__ = ("timestamp", "voltage", "current", "cv", "cc", "ov", "ocp", "valid")
+
+    def __init__(self, timestamp: float, voltage: float, current: float, cv: bool | None = None,
+                 cc: bool | None = None, ov: bool | None = None, ocp: bool | None = None, valid: bool = True):
+        """
+        :param timestamp:  time.time() of the readback
+        :param voltage:    measured voltage in V
+        :param current:    measured current in A
+        :param cv:         output in constant voltage mode (None: unknown)
+        :param cc:         output in constant current mode (None: unknown)
+        :param ov:         over voltage protection tripped (None: unknown)
+        :param ocp:        over current protection tripped (None: unknown)
+        :param valid:      False if the readback failed, voltage and current are no measured values then
+        """
+        self.timestamp = timestamp
+        self.voltage = voltage
+        self.current = current
+        self.cv = cv
+        self.cc = cc
+        self.ov = ov
+        self.ocp = ocp
+        self.valid = valid
+
+    def __repr__(self):
+        return (f"PSUReading(voltage={self.voltage}, current={self.current}, cv={self.cv}, cc={self.cc}, "
+                f"ov={self.ov}, ocp={self.ocp}, valid={self.valid})")
 
 
 class PSU(device.device, metaclass=abc.ABCMeta):
+    num_outputs: int = 1
+    first_output: int = 0  # output_nr of the first output
+    _armed_step: tuple = (None, None, 0)  # (voltage, current, output_nr) loaded by arm_step()
 
     @abstractmethod
     def set_voltage(self, voltage, output_nr):
@@ -45,6 +86,117 @@ class PSU(device.device, metaclass=abc.ABCMeta):
     def get_cv_status_live(self, output_nr):  # TODO: decide if these methods are needed here
         raise NotImplementedError
 
+    def measure_all(self, output_nr=0) -> PSUReading:
+        """
+        Measured voltage, current and status of an output.
+        Generic implementation with one query per value, drivers should override this with a single compound query
+        @param output_nr:  output to read back
+        @return:  PSUReading
+        """
+        with self._lock:
+            timestamp = time.time()
+            voltage = self.get_measured_voltage(output_nr)
+            current = self.get_measured_current(output_nr)
+            try:
+                cv = self.get_cv_status_live(output_nr)
+                cc = self.get_cc_status_live(output_nr)
+            except NotImplementedError:
+                cv = cc = None
+        return PSUReading(timestamp, voltage, current, cv=cv, cc=cc)
+
+    def get_output_numbers(self) -> range:
+        return range(self.first_output, self.first_output + self.num_outputs)
+
+    def _check_output_count(self, values: Sequence, name: str) -> bool:
+        if len(values) != self.num_outputs:
+            logger.error(f"Got {len(values)} {name}, PSU has {self.num_outputs} outputs")
+            return False
+        return True
+
+    def set_voltages(self, voltages: Sequence[float]):
+        """
+        Set the voltages of all outputs
+        Generic implementation with one command per output, drivers should batch this where the instrument allows it
+        @param voltages:  one voltage in V per output (in the order of get_output_numbers())
+        @return:
+        """
+        if self._check_output_count(voltages, "voltages"):
+            with self._lock:
+                for output_nr, voltage in zip(self.get_output_numbers(), voltages):
+                    self.set_voltage(voltage, output_nr)
+
+    def set_currents(self, currents: Sequence[float]):
+        """
+        Set the current limits of all outputs
+        @param currents:  one current in A per output (in the order of get_output_numbers())
+        @return:
+        """
+        if self._check_output_count(currents, "currents"):
+            with self._lock:
+                for output_nr, current in zip(self.get_output_numbers(), currents):
+                    self.set_current(current, output_nr)
+
+    def enable_outputs(self, states: Sequence[bool] | None = None):
+        """
+        Switch all outputs
+        @param states:  one state per output (True: on, False: off), None: all outputs on
+        @return:
+        """
+        if states is None:
+            states = [True] * self.num_outputs
+        if self._check_output_count(states, "output states"):
+            with self._lock:
+                for output_nr, state in zip(self.get_output_numbers(), states):
+                    if state:
+                        self.enable_output(output_nr)
+                    else:
+                        self.disable_output(output_nr)
+
+    def measure_outputs(self) -> tuple[array, array]:
+        """
+        Measure voltage and current of all outputs
+        @return:  voltages, currents as array('d') (in the order of get_output_numbers())
+        """
+        voltages = array('d')
+        currents = array('d')
+        with self._lock:
+            for output_nr in self.get_output_numbers():
+                reading = self.measure_all(output_nr)
+                voltages.append(reading.voltage)
+                currents.append(reading.current)
+        return voltages, currents
+
+    def arm_step(self, voltage: float | None = None, current: float | None = None, output_nr=0):
+        """
+        Pre-load the next setpoint, it is applied by fire_step().
+        Generic implementation keeps the setpoint on the host, drivers with trigger support load it into the instrument
+        @param voltage:    next voltage in V (None: unchanged)
+        @param current:    next current limit in A (None: unchanged)
+        @param output_nr:  output to step
+        @return:
+        """
+        self._armed_step = (voltage, current, output_nr)
+
+    def fire_step(self):
+        """
+        Apply the setpoint loaded with arm_step()
+        @return:
+        """
+        voltage, current, output_nr = self._armed_step
+        self._armed_step = (None, None, output_nr)
+        with self._lock:
+            if voltage is not None:
+                self.set_voltage(voltage, output_nr)
+            if current is not None:
+                self.set_current(current, output_nr)
+
+    def disarm_step(self):
+        """
+        Discard a setpoint loaded with arm_step() without applying it
+        @return:
+        """
+        self._armed_step = (None, None, self._armed_step[2])
+
     def lock_panel(self):  # TODO: decide if these methods are needed here
         raise NotImplementedError
 
@@ -1,148 +1,171 @@
 from labequipment.device.PSU import PSU
+from labequipment.device.PSU.PSU import PSUReading
+from labequipment.device.connection import DummyConnection
 from labequipment.framework import exceptions
-import abc
+from array import array
+from typing import Sequence
+import time
 import logging
 
 logger = logging.getLogger('root')
 
-# TODO: remove old stuff
+
+def _pad(values: list | None, length: int, default, name: str) -> list:
+    """
+    Pad a value list to <length> entries by repeating its last value
+    """
+    if values is None:
+        return [default] * length
+    if not isinstance(values, list) or len(values) == 0 or len(values) > length:
+        logger.error(f"Invalid dummy PSU parameter {name}: {values}")
+        raise exceptions.InvalidDeviceParameter
+    return values + [values[-1]] * (length - len(values))
+
+
 class dummyPSU(PSU.PSU):
+    _friendly_name = "Dummy PSU"
 
     def __init__(self, output_states=None,
-                 get_voltages=[0], get_currents=[0],
+                 get_voltages=None, get_currents=None,
                  get_measured_voltages=None, get_measured_currents=None,
                  CC_status=None, CV_status=None, count_type=1):
-        """initialize a dummy / placeholder PSU with predefined values  
-        
+        """initialize a dummy / placeholder PSU with predefined values
+
         output_states [(bool), ...]:            list of output states.
-                                                The length of this list defines the number of outputs the PSU has  
-        get_voltages [(float), ...]:            list of set voltages  
-        get_currents [(float), ...]:            list of set currents  
-        get_measured_voltages [(float), ...]:   list of measured voltages  
-        get_measured_currents [(float), ...]:   list of measured currents
-        CC_status [(bool), ...]:                list of CC_status  
+                                                The length of this list defines the number of outputs the PSU has
+        get_voltages [(float), ...]:            list of set voltages
+        get_currents [(float), ...]:            list of set currents
+        get_measured_voltages [(float), ...]:   list of measured voltages, None: the set voltage of enabled outputs
+        get_measured_currents [(float), ...]:   list of measured currents, None: 0
+        CC_status [(bool), ...]:                list of CC_status
         CV_status [(bool)], ...]:                list of CV_status
         count_type:                             Define where output counting starts (0 or 1)
-        
-        The length of the output_states list defines the amount of outputs the PSU has.  
-        Each list that follows must be smaller or equal to that size.  
-        If the list is shorter than the output_states list,  
-        it will be expanded to the full size by padding with the last value.  
-        Even if it's only a single value, the argument MUST always be a list (e.g. get_voltages = [1.23])  
-          
-        Example:   
-        output_states = [false, false, false] # PSU has 3 outputs  
-        get_voltages = [1.0] # only one entry given
-        ==> get_voltages = [1.0, 1.0, 1.0] # Same voltage is set for every output
-        """
-
-        logger.info("Setting up dummy PSU")
-        logger.info(f"{vars()}")
-
-        _max_outputs = len(output_states)
-
-        # check if all arguments have correct size / length
-        for arg in vars().values():
-            print(arg)
-            if arg is None:
-                raise exceptions.InvalidDeviceParameter
-            elif isinstance(arg, list):
-                if len(arg) > _max_outputs:
-                    raise exceptions.InvalidDeviceParameter
-
-        self.output_states = output_states
-        self.get_voltages = get_voltages
-        self.get_currents = get_currents
-        self.get_measured_voltages = get_measured_voltages
-        self.get_measured_currents = get_measured_currents
-        self.CC_status = CC_status
-        self.CV_status = CV_status
-
-        # Padding for value lists
-        last = get_voltages[-1]
-        while len(self.get_voltages) < _max_outputs:
-            self.get_voltages.append(last)
-
-        last = get_currents[-1]
-        while len(self.get_currents) < _max_outputs:
-            self.get_currents.append(last)
-
-        last = get_measured_voltages[-1]
-        while len(self.get_measured_voltages) < _max_outputs:
-            self.get_measured_voltages.append(last)
 
-        last = get_measured_currents[-1]
-        while len(self.get_measured_currents) < _max_outputs:
-            self.get_measured_currents.append(last)
+        The length of the output_states list defines the amount of outputs the PSU has.
+        Each list that follows must be smaller or equal to that size.
+        If the list is shorter than the output_states list,
+        it will be expanded to the full size by padding with the last value.
+        Even if it's only a single value, the argument MUST always be a list (e.g. get_voltages = [1.23])
 
-        last = CC_status[-1]
-        while len(self.CC_status) < _max_outputs:
-            self.CC_status.append(last)
-
-        last = CV_status[-1]
-        while len(self.CV_status) < _max_outputs:
-            self.CV_status.append(last)
+        Example:
+        output_states = [false, false, false] # PSU has 3 outputs
+        get_voltages = [1.0] # only one entry given
+        ==> get_voltages = [1.0, 1.0, 1.0] # Same voltage is set for every output
 
-        self.offset = count_type
+        All values are kept in arrays indexed by output (output_nr - count_type)
+        """
+        super().__init__()
+        self._connection = DummyConnection()
+        self._is_dummy_dev = True
+
+        if output_states is None:
+            output_states = [False]
+        n = len(output_states)
+        self.num_outputs = n
+        self.first_output = count_type
+
+        self._output_states = array('B', _pad(output_states, n, False, "output_states"))
+        self._voltages = array('d', _pad(get_voltages, n, 0, "get_voltages"))
+        self._currents = array('d', _pad(get_currents, n, 0, "get_currents"))
+        self._follow_setpoint = get_measured_voltages is None
+        self._measured_voltages = array('d', _pad(get_measured_voltages, n, 0, "get_measured_voltages"))
+        self._measured_currents = array('d', _pad(get_measured_currents, n, 0, "get_measured_currents"))
+        self._cc_status = array('B', _pad(CC_status, n, False, "CC_status"))
+        self._cv_status = array('B', _pad(CV_status, n, True, "CV_status"))
+
+        logger.info(f"Set up dummy PSU with {n} outputs")
+
+    def connect(self):
+        super().connect()
+
+    def _idx(self, output_nr) -> int:
+        idx = output_nr - self.first_output
+        if not 0 <= idx < self.num_outputs:
+            logger.error(f"Output {output_nr} not in {list(self.get_output_numbers())}")
+            raise exceptions.InvalidDeviceParameter
+        return idx
 
     def set_voltage(self, voltage, output_nr):
         logger.debug(f"SET OP {output_nr} Volt {voltage}")
-        self.get_voltages[output_nr - self.offset]
+        self._voltages[self._idx(output_nr)] = voltage
 
     def get_voltage(self, output_nr):
-        logger.debug(f"GET OP {output_nr} Volt")
-        return self.get_voltages[output_nr - self.offset]
+        return self._voltages[self._idx(output_nr)]
 
     def get_measured_voltage(self, output_nr):
-        logger.debug(f"MEAS OP {output_nr} Volt")
-        return self.get_measured_voltages[output_nr - self.offset]
+        idx = self._idx(output_nr)
+        if self._follow_setpoint:
+            return self._voltages[idx] if self._output_states[idx] else 0.0
+        return self._measured_voltages[idx]
 
     def set_current(self, current, output_nr):
         logger.debug(f"SET OP {output_nr} Ampere {current}")
-        self.get_currents[output_nr - self.offset]
+        self._currents[self._idx(output_nr)] = current
 
     def get_current(self, output_nr):
-        logger.debug(f"GET OP {output_nr} Ampere")
-        return self.get_currents[output_nr - self.offset]
+        return self._currents[self._idx(output_nr)]
 
     def get_measured_current(self, output_nr):
-        logger.debug(f"MEAS OP {output_nr} Ampere")
-        return self.get_measured_currents[output_nr - self.offset]
+        return self._measured_currents[self._idx(output_nr)]
+
+    def set_measured_values(self, voltages: Sequence[float] | None = None, currents: Sequence[float] | None = None):
+        """
+        Set the values returned by the measure functions (one per output)
+        @param voltages:  measured voltages, None: unchanged
+        @param currents:  measured currents, None: unchanged
+        @return:
+        """
+        if voltages is not None and self._check_output_count(voltages, "voltages"):
+            self._measured_voltages[:] = array('d', voltages)
+            self._follow_setpoint = False
+        if currents is not None and self._check_output_count(currents, "currents"):
+            self._measured_currents[:] = array('d', currents)
 
     def enable_output(self, output_nr):
         logger.debug(f"SET OP {output_nr} State enabled")
-        self.output_states[output_nr - self.offset] = True
+        self._output_states[self._idx(output_nr)] = True
 
     def disable_output(self, output_nr):
         logger.debug(f"SET OP {output_nr} State disabled")
-        self.output_states[output_nr - self.offset] = False
+        self._output_states[self._idx(output_nr)] = False
 
     def get_output_state(self, output_nr):
-        logger.debug(f"GET OP {output_nr} State")
-        return self.output_states[output_nr - self.offset]
+        return bool(self._output_states[self._idx(output_nr)])
 
     def get_cc_status_live(self, output_nr):
-        logger.debug(f"GET OP {output_nr} CC_State")
-        return self.CC_status[output_nr - self.offset]
+        return bool(self._cc_status[self._idx(output_nr)])
 
     def get_cv_status_live(self, output_nr):
-        logger.debug(f"GET OP {output_nr} CV_State")
-        return self.CV_status[output_nr - self.offset]
+        return bool(self._cv_status[self._idx(output_nr)])
+
+    def set_voltages(self, voltages: Sequence[float]):
+        if self._check_output_count(voltages, "voltages"):
+            self._voltages[:] = array('d', voltages)
+
+    def set_currents(self, currents: Sequence[float]):
+        if self._check_output_count(currents, "currents"):
+            self._currents[:] = array('d', currents)
+
+    def enable_outputs(self, states: Sequence[bool] | None = None):
+        if states is None:
+            states = [True] * self.num_outputs
+        if self._check_output_count(states, "output states"):
+            self._output_states[:] = array('B', (bool(s) for s in states))
+
+    def measure_outputs(self) -> tuple[array, array]:
+        if self._follow_setpoint:
+            voltages = array('d', (v if on else 0.0 for v, on in zip(self._voltages, self._output_states)))
+        else:
+            voltages = array('d', self._measured_voltages)
+        return voltages, array('d', self._measured_currents)
+
+    def measure_all(self, output_nr=0) -> PSUReading:
+        idx = self._idx(output_nr)
+        return PSUReading(time.time(), self.get_measured_voltage(output_nr), self._measured_currents[idx],
+                          cv=bool(self._cv_status[idx]), cc=bool(self._cc_status[idx]), ov=False, ocp=False)
 
     def lock_panel(self):
         pass
 
     def set_local(self):
         pass
-
-    def _send_command(self, command):
-        pass
-
-    def _receive_data(self):
-        pass
-
-    def __getattr__(self, name):
-        def function(*args):
-            print(f"undefined function '{name}'")
-
-        return function
@@ -20,11 +20,14 @@ class HP8954A(device.device):
     _set_tx_or_rx: bool  # True = on, False = off
     _set_rf_monitor: RFMon
 
-    aux_relays = {1: False, 2: False, 3: False, 4: False, 5: False, 6: False, 7: False, 8: False, 9: False,
-                  'A': False, 'B': False, 'C': False, 'D': False, 'E': False, 'F': False, 'G': False}
+    # Auxiliary relays A2K1 - A2K16, bit n of the relay mask is relay_names[n]
+    relay_names = (1, 2, 3, 4, 5, 6, 7, 8, 9, 'A', 'B', 'C', 'D', 'E', 'F', 'G')
+    max_message_length = 32  # relay codes are concatenated into messages of at most this many characters
 
     def __init__(self, visa_resource: str = ""):
         super().__init__()
+        self._relay_mask = 0  # relay states (bit set: relay set with V)
+        self._relay_known = 0  # relays with known state (unknown after connect)
         if not visa_resource == "":
             self._connection = USBTMCConnection(visa_resource=visa_resource)
         else:
@@ -33,12 +36,20 @@ class HP8954A(device.device):
 
     def connect(self):
         super().connect()
+        self._relay_known = 0
         connect_success = self._connection.connect()
 
         if connect_success == 0:
             with self._lock:
                 self._connection.send_command("ID")
                 idn = self._connection.receive_data()
+                cached = self._get_cached_handshake()
+                if cached and idn == cached["identity"]:
+                    self._ok = True
+                    logger.info(f"Connected to {self._friendly_name}")
+                    return
+
+                full_idn = idn
                 if len(idn) >= len(self._expected_device_type):
                     idn = idn[0:len(self._expected_device_type)]
                 else:
@@ -47,57 +58,105 @@ class HP8954A(device.device):
                 if self._check_device_type(idn, self._expected_device_type):
                     self._ok = True
                     logger.info(f"Connected to {self._friendly_name}")
+                    self._store_handshake(full_idn)
 
     def transmit_key_on(self):
         with self._lock:
-            self.send_command("K1")
+            self._send_setting("tx_key", "K1")
+            self._record_setting("tx_rx", "XM")  # keying switches to transmit mode
             self._set_transmit_key = True
             self._set_tx_or_rx = True
 
     def transmit_key_off(self):
         with self._lock:
-            self.send_command("K0")
+            self._send_setting("tx_key", "K0")
             self._set_transmit_key = False
 
     def transmit_mode(self):
         with self._lock:
-            self.send_command("XM")
+            self._send_setting("tx_rx", "XM")
             self._set_tx_or_rx = True
 
     def receive_mode(self):
         with self._lock:
-            self.send_command("RC")
+            self._send_setting("tx_rx", "RC")
+            self._record_setting("tx_key", "K0")  # receive mode releases the transmit key
             self._set_transmit_key = False
             self._set_tx_or_rx = False
 
     def rf_monitor_select(self, rf_mon: RFMon):
         with self._lock:
-            self.send_command(f"F{rf_mon.value}")
+            self._send_setting("rf_monitor", f"F{rf_mon.value}")
+
+    @property
+    def aux_relays(self) -> dict:
+        """
+        Last set relay states
+        @return:  dict relay name -> state (True: V / open)
+        """
+        return {name: bool(self._relay_mask >> bit & 1) for bit, name in enumerate(self.relay_names)}
+
+    def _relay_bit(self, rly: (int, str)) -> int | None:
+        if isinstance(rly, str):
+            rly = rly.upper()
+        if rly not in self.relay_names:
+            logger.error(f"ERROR : Relay {rly} not in relays: {self.relay_names}")
+            return None
+        return self.relay_names.index(rly)
 
     def set_aux_relay(self, rly: (int, str), state: bool):
         """
         Set the auxiliary relay state open / close
-        @param rly:  1-9 for relays A2K1 - A2K9, A-G for relays A2K10 - A2K16
+        @param rly:  1-9 for relays A2K1 - A2K9, A-G for relays A2K10 - A2K16, 0 for all relays
         @param state: true: open / false: close
         @return:
         """
-        if isinstance(rly, str):
-            rly = rly.upper()
-        if not rly in self.aux_relays and not rly == 0:
-            logger.error(f"ERROR : Relay {rly} not in relays: {self.aux_relays}")
-
-        with self._lock:
-            self.send_command(f"{'V' if state else 'U'}{rly}")
+        if rly == 0:
+            with self._lock:
+                self.send_command(f"{'V' if state else 'U'}0")
+                self._relay_mask = (1 << len(self.relay_names)) - 1 if state else 0
+                self._relay_known = (1 << len(self.relay_names)) - 1
+            return
+        self.set_multiple_relays({rly: state})
 
     def set_multiple_relays(self, multi_relays: dict):
         """
-        Set multiple auxiliary relays
+        Set multiple auxiliary relays, only relays that change are sent (concatenated into as few messages as possible)
         @param multi_relays:  dict containing relay reference and boolean state
                               example: {2: True, 'A': False, 5: False}
         @return:
         """
-        for item in multi_relays.items():
-            self.set_aux_relay(item[0], item[1])
+        mask = 0
+        changed = 0
+        for rly, state in multi_relays.items():
+            bit = self._relay_bit(rly)
+            if bit is None:
+                continue
+            changed |= 1 << bit
+            if state:
+                mask |= 1 << bit
+
+        with self._lock:
+            # Relays that are not in the requested state or have an unknown state
+            diff = changed & ((mask ^ self._relay_mask) | ~self._relay_known)
+            codes = [f"{'V' if mask >> bit & 1 else 'U'}{name}" for bit, name in enumerate(self.relay_names)
+                     if diff >> bit & 1]
+            for message in self._pack_codes(codes):
+                self.send_command(message)
+            self._relay_mask = (self._relay_mask & ~changed) | mask
+            self._relay_known |= changed
+
+    def _pack_codes(self, codes: list[str]) -> list[str]:
+        messages: list[str] = []
+        message = ""
+        for code in codes:
+            if message and len(message) + len(code) > self.max_message_length:
+                messages.append(message)
+                message = ""
+            message += code
+        if message:
+            messages.append(message)
+        return messages
 
     def get_tx_rx(self) -> bool:
         return self._set_tx_or_rx
@@ -1,14 +1,18 @@
 from abc import abstractmethod, ABCMeta
 from enum import Enum
-
-from telnetlib import Telnet
-import usbtmc
-from usbtmc.usbtmc import UsbtmcException
-from usb.core import USBTimeoutError, USBError
-import serial
+from typing import TYPE_CHECKING
 
 import logging
 
+from labequipment.framework.latency import LatencyStats
+
+# Backend modules (telnetlib, usbtmc, usb, serial) are imported when the connection type is constructed / used,
+# importing a driver must not depend on every backend being installed
+if TYPE_CHECKING:
+    from telnetlib import Telnet
+    import usbtmc
+    import serial
+
 logger = logging.getLogger('root')
 
 
@@ -37,6 +41,9 @@ class XyphroUSBGPIBConfig(Enum):
 class Connection(metaclass=ABCMeta):
     connection_ok: bool
 
+    def __init__(self):
+        self._latency_stats = LatencyStats()
+
     @property
     @abstractmethod
     def _destination(self) -> str:
@@ -49,6 +56,15 @@ class Connection(metaclass=ABCMeta):
     def disconnect(self):
         pass
 
+    def get_destination(self) -> str:
+        return self._destination
+
+    def get_latency_stats(self) -> LatencyStats:
+        """
+        Measured write / read latencies of this connection (recorded by the device)
+        """
+        return self._latency_stats
+
     @abstractmethod
     def send_command(self, command: str) -> int:
         logger.debug(f"[{type(self).__name__}] [{self._destination}] Sending command '{command}'")
@@ -105,15 +121,18 @@ class TelnetConnection(Connection):
     Establish a telnet connection to the device.
     This is most likely a custom connection that does not follow any standards aside from telnet
     """
-    _tn_connection: Telnet
+    _tn_connection: "Telnet"
     _destination = ""
 
     def __init__(self, host):
+        import telnetlib  # noqa: F401, fail early if the backend is not available
+        super().__init__()
         self._host = host
         self._ip = host.split(':')[0]
         self._port = int(host.split(':')[1])
 
     def connect(self) -> int:
+        from telnetlib import Telnet
         success = 1
         try:
             self._tn_connection = Telnet(self._ip, self._port)
@@ -150,14 +169,16 @@ class TelnetConnection(Connection):
 
 
 class SerialConnection(Connection):
-    _tty_connection: serial.Serial
+    _tty_connection: "serial.Serial"
     _destination = ""
 
     # TODO: implement serial
-    def __init__(self, tty_connection: serial.Serial):
+    def __init__(self, tty_connection: "serial.Serial"):
+        super().__init__()
         self._tty_connection = tty_connection
 
     def connect(self) -> int:
+        import serial
         try:
             self._tty_connection.open()
         except serial.SerialException:
@@ -179,11 +200,14 @@ class USBTMCConnection(Connection):
     If id + serial are used a VISA resource string will be guessed.
     Using the VISA-resource string is more reliable
     """
-    _usbtmc_connection: usbtmc.Instrument
+    _usbtmc_connection: "usbtmc.Instrument"
     _visa_resource_string: str = ""
     _destination = ""
+    connection_ok = False
 
     def __init__(self, visa_resource: str = "", usbtmc_id: str = "", serial_no: str = ""):
+        import usbtmc  # noqa: F401, fail early if the backend is not available
+        super().__init__()
         if not visa_resource == "" and usbtmc_id == "" and serial_no == "":
             # VISA RESOURCE STRING
             if visa_resource.startswith("USB"):  # TODO: check visa string format maybe?
@@ -202,22 +226,30 @@ class USBTMCConnection(Connection):
             # TODO: check if exception raising is ok here???
 
     def connect(self) -> int:
+        import usbtmc
+        from usbtmc.usbtmc import UsbtmcException
         success = 1
         if not self._visa_resource_string == "":
             try:
                 self._usbtmc_connection = usbtmc.Instrument(self._visa_resource_string)
                 self._usbtmc_connection.open()
                 self._destination = self._visa_resource_string
+                self.connection_ok = True
                 success = 0
             except UsbtmcException:
                 logger.error(f"[{type(self).__name__}] USBTMC communication error on {self._visa_resource_string}")
         return success
 
     def disconnect(self):
+        if not self.connection_ok:
+            return
         logger.debug("Disconnect usbtmc")
         self._usbtmc_connection.close()
+        self.connection_ok = False
 
     def send_command(self, command: str) -> int:
+        from usbtmc.usbtmc import UsbtmcException
+        from usb.core import USBError
         super().send_command(command)
         success = 1
         try:
@@ -231,6 +263,8 @@ class USBTMCConnection(Connection):
         return success
 
     def receive_data(self) -> str | None:
+        from usbtmc.usbtmc import UsbtmcException
+        from usb.core import USBTimeoutError, USBError
         data = None
         try:
             data = self._usbtmc_connection.read()
@@ -244,6 +278,8 @@ class USBTMCConnection(Connection):
         return data
 
     def receive_data_raw(self, n_bytes: int = -1) -> bytes | None:
+        from usbtmc.usbtmc import UsbtmcException
+        from usb.core import USBTimeoutError
         data = None
         try:
             data = self._usbtmc_connection.read_raw(n_bytes)
@@ -258,6 +294,7 @@ class USBTMCConnection(Connection):
         return self._visa_resource_string
 
     def xyphro_usb_gpib_adaptor_settings(self, command: XyphroUSBGPIBConfig) -> str | None:
+        from usbtmc.usbtmc import UsbtmcException
         answer = None
         try:
             self._usbtmc_connection.pulse()
@@ -275,6 +312,7 @@ class PrologixUSBAdaptor(SerialConnection):
     _destination = ""
 
     def __init__(self, tty_device: str = ""):
+        import serial
         self._tty_device = tty_device
 
         # TODO: set parameters correctly for PROLOGIX (or check if they can be omitted (usbserial auto??)
@@ -305,6 +343,7 @@ class PrologixUSBConnection(Connection):
     _destination = ""
 
     def __init__(self, gpib_address):
+        super().__init__()
         self.GPIB_address = gpib_address
 
     # TODO: implement
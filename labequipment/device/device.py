@@ -2,12 +2,62 @@ import abc
 from abc import abstractmethod
 
 from labequipment.device.connection import Connection
+from labequipment.framework.globals import GlobalDefaults
+from labequipment.framework.handshake_cache import get_handshake_cache
 
 from threading import RLock
+from typing import Any, Callable
+import functools
 import logging
+import time
 
 logger = logging.getLogger('root')
 
+ANY_WRITE = "*"  # cached query is invalidated by every command written to the instrument
+
+
+def cached_query(ttl: float, invalidated_by: tuple[str, ...] | str = ANY_WRITE):
+    """
+    Cache the answer of a query method of a device for <ttl> seconds.
+    Only for queries without side effects: a query that changes the instrument state (e.g. reading and clearing the
+    error register) must never be cached.
+
+    Usage:
+        @cached_query(ttl=10, invalidated_by=("nplc",))
+        def get_nplc_from_device(self) -> float:
+
+    :param ttl:             time to live of a cached answer in seconds
+    :param invalidated_by:  shadow settings (see device._send_setting) that change the answer,
+                            ANY_WRITE: every command written invalidates the answer
+    :return:
+    """
+    if isinstance(invalidated_by, str):
+        invalidated_by = (invalidated_by,)
+
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not self._query_cache_enabled:
+                return func(self, *args, **kwargs)
+            key = (name, args, tuple(sorted(kwargs.items())))
+            with self._lock:
+                stats = self._query_cache_stats.setdefault(name, {"hits": 0, "misses": 0})
+                entry = self._query_cache.get(key)
+                if entry is not None and time.monotonic() < entry[0]:
+                    stats["hits"] += 1
+                    return entry[1]
+                stats["misses"] += 1
+                ret = func(self, *args, **kwargs)
+                self._query_cache[key] = (time.monotonic() + ttl, ret, invalidated_by)
+                return ret
+
+        wrapper.cached_query_ttl = ttl
+        return wrapper
+
+    return decorator
+
 
 class device(metaclass=abc.ABCMeta):
     _lock: RLock
@@ -18,11 +68,25 @@ class device(metaclass=abc.ABCMeta):
 
     _connection: Connection = NotImplemented
 
+    # Timing model defaults (see utils.timing_model), used until latencies have been measured on the connection
+    bus_write_time: float = 2E-3  # time to write a command in s
+    bus_read_time: float = 5E-3  # time from read request to answer in s (excluding measurement time)
+    command_pacing: float = 0  # minimum time between commands in s
+    # Commands (prefixes) after which the answer waits for a measurement, these reads are not bus latency
+    _measurement_commands: tuple[str, ...] = ()
+
     @abstractmethod
     def __init__(self):
         self._lock = RLock()
         self._ok = False
         self._is_dummy_dev = False
+        self._shadow: dict[str, tuple[str, Any]] = {}  # setting -> (last command written, value)
+        self._shadow_verifiers: dict[str, Callable[[Any], bool]] = {}
+        self._shadow_verify = False
+        self._query_cache: dict[tuple, tuple[float, Any, tuple[str, ...]]] = {}  # key -> (expiry, answer, invalidated_by)
+        self._query_cache_stats: dict[str, dict[str, int]] = {}
+        self._query_cache_enabled = True
+        self._measurement_pending = False  # last command starts a measurement, see _measurement_commands
 
     def __del__(self):
         self.disconnect()
@@ -30,6 +94,7 @@ class device(metaclass=abc.ABCMeta):
     @abstractmethod
     def connect(self):
         logger.debug(f"Connecting to {self._friendly_name}")
+        self.invalidate_shadow()
         if self._is_dummy_dev:
             self._ok = True
             logger.debug(f"Dummy connected")
@@ -38,6 +103,16 @@ class device(metaclass=abc.ABCMeta):
         if self._ok:
             self._connection.disconnect()
 
+    def share_connection(self, connection: Connection, lock: RLock):
+        """
+        Use a transport (and its lock) together with other devices on the same physical adaptor,
+        must be called before connect()
+        :param connection:  connection used by all devices on the adaptor
+        :param lock:        lock of the adaptor, serialises the transfers of all devices using it
+        """
+        self._connection = connection
+        self._lock = lock
+
     def _check_device_type(self, answer, expected):
         """
         check whether the device type is what is being expected
@@ -53,15 +128,171 @@ class device(metaclass=abc.ABCMeta):
         else:
             return True
 
+    def _use_handshake_cache(self) -> bool:
+        return GlobalDefaults.use_handshake_cache and not self._is_dummy_dev
+
+    def _get_cached_handshake(self) -> dict | None:
+        """
+        Get the handshake cache entry of this instrument (only valid after the connection has been opened)
+        :return:  dict with 'identity', 'adaptor' and 'state' or None
+        """
+        if not self._use_handshake_cache():
+            return None
+        return get_handshake_cache().get(self._connection.get_destination())
+
+    def _store_handshake(self, identity: str, adaptor: dict | None = None, state: dict | None = None):
+        """
+        Store the verified identity (and adaptor settings / instrument state) after a successful handshake
+        :param identity:  identity answer of the instrument
+        :param adaptor:   settings applied to the adaptor
+        :param state:     last known instrument state
+        :return:
+        """
+        if self._use_handshake_cache():
+            get_handshake_cache().store(self._connection.get_destination(), identity, adaptor, state)
+
+    def _update_handshake_state(self, state: dict):
+        """
+        Update the last known instrument state in the handshake cache
+        :param state:  state values to update
+        :return:
+        """
+        if self._ok and self._use_handshake_cache():
+            get_handshake_cache().update_state(self._connection.get_destination(), state)
+
+    def _invalidate_handshake(self):
+        if self._use_handshake_cache():
+            get_handshake_cache().invalidate(self._connection.get_destination())
+
+    def _send_setting(self, setting: str, command: str, value: Any = None) -> bool:
+        """
+        Send a configuration command, unless it is identical to the last command written for this setting.
+        In verify mode a skipped command is cross-checked with the verifier of the setting (query from the device)
+        and sent anyway if the device does not match.
+
+        :param setting:  name of the instrument setting
+        :param command:  command that configures the setting
+        :param value:    value of the setting (passed to the verifier, defaults to the command)
+        :return:  True: command was sent, False: skipped (device already in this state)
+        """
+        value = command if value is None else value
+        with self._lock:
+            if self._shadow.get(setting, (None,))[0] == command:
+                verifier = self._shadow_verifiers.get(setting)
+                if not (self._shadow_verify and verifier is not None):
+                    return False
+                self.invalidate_query_cache(setting)  # the verifier has to ask the instrument
+                if verifier(value):
+                    return False
+                logger.warning(f"[{type(self).__name__}] Setting '{setting}' differs from shadow state, resending")
+            self.send_command(command)
+            self._shadow[setting] = (command, value)
+            self.invalidate_query_cache(setting)
+            return True
+
+    def _record_setting(self, setting: str, command: str | None, value: Any = None):
+        """
+        Update the shadow state of a setting changed as side effect of another command (None: state unknown)
+        """
+        if command is None:
+            self._shadow.pop(setting, None)
+        else:
+            self._shadow[setting] = (command, command if value is None else value)
+
+    def _register_shadow_verifier(self, setting: str, verifier: Callable[[Any], bool]):
+        """
+        Register a check for verify mode
+        :param setting:   name of the instrument setting
+        :param verifier:  callable(value) -> True if the device is in this state (usually a *_from_device query)
+        :return:
+        """
+        self._shadow_verifiers[setting] = verifier
+
+    def set_shadow_verify(self, on: bool):
+        """
+        Verify mode: commands skipped because of the shadow state are checked against the device (costs a query)
+        :param on:  True: verify, False: trust the shadow state
+        :return:
+        """
+        self._shadow_verify = on
+
+    def invalidate_shadow(self, setting: str | None = None):
+        """
+        Forget the shadow state (after reset, errors, or commands sent with send_command that change settings)
+        :param setting:  name of the setting or None for all settings
+        :return:
+        """
+        with self._lock:
+            if setting is None:
+                self._shadow.clear()
+            else:
+                self._shadow.pop(setting, None)
+            self.invalidate_query_cache(setting)
+
+    def invalidate_query_cache(self, setting: str | None = None):
+        """
+        Drop cached query answers (see cached_query)
+        :param setting:  drop the answers depending on this setting (and on any write), None: drop all answers
+        :return:
+        """
+        with self._lock:
+            if setting is None:
+                self._query_cache.clear()
+                return
+            for key in [k for k, v in self._query_cache.items() if setting in v[2] or ANY_WRITE in v[2]]:
+                del self._query_cache[key]
+
+    def enable_query_cache(self, on: bool):
+        """
+        Enable / disable the query cache (disabled: every query is sent to the instrument)
+        :param on:  True: cache answers, False: always ask the instrument
+        :return:
+        """
+        with self._lock:
+            self._query_cache_enabled = on
+            self._query_cache.clear()
+
+    def get_query_cache_stats(self) -> dict[str, dict[str, int]]:
+        """
+        Hit / miss counters of the cached queries
+        :return:  dict: method name -> {'hits': int, 'misses': int}
+        """
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._query_cache_stats.items()}
+
     def send_command(self, command: str):
-        self._connection.send_command(command)
+        if '?' not in command:
+            # Commands (not queries) may change the answer of cached queries
+            for key in [k for k, v in self._query_cache.items() if ANY_WRITE in v[2]]:
+                del self._query_cache[key]
+        self._measurement_pending = command.startswith(self._measurement_commands)
+        t_start = time.perf_counter()
+        if self._connection.send_command(command):
+            # Not sent (completely), the state of the instrument is unknown
+            self._shadow.clear()
+            self._query_cache.clear()
+        else:
+            self._connection.get_latency_stats().record("write", time.perf_counter() - t_start)
 
     def receive_data(self) -> str | None:
-        return self._connection.receive_data()
+        t_start = time.perf_counter()
+        data = self._connection.receive_data()
+        if data is not None and not self._measurement_pending:
+            # Answers to measurements include the integration time, the timing model adds that separately
+            self._connection.get_latency_stats().record("read", time.perf_counter() - t_start)
+        return data
 
     def receive_data_raw(self, n_bytes: int = -1) -> bytes:
         return self._connection.receive_data_raw(n_bytes)
 
+    def get_latency(self) -> dict[str, float | None]:
+        """
+        Mean measured bus latencies of this instrument (None if not measured yet)
+        @return:  dict with 'write' and 'read' time in s
+        """
+        stats = self._connection.get_latency_stats()
+        return {"write": stats.mean("write"), "read": stats.mean("read")}
+
     def get_ok(self) -> bool:
         return self._ok
 
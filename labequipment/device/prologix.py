@@ -1,13 +1,16 @@
-import serial
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import serial
 
 
 class Prologix:
     """
     Abstraction class for use with the PROLOGIX USB-to-GPIB adaptor
     """
-    _tty_connection: serial.Serial
+    _tty_connection: "serial.Serial"
 
     def __init__(self, serial_device):
-        pass
+        import serial  # noqa: F401, backend is only needed when an adaptor is used
 
     # TODO: implement prologix
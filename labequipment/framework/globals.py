@@ -6,3 +6,6 @@ class GlobalDefaults:
     file_loglevel = logging.DEBUG
 
     debug_log_path = "./log.txt"  # TODO: choose better path
+    line_frequency = 50  # power line frequency in Hz (integration time of NPLC settings)
+    handshake_cache_path = None  # None: <user cache directory>/labequipment/handshake_cache.json
+    use_handshake_cache = True
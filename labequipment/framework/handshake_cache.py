@@ -0,0 +1,136 @@
+from labequipment.framework.globals import GlobalDefaults
+
+import atexit
+import json
+import os
+import threading
+import logging
+
+logger = logging.getLogger('root')
+
+
+def default_cache_path() -> str:
+    """
+    Path of the cache file in the user cache directory (XDG_CACHE_HOME / LOCALAPPDATA, default ~/.cache)
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "labequipment", "handshake_cache.json")
+
+
+class HandshakeCache:
+    """
+    On-disk cache for the results of the connect handshake of instruments, keyed by resource string (VISA resource).
+
+    Each entry holds the verified identity answer of the instrument, the settings of the adaptor and the last known
+    instrument state. Drivers use it to skip parts of the handshake on reconnect and verify with one cheap query.
+    An entry is dropped as soon as the identity answer differs (e.g. serial number or firmware changed).
+    """
+
+    def __init__(self, path: str | None = None):
+        """
+        @param path:  cache file, default: GlobalDefaults.handshake_cache_path or the user cache directory
+        """
+        path = GlobalDefaults.handshake_cache_path if path is None else path
+        self._path = default_cache_path() if path is None else path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._dirty = False  # state updates not written yet
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, 'r') as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            self._entries = {}
+        except (OSError, ValueError):
+            logger.warning(f"Could not read handshake cache '{self._path}', starting empty")
+            self._entries = {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            with open(self._path, 'w') as f:
+                json.dump(self._entries, f, indent=2)
+            self._dirty = False
+        except OSError:
+            logger.error(f"Could not write handshake cache '{self._path}'")
+
+    def flush(self):
+        """
+        Write pending state updates (see update_state), called at exit
+        """
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def get(self, resource: str) -> dict | None:
+        """
+        Get the cache entry of a resource
+        @param resource:  resource string of the instrument
+        @return:  dict with the keys 'identity', 'adaptor' and 'state' or None if there is no entry
+        """
+        with self._lock:
+            entry = self._entries.get(resource)
+            return None if entry is None else dict(entry)
+
+    def store(self, resource: str, identity: str, adaptor: dict | None = None, state: dict | None = None):
+        """
+        Store the result of a successful handshake
+        @param resource:  resource string of the instrument
+        @param identity:  verified identity answer (including serial number and firmware if the instrument reports it)
+        @param adaptor:   settings applied to the adaptor during the handshake
+        @param state:     last known instrument state
+        @return:
+        """
+        with self._lock:
+            old = self._entries.get(resource, {})
+            if old.get("identity") not in [None, identity]:
+                logger.info(f"Identity of {resource} changed from '{old['identity']}' to '{identity}'")
+                old = {}
+            entry = {"identity": identity,
+                     "adaptor": adaptor if adaptor is not None else old.get("adaptor", {}),
+                     "state": state if state is not None else old.get("state", {})}
+            if entry != self._entries.get(resource):
+                self._entries[resource] = entry
+                self._save()
+
+    def update_state(self, resource: str, state: dict):
+        """
+        Update the last known instrument state of an existing entry.
+        State changes are frequent (e.g. display mode), they are written by flush() / at exit, not on every update.
+        @param resource:  resource string of the instrument
+        @param state:     state values to update
+        @return:
+        """
+        with self._lock:
+            entry = self._entries.get(resource)
+            if entry is not None and any(k not in entry["state"] or entry["state"][k] != v for k, v in state.items()):
+                entry["state"].update(state)
+                self._dirty = True
+
+    def invalidate(self, resource: str):
+        """
+        Remove the entry of a resource, the next connect performs the full handshake
+        @param resource:  resource string of the instrument
+        @return:
+        """
+        with self._lock:
+            if self._entries.pop(resource, None) is not None:
+                logger.debug(f"Invalidated handshake cache entry of {resource}")
+                self._save()
+
+
+_handshake_cache: HandshakeCache | None = None
+
+
+def get_handshake_cache() -> HandshakeCache:
+    """
+    Get the shared handshake cache (created on first use)
+    @return: HandshakeCache
+    """
+    global _handshake_cache
+    if _handshake_cache is None:
+        _handshake_cache = HandshakeCache()
+        atexit.register(_handshake_cache.flush)
+    return _handshake_cache
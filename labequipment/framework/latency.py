@@ -0,0 +1,51 @@
+import threading
+
+
+class LatencyStats:
+    """
+    Running statistics of the bus latency of a connection (command writes and reads).
+    The mean is an exponentially weighted moving average so it follows changes of the bus / adaptor.
+    """
+    smoothing = 0.1  # weight of a new sample in the moving average
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def record(self, kind: str, seconds: float):
+        """
+        Add a sample
+        @param kind:     'write' or 'read'
+        @param seconds:  duration of the operation
+        """
+        with self._lock:
+            stats = self._stats.get(kind)
+            if stats is None:
+                self._stats[kind] = {"count": 1, "mean": seconds, "min": seconds, "max": seconds}
+                return
+            stats["count"] += 1
+            stats["mean"] += self.smoothing * (seconds - stats["mean"])
+            stats["min"] = min(stats["min"], seconds)
+            stats["max"] = max(stats["max"], seconds)
+
+    def get(self, kind: str) -> dict[str, float] | None:
+        """
+        @param kind:  'write' or 'read'
+        @return:  dict with count, mean, min, max in s or None if there are no samples
+        """
+        with self._lock:
+            stats = self._stats.get(kind)
+            return dict(stats) if stats else None
+
+    def mean(self, kind: str, min_count: int = 1) -> float | None:
+        """
+        @return:  mean duration in s or None if there are less than <min_count> samples
+        """
+        stats = self.get(kind)
+        if stats is None or stats["count"] < min_count:
+            return None
+        return stats["mean"]
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
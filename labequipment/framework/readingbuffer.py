@@ -0,0 +1,163 @@
+from array import array
+from typing import Iterable
+
+import logging
+
+logger = logging.getLogger('root')
+
+# status flags of a reading (bit mask)
+FLAG_OVERLOAD = 0x01
+FLAG_ERROR = 0x02
+
+
+class ReadingBufferView:
+    """
+    Zero-copy view on a range of readings of a ReadingBuffer (see ReadingBuffer.__getitem__)
+    """
+
+    def __init__(self, timestamps: memoryview, values: memoryview, channels: memoryview, flags: memoryview):
+        self.timestamps = timestamps
+        self.values = values
+        self.channels = channels
+        self.flags = flags
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return ReadingBufferView(self.timestamps[item], self.values[item], self.channels[item], self.flags[item])
+        return self.timestamps[item], self.values[item], self.channels[item], self.flags[item]
+
+    def __iter__(self):
+        return zip(self.timestamps, self.values, self.channels, self.flags)
+
+    def to_numpy(self):
+        """
+        Get numpy arrays sharing the memory of the buffer (requires numpy)
+        :return:  timestamps, values, channels, flags
+        """
+        import numpy as np
+        return (np.frombuffer(self.timestamps, dtype=np.float64), np.frombuffer(self.values, dtype=np.float64),
+                np.frombuffer(self.channels, dtype=np.uint16), np.frombuffer(self.flags, dtype=np.uint8))
+
+
+class ReadingBuffer:
+    """
+    Compact column store for readings: timestamp (float64), value (float64), channel id (uint16) and
+    status flags (uint8), that is 19 bytes per reading instead of ~100 bytes for a list of Python floats.
+
+    Storage grows geometrically in whole chunks. Growing allocates new columns and copies the readings,
+    views taken before (slices, to_numpy) keep referencing the old columns and stay valid.
+    """
+    chunk_size = 1024  # capacity is always a multiple of this
+    growth_factor = 2
+
+    def __init__(self, capacity: int = chunk_size):
+        self._len = 0
+        self._capacity = 0
+        self._timestamps = array('d')
+        self._values = array('d')
+        self._channels = array('H')
+        self._flags = array('B')
+        self._grow(max(capacity, 1))
+
+    def _grow(self, min_capacity: int):
+        capacity = max(min_capacity, int(self._capacity * self.growth_factor))
+        capacity = -(-capacity // self.chunk_size) * self.chunk_size  # round up to whole chunks
+
+        columns = []
+        for old in (self._timestamps, self._values, self._channels, self._flags):
+            new = array(old.typecode, bytes(capacity * old.itemsize))
+            new[:self._len] = old[:self._len]
+            columns.append(new)
+        self._timestamps, self._values, self._channels, self._flags = columns
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return self._len
+
+    def capacity(self) -> int:
+        return self._capacity
+
+    def nbytes(self) -> int:
+        """Memory used by the allocated columns in bytes"""
+        return self._capacity * sum(c.itemsize for c in (self._timestamps, self._values, self._channels, self._flags))
+
+    def append(self, timestamp: float, value: float, channel: int = 0, flags: int = 0):
+        """
+        Append one reading
+        :param timestamp:  time of the reading in s
+        :param value:      reading
+        :param channel:    channel id (e.g. scanner channel or DMM index)
+        :param flags:      status flags (FLAG_OVERLOAD, FLAG_ERROR)
+        :return:
+        """
+        if self._len == self._capacity:
+            self._grow(self._len + 1)
+        i = self._len
+        self._timestamps[i] = timestamp
+        self._values[i] = value
+        self._channels[i] = channel
+        self._flags[i] = flags
+        self._len += 1
+
+    def extend(self, readings: Iterable[tuple], channel: int = 0):
+        """
+        Append readings from an iterable, e.g. the readings of DMM.stream()
+        :param readings:  iterable of (timestamp, value) or (timestamp, value, channel, flags)
+        :param channel:   channel id for readings without a channel id
+        :return:
+        """
+        for reading in readings:
+            if len(reading) == 2:
+                self.append(reading[0], reading[1], channel)
+            else:
+                self.append(*reading)
+
+    def clear(self):
+        """Remove all readings (capacity is kept)"""
+        if self._len:
+            # Start over with new columns of the same capacity, existing views keep their data
+            capacity = self._capacity
+            self._len = 0
+            self._capacity = 0
+            self._grow(capacity)
+
+    def _view(self) -> ReadingBufferView:
+        n = self._len
+        return ReadingBufferView(memoryview(self._timestamps)[:n], memoryview(self._values)[:n],
+                                 memoryview(self._channels)[:n], memoryview(self._flags)[:n])
+
+    def __getitem__(self, item):
+        """
+        buffer[i] returns (timestamp, value, channel, flags)
+        buffer[a:b] returns a zero-copy ReadingBufferView
+        """
+        return self._view()[item]
+
+    def __iter__(self):
+        return iter(self._view())
+
+    @property
+    def timestamps(self) -> memoryview:
+        return memoryview(self._timestamps)[:self._len]
+
+    @property
+    def values(self) -> memoryview:
+        return memoryview(self._values)[:self._len]
+
+    @property
+    def channels(self) -> memoryview:
+        return memoryview(self._channels)[:self._len]
+
+    @property
+    def flags(self) -> memoryview:
+        return memoryview(self._flags)[:self._len]
+
+    def to_numpy(self):
+        """
+        Get numpy arrays sharing the memory of the buffer (requires numpy)
+        :return:  timestamps, values, channels, flags
+        """
+        return self._view().to_numpy()
@@ -0,0 +1,243 @@
+"""
+Device registry: build the instruments of a bench from a description file instead of hardcoded constructors
+
+Bench description (TOML, YAML with the same structure):
+
+    [adaptors.hp3457a]                           # optional: name a transport, referenced by the instruments
+    transport = "usbtmc"
+    address = "USB::0x03eb::0x2065::GPIB_22_42231343530351E0D1A0::INSTR"
+
+    [instruments.dmm]
+    driver = "HP3457A"
+    adaptor = "hp3457a"
+    options = { reset_after_connect = true }     # keyword arguments of the driver
+
+    [instruments.psu]
+    driver = "HP6632B"
+    transport = "usbtmc"                         # default "usbtmc" if an address is given, else "dummy"
+    address = "USB::0x03eb::0x2065::GPIB_05_42231343530351E0D1A1::INSTR"
+
+    [instruments.source]
+    driver = "dummyPSU"                          # no address: dummy instrument
+
+Driver names are resolved through the built-in table and the entry point group 'labequipment.drivers'
+(name = "package.module:Class"). A driver module is only imported when an instrument uses it, an instrument is
+only constructed and connected when it is first requested from the Bench.
+
+Instruments with the same transport and address share one connection object and one lock, this needs a transport
+that addresses several instruments (see _shareable_transports). A USBTMC resource is always one instrument: the
+USB-GPIB adaptor enumerates one USB device per GPIB instrument (the GPIB address is part of the serial number), so
+USBTMC resources are not shared and each instrument needs its own address.
+"""
+from importlib import import_module
+from threading import RLock
+from typing import TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    from labequipment.device.connection import Connection
+    from labequipment.device.device import device
+
+logger = logging.getLogger('root')
+
+entry_point_group = "labequipment.drivers"
+
+# Built-in drivers: name -> "module:Class"
+_builtin_drivers = {
+    "HP3457A": "labequipment.device.DMM.HP3457A:HP3457A",
+    "HP34401A": "labequipment.device.DMM.HP34401A:HP34401A",
+    "HP6632B": "labequipment.device.PSU.HP6632B:HP6632B",
+    "dummyPSU": "labequipment.device.PSU.dummyPSU:dummyPSU",
+    "MARCONI_2019": "labequipment.device.AWG.MARCONI_2019:MARCONI_2019",
+    "ORX_402A": "labequipment.device.AWG.ORX_402A:ORX_402A",
+    "HP8954A": "labequipment.device.SWITCH.HP894A:HP8954A",
+}
+
+# Driver constructor keyword of the address per transport
+_transport_kwargs = {
+    "usbtmc": "visa_resource",
+    "dummy": None,
+}
+
+# Transports that can serve several instruments through one connection object
+_shareable_transports = ("dummy",)
+
+_drivers: dict[str, str] | None = None  # built-in + entry points, read on first lookup
+_driver_classes: dict[str, type] = {}
+
+
+def _get_drivers() -> dict[str, str]:
+    global _drivers
+    if _drivers is None:
+        from importlib.metadata import entry_points
+        _drivers = dict(_builtin_drivers)
+        for ep in entry_points(group=entry_point_group):
+            _drivers[ep.name] = ep.value  # the module is not imported before the driver is used
+    return _drivers
+
+
+def register_driver(name: str, target: str):
+    """
+    Add a driver at runtime
+    @param name:    driver name used in bench descriptions
+    @param target:  "module:Class"
+    @return:
+    """
+    _get_drivers()[name] = target
+    _driver_classes.pop(name, None)
+
+
+def available_drivers() -> list[str]:
+    return sorted(_get_drivers())
+
+
+def get_driver_class(name: str) -> type:
+    """
+    Import the driver module of <name> (once) and return the driver class
+    """
+    if name not in _driver_classes:
+        drivers = _get_drivers()
+        if name not in drivers:
+            raise ValueError(f"Unknown driver '{name}', known drivers: {sorted(drivers)}")
+        module, cls = drivers[name].split(':')
+        _driver_classes[name] = getattr(import_module(module), cls)
+    return _driver_classes[name]
+
+
+def _create_transport(transport: str, address: str) -> "Connection":
+    from labequipment.device.connection import DummyConnection, USBTMCConnection
+    if transport == "usbtmc":
+        return USBTMCConnection(visa_resource=address)
+    if transport == "dummy":
+        return DummyConnection()
+    raise ValueError(f"Unknown transport '{transport}'")
+
+
+class Bench:
+    """
+    Instruments of a bench description, constructed and connected on first use
+
+    Usage:
+        bench = Bench.from_toml("bench.toml")
+        dmm = bench["dmm"]      # imports the driver, constructs and connects the instrument
+        ...
+        bench.close()
+    """
+
+    def __init__(self, description: dict):
+        self._lock = RLock()
+        self._adaptors: dict[str, dict] = description.get("adaptors", {})
+        self._config: dict[str, dict] = {}
+        self._instruments: dict[str, "device"] = {}
+        self._transports: dict[tuple[str, str], tuple["Connection", RLock]] = {}
+
+        users: dict[tuple[str, str], int] = {}
+        for name, cfg in description.get("instruments", {}).items():
+            if "driver" not in cfg:
+                raise ValueError(f"Instrument '{name}': no driver")
+            transport, address = self._resolve_transport(name, cfg)
+            if transport not in _transport_kwargs:
+                raise ValueError(f"Instrument '{name}': unknown transport '{transport}'")
+            self._config[name] = {"driver": cfg["driver"], "transport": transport, "address": address,
+                                  "options": cfg.get("options", {})}
+            if address:
+                users[(transport, address)] = users.get((transport, address), 0) + 1
+        self._shared = {key for key, n in users.items() if n > 1}
+        for transport, address in self._shared:
+            if transport not in _shareable_transports:
+                raise ValueError(f"Transport '{transport}' ({address}) can not be shared by several instruments, "
+                                 f"each instrument needs its own address")
+
+    @classmethod
+    def from_toml(cls, path: str) -> "Bench":
+        import tomllib
+        with open(path, "rb") as f:
+            return cls(tomllib.load(f))
+
+    @classmethod
+    def from_yaml(cls, path: str) -> "Bench":
+        import yaml
+        with open(path, "r") as f:
+            return cls(yaml.safe_load(f))
+
+    @classmethod
+    def from_file(cls, path: str) -> "Bench":
+        if path.endswith((".yaml", ".yml")):
+            return cls.from_yaml(path)
+        return cls.from_toml(path)
+
+    def _resolve_transport(self, name: str, cfg: dict) -> tuple[str, str]:
+        if "adaptor" in cfg:
+            if cfg["adaptor"] not in self._adaptors:
+                raise ValueError(f"Instrument '{name}': unknown adaptor '{cfg['adaptor']}'")
+            cfg = self._adaptors[cfg["adaptor"]]
+        address = cfg.get("address", cfg.get("resource", ""))
+        return cfg.get("transport", "usbtmc" if address else "dummy"), address
+
+    def names(self) -> list[str]:
+        return list(self._config)
+
+    def get_driver_name(self, name: str) -> str:
+        return self._config[name]["driver"]
+
+    def get(self, name: str, connect: bool = True) -> "device":
+        """
+        Get an instrument, constructed (and connected) on first use
+        @param name:     instrument name in the bench description
+        @param connect:  connect a new instrument
+        @return:  instrument, check get_ok() for the connection state
+        """
+        with self._lock:
+            if name in self._instruments:
+                return self._instruments[name]
+            if name not in self._config:
+                raise KeyError(f"Unknown instrument '{name}', bench has {self.names()}")
+            instrument = self._create(name)
+            self._instruments[name] = instrument
+        if connect:
+            instrument.connect()
+            if not instrument.get_ok():
+                logger.error(f"Instrument '{name}' ({self._config[name]['driver']}) not connected")
+        return instrument
+
+    def __getitem__(self, name: str) -> "device":
+        return self.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._config
+
+    def _create(self, name: str) -> "device":
+        cfg = self._config[name]
+        cls = get_driver_class(cfg["driver"])
+        kwargs = dict(cfg["options"])
+        address_kwarg = _transport_kwargs[cfg["transport"]]
+        if address_kwarg and cfg["address"]:
+            kwargs[address_kwarg] = cfg["address"]
+        instrument = cls(**kwargs)
+
+        key = (cfg["transport"], cfg["address"])
+        if key in self._shared:
+            if key not in self._transports:
+                self._transports[key] = (_create_transport(*key), RLock())
+            instrument.share_connection(*self._transports[key])
+        logger.debug(f"Created instrument '{name}' ({cfg['driver']})")
+        return instrument
+
+    def connected(self) -> dict[str, "device"]:
+        """
+        Instruments that have been constructed so far
+        """
+        with self._lock:
+            return dict(self._instruments)
+
+    def close(self):
+        """
+        Disconnect all constructed instruments and shared transports
+        """
+        with self._lock:
+            for instrument in self._instruments.values():
+                instrument.disconnect()
+            for connection, _ in self._transports.values():
+                connection.disconnect()
+            self._instruments.clear()
+            self._transports.clear()
@@ -0,0 +1,90 @@
+from labequipment.device.AWG.AWG import AWG
+from labequipment.device.DMM.DMM import DMM, MeasFunction
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+import time
+import logging
+
+logger = logging.getLogger('root')
+
+
+class FrequencyResponse:
+    """
+    Result of frequency_response(): one magnitude (AC voltage reading) per frequency
+    """
+
+    def __init__(self, frequencies, magnitudes, settle_times, duration: float):
+        self.frequencies = frequencies
+        self.magnitudes = magnitudes
+        self.settle_times = settle_times
+        self.duration = duration
+
+    @property
+    def points_per_second(self) -> float:
+        return len(self.frequencies) / self.duration if self.duration > 0 else 0
+
+    def to_db(self, reference: float | None = None):
+        """
+        Magnitudes in dB relative to <reference> (default: maximum magnitude)
+        """
+        import numpy as np
+        reference = np.max(self.magnitudes) if reference is None else reference
+        return 20 * np.log10(self.magnitudes / reference)
+
+
+def frequency_response(awg: AWG, dmm: DMM, frequencies: Sequence[float], meas_range: float | int = DMM.CONST_AUTO,
+                       settle_periods: float = 5, min_settle: float = 0, output_nr: int = 0) -> FrequencyResponse:
+    """
+    Measure the AC voltage response over <frequencies> (AWG drives the DUT, DMM measures its output).
+
+    The settling time per point adapts to the frequency: the longer of <settle_periods> signal periods,
+    the settling time of the DMM AC filter selected for the frequency and <min_settle>.
+    Sweeping from high to low frequencies keeps the fast filters as long as possible.
+    The DMM is configured for AC voltage once and read with read(): a MEAS? query would reset the AC filter.
+
+    Writes to the AWG (including its command pacing) run in a worker: the next frequency is sent as soon as
+    the DMM reading is in, while the DMM filter for the next point is selected. The settling wait starts
+    when the write has finished.
+
+    :param awg:             signal source
+    :param dmm:             AC voltmeter
+    :param frequencies:     frequencies in Hz
+    :param meas_range:      DMM range (fixed range avoids autorange delays)
+    :param settle_periods:  number of signal periods to wait after a frequency change
+    :param min_settle:      minimum settling time in s
+    :param output_nr:       AWG output
+    :return:  FrequencyResponse with magnitudes (V rms) and achieved points per second
+    """
+    import numpy as np
+
+    n = len(frequencies)
+    magnitudes = np.zeros(n)
+    settle_times = np.zeros(n)
+    if n == 0:
+        return FrequencyResponse(np.array(frequencies, dtype=float), magnitudes, settle_times, 0)
+
+    def write_frequency(frequency: float) -> float:
+        awg.set_frequency(frequency, output_nr)
+        return time.perf_counter()
+
+    dmm.configure_function(MeasFunction.ACV, meas_range)  # before the filter, CONF resets it
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(write_frequency, frequencies[0])
+        for idx, frequency in enumerate(frequencies):
+            settle = max(min_settle, settle_periods / frequency, dmm.configure_ac_filter(frequency))
+            written = pending.result()
+            remaining = written + settle - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            settle_times[idx] = time.perf_counter() - written
+
+            magnitudes[idx] = dmm.read()
+            if idx + 1 < n:
+                pending = pool.submit(write_frequency, frequencies[idx + 1])
+
+    duration = time.perf_counter() - start
+    result = FrequencyResponse(np.array(frequencies, dtype=float), magnitudes, settle_times, duration)
+    logger.info(f"Frequency response: {n} points in {duration:.2f}s ({result.points_per_second:.2f} points/s)")
+    return result
@@ -0,0 +1,152 @@
+from labequipment.device.DMM.DMM import DMM, MeasFunction
+from labequipment.device.PSU.PSU import PSU
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+import time
+import logging
+
+logger = logging.getLogger('root')
+
+
+class SettleRule:
+    """
+    When to take the reading after a setpoint was applied
+
+    fixed:   wait <delay> seconds, then read once
+    stable:  wait <delay> seconds, then read until two consecutive readings of every DMM differ by less than
+             <abs_tol> + <rel_tol> * |reading| or until <timeout> is reached
+    """
+
+    def __init__(self, delay: float = 0, stable: bool = False, rel_tol: float = 1E-3, abs_tol: float = 1E-6,
+                 timeout: float = 5):
+        self.delay = delay
+        self.stable = stable
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self.timeout = timeout
+
+    @classmethod
+    def fixed(cls, delay: float):
+        return cls(delay=delay)
+
+    @classmethod
+    def until_stable(cls, rel_tol: float = 1E-3, abs_tol: float = 1E-6, timeout: float = 5, min_delay: float = 0):
+        return cls(delay=min_delay, stable=True, rel_tol=rel_tol, abs_tol=abs_tol, timeout=timeout)
+
+    def is_stable(self, previous: list[float], current: list[float]) -> bool:
+        return all(abs(c - p) <= self.abs_tol + self.rel_tol * abs(c) for p, c in zip(previous, current))
+
+
+def iv_sweep(psu: PSU, dmms: Sequence[DMM], setpoints: Sequence[float], current_limit: float,
+             settle: SettleRule | None = None, functions: Sequence[MeasFunction] | None = None,
+             meas_ranges: Sequence[float | int] | None = None, output_nr: int = 0, stop_on_compliance: bool = False):
+    """
+    Sweep the PSU voltage over <setpoints> and read the DMMs at every point.
+
+    The work is pipelined: the next setpoint is staged in the PSU (arm_step) and the PSU readback is taken while
+    the DMMs integrate, the DMMs are read in parallel. Drivers with triggered stepping (HP6632B) only need a
+    trigger to apply the staged setpoint.
+
+    Result fields: setpoint, time (s after start), settle_time, psu_voltage, psu_current, dmm0 ... dmmN, compliance
+    A point is in compliance if the PSU reports constant current mode or the current reached 99% of <current_limit>.
+    Points with a failed PSU readback have NaN PSU values and are never in compliance.
+    The output state and the setpoints of the PSU are restored after the sweep.
+
+    :param psu:                 PSU to sweep
+    :param dmms:                DMMs to read at every point
+    :param setpoints:           voltages in V
+    :param current_limit:       current limit (compliance) in A
+    :param settle:              settling rule, default: fixed 0.1s
+    :param functions:           measurement function per DMM, default DCV
+    :param meas_ranges:         range per DMM, default auto
+    :param output_nr:           PSU output to sweep
+    :param stop_on_compliance:  stop the sweep at the first point in compliance
+    :return:  numpy structured array, one row per measured point
+    """
+    import numpy as np
+
+    settle = SettleRule.fixed(0.1) if settle is None else settle
+    functions = [MeasFunction.DCV] * len(dmms) if functions is None else functions
+    meas_ranges = [DMM.CONST_AUTO] * len(dmms) if meas_ranges is None else meas_ranges
+    if len(functions) != len(dmms) or len(meas_ranges) != len(dmms):
+        raise ValueError(f"Need one function and range per DMM ({len(dmms)} DMMs)")
+    for dmm, function in zip(dmms, functions):
+        # Checked before the PSU output is touched, measure() would only fail at the first point
+        if function not in dmm.measure_functions:
+            raise ValueError(f"{dmm._friendly_name} can not measure {function}")
+    readers = [lambda dmm=dmm, f=f, r=r: dmm.measure(f, r) for dmm, f, r in zip(dmms, functions, meas_ranges)]
+
+    dtype = [("setpoint", "f8"), ("time", "f8"), ("settle_time", "f8"), ("psu_voltage", "f8"),
+             ("psu_current", "f8")] + [(f"dmm{i}", "f8") for i in range(len(dmms))] + [("compliance", "?")]
+    result = np.zeros(len(setpoints), dtype=dtype)
+    if len(setpoints) == 0:
+        return result
+
+    def read_all(pool) -> list[float]:
+        return [f.result() for f in [pool.submit(reader) for reader in readers]]
+
+    def psu_readback_and_stage(next_idx: int):
+        reading = psu.measure_all(output_nr)
+        if next_idx < len(setpoints):
+            psu.arm_step(setpoints[next_idx], None, output_nr)
+        return reading
+
+    previous_state = psu.get_output_state(output_nr)
+    previous_voltage = psu.get_voltage(output_nr)
+    previous_current = psu.get_current(output_nr)
+
+    n = 0
+    try:
+        psu.set_current(current_limit, output_nr)
+        psu.arm_step(setpoints[0], None, output_nr)
+        psu.enable_output(output_nr)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(dmms) + 1) as pool:
+            for idx, setpoint in enumerate(setpoints):
+                psu.fire_step()
+                t_applied = time.perf_counter()
+                if settle.delay > 0:
+                    time.sleep(settle.delay)
+
+                psu_future = pool.submit(psu_readback_and_stage, idx + 1)
+                values = read_all(pool)
+                if settle.stable:
+                    while time.perf_counter() - t_applied < settle.timeout:
+                        previous, values = values, read_all(pool)
+                        if settle.is_stable(previous, values):
+                            break
+                    else:
+                        logger.warning(f"Setpoint {setpoint}V not stable within {settle.timeout}s")
+                reading = psu_future.result()
+
+                row = result[idx]
+                row["setpoint"] = setpoint
+                row["time"] = t_applied - start
+                row["settle_time"] = time.perf_counter() - t_applied
+                for i, value in enumerate(values):
+                    row[f"dmm{i}"] = value
+                if reading.valid:
+                    row["psu_voltage"] = reading.voltage
+                    row["psu_current"] = reading.current
+                    row["compliance"] = bool(reading.cc) or abs(reading.current) >= 0.99 * current_limit
+                else:
+                    # Failed readback: no PSU values and no compliance decision for this point
+                    logger.warning(f"PSU readback failed at {setpoint}V")
+                    row["psu_voltage"] = np.nan
+                    row["psu_current"] = np.nan
+                n = idx + 1
+
+                if row["compliance"] and stop_on_compliance:
+                    logger.info(f"Compliance reached at {setpoint}V, stopping sweep")
+                    break
+    finally:
+        # Leave the PSU as it was found, also if a reading fails
+        psu.disarm_step()
+        if not previous_state:
+            psu.disable_output(output_nr)
+        psu.set_voltage(previous_voltage, output_nr)
+        psu.set_current(previous_current, output_nr)
+
+    return result[:n]
@@ -0,0 +1,267 @@
+"""
+Declarative measurement plans
+
+A plan (TOML) lists the instruments and the steps of a test sequence:
+
+    [instruments.psu]
+    driver = "HP6632B"                          # see framework.registry for drivers and transport settings
+    resource = "USB::0x1234::0x5678::INSTR"   # omit for a dummy instrument
+
+    [instruments.dmm]
+    driver = "HP3457A"
+
+    [[steps]]
+    name = "supply_5v"
+    instrument = "psu"
+    set = { voltage = 5.0, current = 0.1, output = true }
+    settle = 0.2                                # s after the setpoint
+
+    [[steps]]
+    name = "vout"
+    instrument = "dmm"
+    measure = "DCV"                             # MeasFunction name
+    range = 10                                  # optional, default auto
+    count = 5                                   # optional, default 1
+
+    [[steps]]
+    name = "r_ref"
+    instrument = "dmm"
+    measure = "OHM"
+    after = []                                  # explicit dependencies: independent of the setpoints
+
+Dependencies: a setpoint step runs after the previous setpoint and all measurements that belong to it,
+a measurement belongs to the last setpoint before it (or depends on the steps named in <after>).
+The compiler reorders the measurements within these limits to minimise function and range changes.
+"""
+from labequipment.device.DMM.DMM import DMM, MeasFunction
+from labequipment.framework.registry import Bench
+
+from typing import TYPE_CHECKING
+import time
+import logging
+
+if TYPE_CHECKING:
+    from labequipment.utils.timing_model import TimingModel
+
+logger = logging.getLogger('root')
+
+
+class PlanStep:
+    """
+    One step of a measurement plan: a setpoint (set) or a measurement (measure)
+    """
+
+    def __init__(self, index: int, name: str, instrument: str, setpoint: dict | None = None,
+                 function: MeasFunction | None = None, meas_range: float | int = DMM.CONST_AUTO, count: int = 1,
+                 settle: float = 0, after: list[str] | None = None):
+        self.index = index  # position in the plan file
+        self.name = name
+        self.instrument = instrument
+        self.setpoint = setpoint
+        self.function = function
+        self.meas_range = meas_range
+        self.count = count
+        self.settle = settle
+        self.after = after  # None: implicit dependencies
+        self.depends_on: set[str] = set()
+
+    @property
+    def is_measurement(self) -> bool:
+        return self.function is not None
+
+    @property
+    def mode(self) -> tuple:
+        """
+        Instrument configuration needed by a measurement
+        """
+        return self.function, self.meas_range
+
+    def __repr__(self):
+        what = f"measure {self.function.name} range {self.meas_range}" if self.is_measurement else f"set {self.setpoint}"
+        return f"PlanStep({self.name}: {self.instrument} {what})"
+
+
+class MeasurementPlan:
+    """
+    Instruments and steps of a plan, see module documentation for the format
+    """
+
+    def __init__(self, instruments: dict[str, dict], steps: list[PlanStep]):
+        self.instruments = instruments
+        self.steps = steps
+        self._resolve_dependencies()
+
+    @classmethod
+    def from_toml(cls, path: str) -> "MeasurementPlan":
+        import tomllib
+        with open(path, "rb") as f:
+            return cls.from_dict(tomllib.load(f))
+
+    @classmethod
+    def from_dict(cls, plan: dict) -> "MeasurementPlan":
+        instruments = plan.get("instruments", {})
+        steps: list[PlanStep] = []
+        for idx, step in enumerate(plan.get("steps", [])):
+            name = step.get("name", f"step{idx}")
+            instrument = step["instrument"]
+            if instrument not in instruments:
+                raise ValueError(f"Step '{name}': unknown instrument '{instrument}'")
+            if ("set" in step) == ("measure" in step):
+                raise ValueError(f"Step '{name}': needs either 'set' or 'measure'")
+            steps.append(PlanStep(idx, name, instrument, setpoint=step.get("set"),
+                                  function=MeasFunction[step["measure"]] if "measure" in step else None,
+                                  meas_range=step.get("range", DMM.CONST_AUTO), count=step.get("count", 1),
+                                  settle=step.get("settle", 0), after=step.get("after")))
+        return cls(instruments, steps)
+
+    def _resolve_dependencies(self):
+        names = [s.name for s in self.steps]
+        if len(set(names)) != len(names):
+            raise ValueError("Step names must be unique")
+        last_set: PlanStep | None = None
+        belonging: list[PlanStep] = []  # measurements of the last setpoint
+        for step in self.steps:
+            if step.after is not None:
+                unknown = set(step.after) - set(names[:step.index])
+                if unknown:
+                    raise ValueError(f"Step '{step.name}': unknown or later dependencies {unknown}")
+                step.depends_on = set(step.after)
+            elif step.is_measurement:
+                step.depends_on = {last_set.name} if last_set else set()
+            else:
+                step.depends_on = {s.name for s in belonging} | ({last_set.name} if last_set else set())
+            if not step.is_measurement:
+                last_set = step
+                belonging = []
+            elif step.after is None:
+                belonging.append(step)
+
+
+class Schedule:
+    """
+    Compiled execution order of a plan
+    """
+
+    def __init__(self, plan: MeasurementPlan, steps: list[PlanStep], cost_model: "TimingModel"):
+        self.plan = plan
+        self.steps = steps
+        self.cost_model = cost_model
+        self.actual_time: float | None = None  # set by run_schedule()
+
+    def mode_switches(self, steps: list[PlanStep] | None = None) -> int:
+        steps = self.steps if steps is None else steps
+        modes: dict[str, tuple] = {}
+        switches = 0
+        for step in steps:
+            if step.is_measurement:
+                if modes.get(step.instrument) != step.mode:
+                    switches += 1
+                modes[step.instrument] = step.mode
+        return switches
+
+    def predict(self, steps: list[PlanStep] | None = None) -> float:
+        """
+        Predicted execution time in s (default: of the compiled order)
+        """
+        steps = self.steps if steps is None else steps
+        return sum(self.cost_model.instrument_times(steps).values())
+
+    def print_summary(self):
+        print(f"{len(self.steps)} steps, mode switches: {self.mode_switches(self.plan.steps)} as written, "
+              f"{self.mode_switches()} compiled")
+        print(f"predicted time: {self.predict(self.plan.steps):.3f}s as written, {self.predict():.3f}s compiled")
+
+
+def compile_plan(plan: MeasurementPlan, cost_model: "TimingModel | None" = None) -> Schedule:
+    """
+    Order the steps of a plan: measurements whose dependencies are met are run before the next setpoint,
+    preferring the measurement with the lowest switch cost from the current instrument configuration
+    (same function and range first), ties are kept in plan order.
+    :param plan:        measurement plan
+    :param cost_model:  time estimates, default TimingModel with the driver defaults
+    :return:  Schedule
+    """
+    if cost_model is None:
+        from labequipment.utils.timing_model import TimingModel
+        cost_model = TimingModel(plan)
+    pending = list(plan.steps)
+    done: set[str] = set()
+    modes: dict[str, tuple] = {}
+    order: list[PlanStep] = []
+
+    while pending:
+        ready = [s for s in pending if s.depends_on <= done]
+        if not ready:
+            raise ValueError(f"Circular dependencies in steps {[s.name for s in pending]}")
+        measurements = [s for s in ready if s.is_measurement]
+        if measurements:
+            step = min(measurements, key=lambda s: (cost_model.switch_time(modes.get(s.instrument), s), s.index))
+            modes[step.instrument] = step.mode
+        else:
+            step = min(ready, key=lambda s: s.index)
+        order.append(step)
+        pending.remove(step)
+        done.add(step.name)
+
+    return Schedule(plan, order, cost_model)
+
+
+def _create_bench(plan: MeasurementPlan) -> Bench:
+    """
+    Construct and connect all instruments of a plan, the caller closes the bench
+    """
+    bench = Bench({"instruments": plan.instruments})
+    for name in bench.names():
+        if not bench[name].get_ok():
+            bench.close()
+            raise ConnectionError(f"Instrument '{name}' ({bench.get_driver_name(name)}) not connected")
+    return bench
+
+
+def _apply_setpoint(instrument, setpoint: dict):
+    output_nr = setpoint.get("output_nr", getattr(instrument, "first_output", 0))
+    if "current" in setpoint:
+        instrument.set_current(setpoint["current"], output_nr)
+    if "voltage" in setpoint:
+        instrument.set_voltage(setpoint["voltage"], output_nr)
+    if "output" in setpoint:
+        if setpoint["output"]:
+            instrument.enable_output(output_nr)
+        else:
+            instrument.disable_output(output_nr)
+
+
+def run_schedule(schedule: Schedule, instruments: dict | None = None, verbose: bool = True) -> dict[str, list[float]]:
+    """
+    Execute a compiled plan on the drivers
+    :param schedule:     compiled with compile_plan()
+    :param instruments:  connected instruments by plan name, default: created from the plan (and disconnected
+                         at the end)
+    :param verbose:      print predicted and actual time
+    :return:  readings per measurement step name
+    """
+    bench = None
+    if instruments is None:
+        bench = _create_bench(schedule.plan)
+        instruments = bench.connected()
+    results: dict[str, list[float]] = {}
+    start = time.perf_counter()
+    try:
+        for step in schedule.steps:
+            instrument = instruments[step.instrument]
+            if step.is_measurement:
+                results[step.name] = [instrument.measure(step.function, step.meas_range) for _ in range(step.count)]
+            else:
+                _apply_setpoint(instrument, step.setpoint)
+                if step.settle > 0:
+                    time.sleep(step.settle)
+    finally:
+        if bench is not None:
+            bench.close()
+    actual = time.perf_counter() - start
+
+    if verbose:
+        schedule.print_summary()
+        print(f"actual time: {actual:.3f}s")
+    schedule.actual_time = actual
+    return results
@@ -0,0 +1,260 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from enum import Enum
+from typing import Callable
+import threading
+import heapq
+import math
+import time
+import logging
+
+logger = logging.getLogger('root')
+
+
+class OverrunPolicy(Enum):
+    SKIP = "skip"  # drop the samples that were missed, continue on the next deadline of the grid
+    CATCH_UP = "catch up"  # run the missed samples as soon as possible (up to max_catch_up)
+
+
+class PollStats:
+    """
+    Timing statistics of a poll job
+    jitter:    delay from the deadline to the start of the sample in s
+    duration:  execution time of the sample in s
+    """
+    __slots__ = ("samples", "skipped", "overruns", "errors", "jitter_mean", "jitter_std", "jitter_max",
+                 "duration_mean", "duration_max")
+
+    def __init__(self, samples: int, skipped: int, overruns: int, errors: int, jitter_mean: float,
+                 jitter_std: float, jitter_max: float, duration_mean: float, duration_max: float):
+        self.samples = samples
+        self.skipped = skipped
+        self.overruns = overruns
+        self.errors = errors
+        self.jitter_mean = jitter_mean
+        self.jitter_std = jitter_std
+        self.jitter_max = jitter_max
+        self.duration_mean = duration_mean
+        self.duration_max = duration_max
+
+    def __repr__(self):
+        return (f"PollStats(samples={self.samples}, skipped={self.skipped}, overruns={self.overruns}, "
+                f"errors={self.errors}, jitter={self.jitter_mean * 1E3:.2f}ms mean/{self.jitter_max * 1E3:.2f}ms max, "
+                f"duration={self.duration_mean * 1E3:.2f}ms mean/{self.duration_max * 1E3:.2f}ms max)")
+
+
+class PollJob:
+    """
+    A sample function run every <interval> seconds, see PeriodicPoller.add_job()
+    """
+
+    def __init__(self, name: str, function: Callable, interval: float, policy: OverrunPolicy, max_catch_up: int,
+                 offset: float):
+        self.name = name
+        self.function = function
+        self.interval = interval
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.offset = offset
+        self.last_value = None  # return value of the last sample
+
+        self._start = 0.0  # monotonic time of deadline 0
+        self._index = 0  # index of the next deadline
+        self._running = False
+        self._backlog: deque[float] = deque()  # deadlines waiting for the running sample (CATCH_UP)
+
+        self._samples = 0
+        self._skipped = 0
+        self._overruns = 0
+        self._errors = 0
+        self._jitter_sum = 0.0
+        self._jitter_sq_sum = 0.0
+        self._jitter_max = 0.0
+        self._duration_sum = 0.0
+        self._duration_max = 0.0
+
+    def deadline(self) -> float:
+        # Computed from the start time (not accumulated), so rounding errors don't add up to drift
+        return self._start + self._index * self.interval
+
+    def get_stats(self) -> PollStats:
+        n = self._samples
+        jitter_mean = self._jitter_sum / n if n else 0.0
+        jitter_var = self._jitter_sq_sum / n - jitter_mean ** 2 if n else 0.0
+        return PollStats(n, self._skipped, self._overruns, self._errors, jitter_mean, math.sqrt(max(jitter_var, 0)),
+                         self._jitter_max, self._duration_sum / n if n else 0.0, self._duration_max)
+
+
+class PeriodicPoller:
+    """
+    Run sample jobs of many devices at fixed rates.
+
+    The deadlines of a job are start + k * interval on the monotonic clock, so the sampling instants don't drift
+    by the execution time as with time.sleep(interval) loops. The samples are dispatched to a worker pool: a slow
+    instrument only delays its own job. A job never runs concurrently with itself; a deadline that is reached
+    while the previous sample still runs is an overrun and is handled by the job's OverrunPolicy.
+
+    Example:
+        poller = PeriodicPoller()
+        poller.add_job("psu", lambda: log.write_to_log(psu.measure_all(1)), interval=1.0)
+        poller.add_job("dmm", lambda: log.write_to_log(dmm.voltage()), interval=10.0)
+        poller.start()
+        ...
+        poller.stop()
+        print(poller.get_stats())
+    """
+
+    def __init__(self, max_workers: int = 8, clock: Callable[[], float] = time.monotonic):
+        """
+        @param max_workers:  size of the worker pool (at least the number of jobs that may run at the same time)
+        @param clock:        monotonic time in s, the deadlines and statistics use this clock
+        """
+        self._max_workers = max_workers
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._jobs: dict[str, PollJob] = {}
+        self._queue: list[tuple[float, int, str]] = []  # heap of (deadline, sequence, job name)
+        self._sequence = 0
+        self._pool: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = False
+
+    def add_job(self, name: str, function: Callable, interval: float, policy: OverrunPolicy = OverrunPolicy.SKIP,
+                max_catch_up: int = 1, offset: float = 0):
+        """
+        Add a sample job, can be called while the poller runs
+        @param name:          unique job name
+        @param function:      called without arguments for every sample, the return value is kept in last_value
+        @param interval:      sample period in s
+        @param policy:        handling of missed deadlines, see OverrunPolicy
+        @param max_catch_up:  CATCH_UP: maximum number of missed samples that are queued
+        @param offset:        delay of the first sample after start() in s (to spread jobs of equal interval)
+        @return:
+        """
+        if interval <= 0:
+            raise ValueError(f"Invalid poll interval {interval}")
+        with self._lock:
+            if name in self._jobs:
+                raise ValueError(f"Poll job '{name}' already exists")
+            job = PollJob(name, function, interval, policy, max_catch_up, offset)
+            self._jobs[name] = job
+            if self._thread is not None:
+                job._start = self._clock() + offset
+                self._schedule(job)
+                self._wakeup.notify()
+
+    def remove_job(self, name: str):
+        with self._lock:
+            self._jobs.pop(name, None)  # queued deadlines of the job are dropped by the scheduler
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                logger.warning("Poller already running")
+                return
+            self._stop = False
+            self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="poller")
+            now = self._clock()
+            for job in self._jobs.values():
+                job._start = now + job.offset
+                job._index = 0
+                self._schedule(job)
+            self._thread = threading.Thread(target=self._scheduler, name="poller", daemon=True)
+            self._thread.start()
+
+    def stop(self, wait: bool = True):
+        """
+        Stop scheduling new samples
+        @param wait:  wait for the running samples to finish
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop = True
+            self._wakeup.notify()
+            thread, self._thread = self._thread, None
+        thread.join()
+        self._pool.shutdown(wait=wait)
+        with self._lock:
+            self._queue.clear()
+            for job in self._jobs.values():
+                job._backlog.clear()
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def get_stats(self) -> dict[str, PollStats]:
+        with self._lock:
+            return {name: job.get_stats() for name, job in self._jobs.items()}
+
+    def get_last_values(self) -> dict:
+        with self._lock:
+            return {name: job.last_value for name, job in self._jobs.items()}
+
+    def _schedule(self, job: PollJob):
+        self._sequence += 1
+        heapq.heappush(self._queue, (job.deadline(), self._sequence, job.name))
+
+    def _scheduler(self):
+        with self._lock:
+            while not self._stop:
+                if not self._queue:
+                    self._wakeup.wait()
+                    continue
+                deadline, _, name = self._queue[0]
+                remaining = deadline - self._clock()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                heapq.heappop(self._queue)
+                job = self._jobs.get(name)
+                if job is None or deadline != job.deadline():
+                    continue  # removed job
+                self._dispatch(job, deadline)
+                job._index += 1
+                if job.policy == OverrunPolicy.SKIP:
+                    # The scheduler itself was late (e.g. system suspend): skip to the next deadline in the future
+                    missed = math.floor((self._clock() - job.deadline()) / job.interval) + 1
+                    if missed > 0:
+                        job._index += missed
+                        job._skipped += missed
+                self._schedule(job)
+
+    def _dispatch(self, job: PollJob, deadline: float):
+        if not job._running:
+            job._running = True
+            self._pool.submit(self._run, job, deadline)
+            return
+        job._overruns += 1
+        if job.policy == OverrunPolicy.CATCH_UP and len(job._backlog) < job.max_catch_up:
+            job._backlog.append(deadline)
+        else:
+            job._skipped += 1
+
+    def _run(self, job: PollJob, deadline: float):
+        while True:
+            start = self._clock()
+            failed = False
+            try:
+                value = job.function()
+            except Exception as e:
+                logger.error(f"Poll job '{job.name}' failed: {e}")
+                value = None
+                failed = True
+            duration = self._clock() - start
+
+            with self._lock:
+                jitter = start - deadline
+                job.last_value = value
+                job._samples += 1
+                job._errors += failed
+                job._jitter_sum += jitter
+                job._jitter_sq_sum += jitter * jitter
+                job._jitter_max = max(job._jitter_max, jitter)
+                job._duration_sum += duration
+                job._duration_max = max(job._duration_max, duration)
+                if not job._backlog or self._stop:
+                    job._running = False
+                    return
+                deadline = job._backlog.popleft()
@@ -0,0 +1,83 @@
+from labequipment.device.PSU.PSU import PSU
+
+import time
+import logging
+
+logger = logging.getLogger('root')
+
+
+class StepResult:
+    """
+    Planned and actual time of one executed step (times in s relative to the start of the sequence)
+    """
+    __slots__ = ("planned", "actual", "voltage", "current")
+
+    def __init__(self, planned: float, actual: float, voltage: float | None, current: float | None):
+        self.planned = planned
+        self.actual = actual
+        self.voltage = voltage
+        self.current = current
+
+    @property
+    def error(self) -> float:
+        return self.actual - self.planned
+
+    def __repr__(self):
+        return f"StepResult(planned={self.planned}, actual={self.actual:.6f}, voltage={self.voltage}, current={self.current})"
+
+
+def run_step_sequence(psu: PSU, steps: list[tuple[float, float | None, float | None]], output_nr: int = 0,
+                      spin_time: float = 0.002) -> list[StepResult]:
+    """
+    Run a voltage / current profile on a PSU with host-side deadlines.
+    Each setpoint is pre-loaded with arm_step() right after the previous step, only the trigger (fire_step())
+    is sent at the deadline. Steps that can not be fired in time are fired late, never skipped.
+
+    Example:
+        run_step_sequence(psu, [(0, 5, 0.1), (0.5, 12, None), (1.5, 5, None)])
+
+    :param psu:        PSU to step
+    :param steps:      list of (time in s after start, voltage or None, current or None), sorted by time
+    :param output_nr:  output to step
+    :param spin_time:  the last part of the wait is busy-waiting for better timing (s)
+    :return:  list of StepResult, one per step
+    """
+    results: list[StepResult] = []
+    if not steps:
+        return results
+
+    psu.arm_step(steps[0][1], steps[0][2], output_nr)
+    start = time.perf_counter()
+    for idx, (planned, voltage, current) in enumerate(steps):
+        deadline = start + planned
+        remaining = deadline - time.perf_counter()
+        if remaining > spin_time:
+            time.sleep(remaining - spin_time)
+        while time.perf_counter() < deadline:
+            pass
+
+        psu.fire_step()
+        results.append(StepResult(planned, time.perf_counter() - start, voltage, current))
+
+        if idx + 1 < len(steps):
+            psu.arm_step(steps[idx + 1][1], steps[idx + 1][2], output_nr)
+
+    late = [r for r in results if r.error > spin_time]
+    if late:
+        logger.warning(f"{len(late)} of {len(results)} steps late, max. {max(r.error for r in late) * 1E3:.1f}ms")
+    return results
+
+
+def print_step_report(results: list[StepResult]):
+    """
+    Print planned versus actual step times
+    :param results:  result of run_step_sequence()
+    :return:
+    """
+    print(f"{'step':>4} {'planned [s]':>12} {'actual [s]':>12} {'error [ms]':>11} {'V':>8} {'A':>8}")
+    for idx, r in enumerate(results):
+        print(f"{idx:>4} {r.planned:>12.4f} {r.actual:>12.4f} {r.error * 1E3:>11.2f} "
+              f"{'' if r.voltage is None else r.voltage:>8} {'' if r.current is None else r.current:>8}")
+    if results:
+        errors = [abs(r.error) for r in results]
+        print(f"max. error: {max(errors) * 1E3:.2f}ms, mean error: {sum(errors) / len(errors) * 1E3:.2f}ms")
@@ -0,0 +1,149 @@
+"""
+Timing model of the instruments of a measurement plan
+
+The cost of a step is built from the driver timing attributes:
+    bus_write_time, bus_read_time   bus round trip (device), replaced by the latencies measured on the
+                                    connection as soon as enough transfers were made (answers to
+                                    measurements are not counted, see device._measurement_commands)
+    command_pacing                  minimum time between commands (device, e.g. OR-X 402A)
+    _default_speed_settings         NPLC and autozero (DMM), the configured values of a connected instrument
+                                    are used if known; integration time at GlobalDefaults.line_frequency
+    _reading_overhead               time per reading in addition to the integration (DMM)
+    _autorange_penalty              additional time of an autorange reading (DMM)
+    function_switch_time, range_switch_time     reconfiguration after a mode change (DMM)
+and the settling time of the plan steps.
+"""
+from labequipment.device.DMM.DMM import DMM
+from labequipment.device.device import device
+from labequipment.framework.globals import GlobalDefaults
+from labequipment.framework.registry import get_driver_class
+from labequipment.utils.measurement_plan import MeasurementPlan, PlanStep, compile_plan
+
+import logging
+
+logger = logging.getLogger('root')
+
+
+class TimingModel:
+    """
+    Time estimates per step of a plan, calibrated from connected instruments if given
+    """
+    min_latency_samples = 5  # measured latencies are used after this many transfers
+
+    def __init__(self, plan: MeasurementPlan, instruments: dict[str, device] | None = None):
+        """
+        :param plan:         measurement plan
+        :param instruments:  connected instruments by plan name (optional), their measured bus latencies and
+                             configured settings replace the driver defaults
+        """
+        instruments = {} if instruments is None else instruments
+        self._instruments: dict[str, device | type] = {}
+        self._write_time: dict[str, float] = {}
+        self._read_time: dict[str, float] = {}
+        for name, cfg in plan.instruments.items():
+            instrument = instruments.get(name, get_driver_class(cfg["driver"]))
+            self._instruments[name] = instrument
+            self._write_time[name] = instrument.bus_write_time
+            self._read_time[name] = instrument.bus_read_time
+            if isinstance(instrument, device):
+                self.calibrate(name, instrument)
+
+    def calibrate(self, name: str, instrument: device):
+        """
+        Use the latencies measured on the connection of <instrument> (if there are enough samples)
+        """
+        stats = instrument._connection.get_latency_stats()
+        write = stats.mean("write", self.min_latency_samples)
+        read = stats.mean("read", self.min_latency_samples)
+        if write is not None:
+            self._write_time[name] = write
+        if read is not None:
+            self._read_time[name] = read
+        logger.debug(f"Timing model '{name}': write {self._write_time[name] * 1E3:.2f}ms, "
+                     f"read {self._read_time[name] * 1E3:.2f}ms")
+
+    def command_time(self, name: str) -> float:
+        """
+        Time of one command to instrument <name> including the pacing
+        """
+        return max(self._write_time[name], self._instruments[name].command_pacing)
+
+    def round_trip_time(self, name: str) -> float:
+        return self.command_time(name) + self._read_time[name]
+
+    def switch_time(self, previous: tuple | None, step: PlanStep) -> float:
+        """
+        Reconfiguration time of a measurement from the mode (function, range) <previous>
+        """
+        instrument = self._instruments[step.instrument]
+        if previous is None or previous[0] != step.function:
+            return self.command_time(step.instrument) + instrument.function_switch_time
+        if previous[1] != step.meas_range:
+            return self.command_time(step.instrument) + instrument.range_switch_time
+        return 0
+
+    def reading_time(self, step: PlanStep) -> float:
+        instrument = self._instruments[step.instrument]
+        settings = instrument._default_speed_settings
+        nplc = instrument._nplc if instrument._nplc is not None else settings["nplc"]
+        autozero = instrument._autozero if instrument._autozero is not None else settings["autozero"]
+        integration = nplc / GlobalDefaults.line_frequency * (2 if autozero else 1)
+        overhead = instrument._reading_overhead
+        if step.meas_range == DMM.CONST_AUTO:
+            overhead += instrument._autorange_penalty
+        return step.count * (self.round_trip_time(step.instrument) + integration + overhead)
+
+    def setpoint_time(self, step: PlanStep) -> float:
+        commands = len([k for k in step.setpoint if k != "output_nr"])
+        return commands * self.command_time(step.instrument) + step.settle
+
+    def step_time(self, previous: tuple | None, step: PlanStep) -> float:
+        if step.is_measurement:
+            return self.switch_time(previous, step) + self.reading_time(step)
+        return self.setpoint_time(step)
+
+    def instrument_times(self, steps: list[PlanStep]) -> dict[str, float]:
+        """
+        Time spent per instrument when <steps> run in this order
+        """
+        per_instrument = dict.fromkeys(self._instruments, 0.0)
+        modes: dict[str, tuple] = {}
+        for step in steps:
+            per_instrument[step.instrument] += self.step_time(modes.get(step.instrument), step)
+            if step.is_measurement:
+                modes[step.instrument] = step.mode
+        return per_instrument
+
+
+class Prediction:
+    """
+    Result of predict(): duration of a plan and the time spent per instrument
+    """
+
+    def __init__(self, total: float, per_instrument: dict[str, float]):
+        self.total = total
+        self.per_instrument = per_instrument
+
+    @property
+    def bottleneck(self) -> str | None:
+        """
+        Instrument that takes the largest share of the plan duration
+        """
+        return max(self.per_instrument, key=self.per_instrument.get) if self.per_instrument else None
+
+    def __repr__(self):
+        return f"Prediction(total={self.total:.3f}s, bottleneck={self.bottleneck})"
+
+
+def predict(plan: MeasurementPlan, instruments: dict[str, device] | None = None, compiled: bool = True) -> Prediction:
+    """
+    Estimate the duration of a plan before it runs
+    :param plan:         measurement plan
+    :param instruments:  connected instruments by plan name, calibrate the model with their measured latencies
+    :param compiled:     True: predict the order of compile_plan(), False: the order as written
+    :return:  Prediction with total time, time per instrument and the bottleneck instrument
+    """
+    model = TimingModel(plan, instruments)
+    steps = compile_plan(plan, model).steps if compiled else plan.steps
+    per_instrument = model.instrument_times(steps)
+    return Prediction(sum(per_instrument.values()), per_instrument)
@@ -0,0 +1,97 @@
+import timeit
+from unittest import TestCase
+
+from labequipment.device.AWG.MARCONI_2019 import MARCONI_2019, ModFrequencies, decode_state_string
+
+# State string -> expected values (flags not listed are off)
+# Recorded from an instrument
+recorded_states = {
+    # Power-on state (as received on connect)
+    "010400000000000000000060210608020000000000": {
+        "carrier_frequency": 1040E6, "fm_deviation": 0, "am_mod_index": 0, "rf_level_dbm": -127.0,
+        "rf_level_log_unit": 6, "rf_level_lin_unit": 8, "mod_osc_freq": ModFrequencies.F1k0},
+}
+
+# Constructed from the field layout of the decoder, these only check that the layout round-trips and are no
+# substitute for recorded strings
+constructed_states = {
+    # 433.5 MHz, FM 2.5 kHz with ALC, -80 dBm, carrier on
+    "004335000000000250000530210608021010000100": {
+        "carrier_frequency": 433.5E6, "fm_deviation": 2.5E3, "rf_level_dbm": -80.0, "mod_osc_freq": ModFrequencies.F1k0,
+        "fm_on": True, "fm_alc_on": True, "carrier_on": True},
+    # 80 kHz, AM 85% external source with ALC, +13 dBm, 6 kHz oscillator, carrier on, external standard
+    "000000800000000000851460210007040001110110": {
+        "carrier_frequency": 80E3, "am_mod_index": 0.85, "rf_level_dbm": 13.0, "rf_level_log_unit": 0,
+        "rf_level_lin_unit": 7, "mod_osc_freq": ModFrequencies.F6k0,
+        "am_on": True, "ext_am_src": True, "am_alc_on": True, "carrier_on": True, "ext_std": True},
+}
+
+invalid_states = [
+    "",
+    None,
+    "DUMMY",
+    "01040000000000000000006021060802000000000",    # too short
+    "0104000000000000000000602106080200000000000",  # too long
+    "01040000000000000000006021060802000000000A",   # not numeric
+    "010400000000000000000060210608020000000002",   # flag not binary
+    "010400000000000000000060210608050000000000",   # mod. oscillator index out of range
+]
+
+flags = ("fm_on", "ext_fm_src", "fm_alc_on", "am_on", "ext_am_src", "am_alc_on", "pulse_mod_on", "carrier_on",
+         "ext_std", "offset_on")
+
+
+class TestStateString(TestCase):
+    def check_states(self, states: dict):
+        for state_str, expected in states.items():
+            state = decode_state_string(state_str)
+            self.assertIsNotNone(state, state_str)
+            for name, value in expected.items():
+                self.assertAlmostEqual(getattr(state, name), value, msg=f"{state_str}: {name}")
+            for name in flags:
+                self.assertEqual(getattr(state, name), expected.get(name, False), f"{state_str}: {name}")
+
+    def test_recorded(self):
+        self.check_states(recorded_states)
+
+    def test_constructed_round_trip(self):
+        self.check_states(constructed_states)
+
+    def test_invalid(self):
+        for state_str in invalid_states:
+            self.assertIsNone(decode_state_string(state_str), state_str)
+
+    def test_driver_state(self):
+        generator = MARCONI_2019()
+        generator.connect()
+        self.assertTrue(generator._decode_state_string("004335000000000250000530210608021010000100"))
+        self.assertEqual(generator.get_frequency(), 433.5E6)
+        self.assertEqual(generator.get_amplitude(), -80.0)
+        self.assertTrue(generator.get_output_state())
+        self.assertTrue(generator.get_alc())
+
+    def test_decode_benchmark(self):
+        n = 10000
+        corpus = list(recorded_states) + list(constructed_states)
+        duration = timeit.timeit(lambda: [decode_state_string(s) for s in corpus], number=n)
+        per_decode = duration / (n * len(corpus))
+        self.assertLess(per_decode, 100E-6)  # far below the GPIB transfer time of the string
+
+
+class TestHopList(TestCase):
+    def setUp(self):
+        self.generator = MARCONI_2019()
+        self.generator.connect()
+        self.generator._connection.clear_last_command_list()
+
+    def test_hop_list(self):
+        hop_list = self.generator.compile_hop_list([433.5E6, 433.525E6, 80E3])
+        self.assertEqual(hop_list.commands, ["CF 433.5 MZ", "CF 433.525 MZ", "CF 80.0 KZ"])
+        result = self.generator.run_hop_list(hop_list, dwell=0.005, callback=lambda idx, f: f, repeat=2)
+        self.assertEqual(self.generator._connection.get_last_commands_list(), hop_list.commands * 2)
+        self.assertEqual(result.values, hop_list.frequencies * 2)
+        self.assertEqual(len(result.dwell_times()), 5)
+        self.assertEqual(self.generator.get_frequency(), 80E3)
+
+    def test_out_of_range(self):
+        self.assertIsNone(self.generator.compile_hop_list([433.5E6, 2E9]))
@@ -132,3 +132,67 @@ class TestSetCommands(TestORX_402A_DUMMY):
         for i in waveforms.items():
             self.awg.set_waveform(i[0])
             self.assertEqual(self.awg._connection.get_last_command(), i[1])
+
+
+class TestWaitUntilReady(TestORX_402A_DUMMY):
+    def setUp(self):
+        super().setUp()
+        ORX_402A._learned_ready_time.clear()
+        self.awg.ready_delay = 0.01
+        self.awg.ready_poll_min = 0.001
+        self.awg.ready_timeout = 0.05
+        self.awg._connection.clear_last_command_list()
+
+    def tearDown(self):
+        ORX_402A._learned_ready_time.clear()
+
+    def test_probe_answered(self):
+        self.awg._connection.receive_data = lambda: "N0"
+        self.assertTrue(self.awg._wait_until_ready())
+        self.assertEqual(self.awg._connection.get_last_commands_list(), ["?N"])
+        self.assertEqual(ORX_402A._learned_ready_time[""], self.awg.ready_delay)
+        # Known to answer: probe right away on the next connect
+        self.assertTrue(self.awg._wait_until_ready())
+        self.assertEqual(self.awg._connection.get_last_commands_list(), ["?N", "?N"])
+        self.assertIsNotNone(ORX_402A._learned_ready_time[""])
+
+    def test_learned_time_stable(self):
+        self.awg._connection.receive_data = lambda: "N0"
+        self.assertTrue(self.awg._wait_until_ready())
+        learned = ORX_402A._learned_ready_time[""]
+        for _ in range(5):
+            # Ready at the first probe: no lower bound, the learned time must not shrink
+            self.assertTrue(self.awg._wait_until_ready())
+            self.assertEqual(ORX_402A._learned_ready_time[""], learned)
+
+    def test_learned_time_after_failed_probe(self):
+        ORX_402A._learned_ready_time[""] = 0.01
+        self.awg.ready_timeout = 1
+        replies = ["DUMMY", "N0"]
+        self.awg._connection.receive_data = lambda: replies.pop(0)
+        self.assertTrue(self.awg._wait_until_ready())
+        self.assertNotEqual(ORX_402A._learned_ready_time[""], 0.01)
+
+    def test_probe_never_answered(self):
+        self.assertTrue(self.awg._wait_until_ready())  # DummyConnection answers "DUMMY"
+        self.assertEqual(self.awg._connection.get_last_commands_list(), ["?N"])
+        self.assertIsNone(ORX_402A._learned_ready_time[""])
+        # Fixed delay without probes on the next connect
+        self.assertTrue(self.awg._wait_until_ready())
+        self.assertEqual(self.awg._connection.get_last_commands_list(), ["?N"])
+
+
+class TestShadowFrequency(TestORX_402A_DUMMY):
+    def test_frequency_in_hertz(self):
+        self.awg.set_frequency(9870)
+        self.assertEqual(self.awg.get_frequency(), 9870)
+        self.assertEqual(self.awg._shadow["frequency"], ("F9.87KHZ", 9870))
+
+    def test_verify_khz(self):
+        self.awg.set_frequency(9870)
+        self.awg.set_shadow_verify(True)
+        self.awg._connection.receive_data = lambda: "F9.87KHZ"
+        self.awg._connection.clear_last_command_list()
+        self.awg.set_frequency(9870)
+        # Device matches the shadow state: only the verify query is sent
+        self.assertEqual(self.awg._connection.get_last_commands_list(), ["?F"])
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from labequipment.device.DMM.DMM import MeasFunction, SpeedProfile, acdc
+from labequipment.device.DMM.HP34401A import HP34401A
+
+
+class TestHP34401A_DUMMY(TestCase):
+    def setUp(self):
+        self.dmm = HP34401A()
+        self.dmm._connection.connect()  # connect() needs an *IDN? answer, only open the dummy connection
+        self.dmm._ok = True
+
+    def test_nplc_not_for_frequency(self):
+        self.dmm.configure_function(MeasFunction.FREQ)
+        self.dmm.configure_nplc(1)
+        self.assertEqual(self.dmm._connection.get_last_commands_list(), ["CONF:FREQ DEF"])
+
+    def test_speed_profile_restores_known_settings(self):
+        self.dmm.configure_function(MeasFunction.DCV, 10)
+        self.dmm.configure_nplc(1)
+        self.dmm._connection.clear_last_command_list()
+        with self.dmm.speed_profile(SpeedProfile.MAX_SPEED):
+            pass
+        # Autozero and display are queried, the dummy answers can not be parsed: defaults after reset
+        self.assertEqual(self.dmm._connection.get_last_commands_list(),
+                         ["ZERO:AUTO?", "DISP?", "VOLT:DC:NPLC 0.02", "ZERO:AUTO OFF", "DISP OFF", "VOLT:DC:NPLC 1",
+                          "ZERO:AUTO ON", "DISP ON"])
+
+    def test_speed_profile_after_connect(self):
+        connection = self.dmm._connection
+        answers = {"VOLT:DC:NPLC?": "+1.00000000E+01", "ZERO:AUTO?": "1", "DISP?": "1"}
+        connection.receive_data = lambda: answers.get(connection.get_last_command())
+        with self.dmm.speed_profile(SpeedProfile.MAX_SPEED):
+            pass
+        self.assertEqual(connection.get_last_commands_list(),
+                         ["VOLT:DC:NPLC?", "ZERO:AUTO?", "DISP?", "VOLT:DC:NPLC 0.02", "ZERO:AUTO OFF", "DISP OFF",
+                          "VOLT:DC:NPLC 10.0", "ZERO:AUTO ON", "DISP ON"])
+
+    def test_ac_filter_after_configure(self):
+        self.dmm.configure_function(MeasFunction.ACV, 10)
+        self.dmm.configure_ac_filter(1000)
+        self.dmm.configure_function(MeasFunction.DCV, 10)
+        self.dmm.configure_function(MeasFunction.ACV, 10)
+        self.dmm.configure_ac_filter(1000)  # CONF reset the filter: sent again
+        self.assertEqual(self.dmm._connection.get_last_commands_list(),
+                         ["CONF:VOLT:AC 10", "DET:BAND 200", "CONF:VOLT:DC 10", "CONF:VOLT:AC 10", "DET:BAND 200"])
+
+    def test_ac_filter_after_meas(self):
+        self.dmm._connection.receive_data = lambda: "+1.0E-01"
+        self.dmm.configure_ac_filter(1000)
+        self.dmm.voltage(acdc.AC, 10)
+        self.dmm.configure_ac_filter(1000)
+        self.assertEqual(self.dmm._connection.get_last_commands_list(),
+                         ["DET:BAND 200", "MEAS:VOLT:AC? 10", "DET:BAND 200"])
+
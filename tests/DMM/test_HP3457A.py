@@ -1,9 +1,11 @@
 import os
+import threading
 from unittest import TestCase
 from dotenv import load_dotenv
 
 from labequipment.device.DMM import HP3457A
-from labequipment.device.DMM.HP3457A import TriggerType, Terminals, acdc, ErrorCodes
+from labequipment.device.DMM.HP3457A import TriggerType, Terminals, acdc, ErrorCodes, MathOperation
+from labequipment.device.DMM.DMM import MeasFunction, SpeedProfile
 from tests.testutils import ask_user_if_ok
 from labequipment.framework.log import setup_custom_logger
 setup_custom_logger()
@@ -112,6 +114,28 @@ class TestSetCommands(TestHP3457A_DUMMY):
         sent_commands = self.dmm._connection.get_last_commands_list()
         self.assertEqual(sent_commands, ["DCV", "TRIG 3"])
 
+    def test_shadow_state(self):
+        self.dmm.voltage()
+        self.dmm.voltage()
+        self.dmm.invalidate_shadow()
+        self.dmm.voltage()
+        sent_commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(sent_commands, ["DCV", "TRIG 3", "TRIG 3", "DCV", "TRIG 3"])
+
+    def test_query_cache(self):
+        self.dmm.get_impedance_fixed()
+        self.dmm.get_impedance_fixed()
+        self.dmm.configure_impedance(fixed=True)
+        self.dmm.get_impedance_fixed()
+        sent_commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(sent_commands, ["FIXEDZ?", "FIXEDZ 1", "FIXEDZ?"])
+        self.assertEqual(self.dmm.get_query_cache_stats()["get_impedance_fixed"], {"hits": 1, "misses": 2})
+
+    def test_error_codes_not_cached(self):
+        self.dmm.get_error_codes()
+        self.dmm.get_error_codes()  # ERR? clears the error register, every call has to ask the instrument
+        self.assertEqual(self.dmm._connection.get_last_commands_list(), ["ERR?", "ERR?"])
+
     def test_configure_voltage(self):
         self.dmm.configure_voltage(ac_dc_mode=acdc.DC, meas_range=self.dmm.CONST_AUTO, res=self.dmm.CONST_AUTO)
         self.dmm.configure_voltage(ac_dc_mode=acdc.DC, meas_range=10, res=1)
@@ -146,3 +170,96 @@ class TestSetCommands(TestHP3457A_DUMMY):
     def test_configure_nplc(self):
         self.dmm.configure_nplc(1)
         self.assertEqual(self.dmm._connection.get_last_command(), "NPLC 1")
+
+    def test_speed_profile(self):
+        self.dmm.configure_nplc(1)
+        with self.dmm.speed_profile(SpeedProfile.MAX_SPEED, MeasFunction.DCV, meas_range=10):
+            self.assertEqual(self.dmm.get_nplc(), 0.0005)
+        commands = self.dmm._connection.get_last_commands_list()
+        # Autozero can not be read from the dummy and display has no query: restored to the defaults after reset
+        self.assertEqual(commands, ["NPLC 1", "AZERO?", "DCV 10", "NPLC 0.0005", "AZERO 0", "DISP 0",
+                                    "NPLC 1", "AZERO 1", "DISP 1"])
+
+    def test_speed_profile_after_connect(self):
+        connection = self.dmm._connection
+        connection.receive_data = lambda: {"NPLC?": "+1.0E+00", "AZERO?": "0"}.get(connection.get_last_command())
+        with self.dmm.speed_profile(SpeedProfile.MAX_SPEED):
+            pass
+        # Nothing configured yet: NPLC and autozero are queried and restored
+        self.assertEqual(connection.get_last_commands_list(),
+                         ["NPLC?", "AZERO?", "NPLC 0.0005", "AZERO 0", "DISP 0", "NPLC 1.0", "DISP 1"])
+
+    def test_stream(self):
+        with self.dmm.stream(MeasFunction.DCV, count=3) as stream:
+            readings = list(stream)
+        self.assertEqual(readings, [])  # Dummy answers can not be converted, stream stops after first block
+        commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(commands, ["DCV", "NRDGS 3,AUTO", "MEM FIFO", "TRIG 3", "RMEM 1,3",
+                                    "MEM OFF", "NRDGS 1,AUTO", "TRIG 4"])
+
+    def test_stream_readings(self):
+        self.dmm.stream_block_size = 2
+        self.dmm._connection.receive_data = lambda: "1.5,2.5"
+        locked_in_other_thread = []
+        readings = []
+        with self.dmm.stream(MeasFunction.DCV, rate=100, count=3) as stream:
+            for t, v in stream:
+                thread = threading.Thread(target=lambda: locked_in_other_thread.append(self.dmm._lock.acquire(False)))
+                thread.start()
+                thread.join()
+                readings.append((t, v))
+        self.assertEqual([v for _, v in readings], [1.5, 2.5, 1.5])
+        self.assertAlmostEqual(readings[1][0] - readings[0][0], 0.01)
+        self.assertEqual(locked_in_other_thread, [False] * 3)  # no other commands between the blocks
+        self.assertTrue(self.dmm._lock.acquire(False))
+        self.dmm._lock.release()
+        commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(commands, ["DCV", "TIMER 0.01", "NRDGS 2,TIMER", "MEM FIFO", "TRIG 3", "RMEM 1,2",
+                                    "NRDGS 1,TIMER", "MEM FIFO", "TRIG 3", "RMEM 1,1",
+                                    "MEM OFF", "NRDGS 1,AUTO", "TRIG 4"])
+
+    def test_stream_break(self):
+        self.dmm._connection.receive_data = lambda: "1.5,2.5"
+        with self.dmm.stream(MeasFunction.DCV) as stream:
+            for _ in stream:
+                break  # endless stream, the generator is not closed
+        # Leaving the with block ends the stream and releases the instrument
+        released = []
+        thread = threading.Thread(target=lambda: released.append(self.dmm._lock.acquire(False)))
+        thread.start()
+        thread.join()
+        self.assertEqual(released, [True])
+        self.assertEqual(self.dmm._connection.get_last_commands_list()[-3:], ["MEM OFF", "NRDGS 1,AUTO", "TRIG 4"])
+        self.assertEqual(list(stream), [])  # no readings after the end of the stream
+
+    def test_configure_scan(self):
+        self.dmm.configure_scan([0, 1, 5], scans=2)
+        self.dmm.configure_scan([10])  # invalid channel
+        commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(commands, ["TERM 2", "DCV", "SLIST 0,1,5", "NRDGS 6,AUTO"])
+
+    def test_voltage_after_scan(self):
+        self.dmm.configure_scan([0, 1])
+        self.dmm._connection.receive_data = lambda: "+1.0E+00,+2.0E+00"
+        self.dmm.scan()
+        self.dmm._connection.receive_data = lambda: "+1.5E+00"
+        self.dmm._connection.clear_last_command_list()
+        self.assertEqual(self.dmm.voltage(), 1.5)
+        self.dmm.voltage()
+        # The scan list is removed before the single reading (front terminals), only once
+        commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(commands, ["SLIST", "MEM OFF", "NRDGS 1,AUTO", "TERM 1", "TRIG 3", "TRIG 3"])
+
+    def test_configure_math(self):
+        self.dmm.configure_scale(scale=2, offset=0.5)
+        self.dmm.configure_math(MathOperation.NULL, MathOperation.STAT)
+        commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(commands, ["SMATH SCALE,2", "SMATH OFFSET,0.5", "MATH SCALE", "MATH NULL,STAT"])
+
+    def test_subprogram(self):
+        self.dmm.define_measurement_mode("FASTDCV", MeasFunction.DCV, meas_range=10, nplc=0.005, autozero=False)
+        self.dmm.define_measurement_mode("FASTDCV", MeasFunction.DCV, meas_range=10, nplc=0.005, autozero=False)
+        self.dmm.call_subprogram("FASTDCV")
+        self.dmm.call_subprogram("UNKNOWN")
+        commands = self.dmm._connection.get_last_commands_list()
+        self.assertEqual(commands, ["SUB FASTDCV;DCV 10;NPLC 0.005;AZERO 0;SUBEND", "CALL FASTDCV"])
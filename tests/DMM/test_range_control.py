@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from labequipment.device.DMM.range_control import AdaptiveRangeController, RANGE_AUTO
+
+
+class TestAdaptiveRangeController(TestCase):
+    def setUp(self):
+        self.controller = AdaptiveRangeController([0.03, 0.3, 3, 30, 300], window=3)
+
+    def feed(self, readings: list[float]):
+        for r in readings:
+            self.controller.update(r, overload=abs(r) > 1E37)
+
+    def test_lock_after_window(self):
+        self.feed([1.2, 1.2])
+        self.assertEqual(self.controller.get_range(), RANGE_AUTO)
+        self.feed([1.2])
+        self.assertEqual(self.controller.get_range(), 3)
+
+    def test_range_up_and_down_with_hysteresis(self):
+        self.feed([1.2, 1.2, 1.2, 2.9])
+        self.assertEqual(self.controller.get_range(), 30)
+        self.feed([0.27, 0.27, 0.27])  # fits into 0.3 but not with hysteresis
+        self.assertEqual(self.controller.get_range(), 3)
+        self.feed([0.2, 0.2, 0.2])
+        self.assertEqual(self.controller.get_range(), 0.3)
+
+    def test_overload_falls_back_to_autorange(self):
+        self.feed([1.2, 1.2, 1.2, 1E38])
+        self.assertEqual(self.controller.get_range(), RANGE_AUTO)
+        self.assertEqual(self.controller.get_metrics()["overloads"], 1)
@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from labequipment.device.PSU.HP6632B import HP6632B, ArrayFunction, AcqTriggerSource, AcqTriggerSlope
+
+
+class TestHP6632B_DUMMY(TestCase):
+    def setUp(self):
+        self.psu = HP6632B()
+        self.psu._connection.connect()  # connect() needs an *IDN? answer, only open the dummy connection
+        self.psu._ok = True
+
+    def answer(self, reply: str):
+        self.psu._connection.receive_data = lambda: reply
+
+
+class TestMeasureAll(TestHP6632B_DUMMY):
+    def test_compound_query(self):
+        self.answer("+4.99870E+00;+1.00120E-01;1024;2")
+        reading = self.psu.measure_all()
+        # Voltage and current of the same acquisition
+        self.assertEqual(self.psu._connection.get_last_command(),
+                         "MEAS:VOLT?;:FETC:CURR?;:STAT:OPER:COND?;:STAT:QUES:COND?")
+        self.assertEqual((reading.voltage, reading.current), (4.9987, 0.10012))
+        self.assertEqual((reading.cv, reading.cc, reading.ov, reading.ocp), (False, True, False, True))
+
+    def test_cv(self):
+        self.answer("+1.20000E+01;+5.0E-03;256;0")
+        reading = self.psu.measure_all()
+        self.assertEqual((reading.cv, reading.cc, reading.ov, reading.ocp), (True, False, False, False))
+
+    def test_invalid_answer(self):
+        for reply in ["DUMMY", "+1.0;+2.0;256", None]:
+            self.answer(reply)
+            reading = self.psu.measure_all()
+            self.assertEqual((reading.voltage, reading.current), (-1, -1))
+            self.assertFalse(reading.valid)
+
+
+class TestDigitizer(TestHP6632B_DUMMY):
+    def test_capture_array(self):
+        self.answer("+3.12000E-05")  # interval applied by the instrument
+        self.psu.configure_acquisition(points=3, interval=30E-6, pre_trigger=1)
+        self.answer("+1.0E-03,+2.0E-03,+3.0E-03")
+        times, values = self.psu.capture_array(ArrayFunction.CURRENT)
+        self.assertEqual(self.psu._connection.get_last_commands_list(),
+                         ["SENS:SWE:POIN 3;TINT 3e-05;OFFS:POIN -1", "SENS:SWE:TINT?",
+                          'SENS:FUNC "CURR"', "INIT:NAME ACQ", "TRIG:ACQ", "FETC:ARR:CURR?"])
+        self.assertEqual(list(values), [1E-3, 2E-3, 3E-3])
+        # Time axis relative to the trigger with the applied interval, one sample before the trigger
+        for t, expected in zip(times, [-31.2E-6, 0, 31.2E-6]):
+            self.assertAlmostEqual(t, expected)
+
+    def test_interval_fallback(self):
+        self.psu.configure_acquisition(points=2, interval=40E-6)  # "DUMMY" answer: rounded locally
+        self.answer("1,2")
+        times, _ = self.psu.measure_array(ArrayFunction.VOLTAGE)
+        self.assertEqual(self.psu._connection.get_last_command(), "MEAS:ARR:VOLT?")
+        self.assertAlmostEqual(times[1], 3 * self.psu.acq_interval_min)
+
+    def test_invalid_configuration(self):
+        self.psu.configure_acquisition(points=5000)
+        self.psu.configure_acquisition(points=10, pre_trigger=11)
+        self.psu.configure_acquisition(interval=1E-6)
+        self.assertEqual(self.psu._connection.get_last_commands_list(), [])
+
+    def test_internal_trigger(self):
+        self.psu.configure_acquisition_trigger(AcqTriggerSource.INTERNAL, ArrayFunction.VOLTAGE, level=2.5,
+                                               slope=AcqTriggerSlope.NEGATIVE, hysteresis=0.1)
+        self.assertEqual(self.psu._connection.get_last_commands_list(),
+                         ["TRIG:SEQ2:SOUR INT", "TRIG:SEQ2:LEV:VOLT 2.5;SLOP:VOLT NEG;HYST:VOLT 0.1"])
+
+    def test_invalid_array(self):
+        self.answer("1,2,x")
+        times, values = self.psu.fetch_array()
+        self.assertEqual((len(times), len(values)), (0, 0))
+
+
+class TestStep(TestHP6632B_DUMMY):
+    def test_arm_and_fire(self):
+        self.psu.arm_step(5, 0.1)
+        self.assertEqual(self.psu.get_voltage(), 0)  # not applied before the trigger
+        self.psu.fire_step()
+        self.assertEqual(self.psu._connection.get_last_commands_list(),
+                         ["TRIG:SOUR BUS", "VOLT:TRIG 5;:CURR:TRIG 0.1;:INIT", "*TRG"])
+        self.assertEqual((self.psu.get_voltage(), self.psu.get_current()), (5, 0.1))
+        self.assertEqual(self.psu._armed_step, (None, None, 0))
+
+    def test_trigger_source_sent_once(self):
+        self.psu.arm_step(voltage=1)
+        self.psu.fire_step()
+        self.psu.arm_step(voltage=2)
+        self.assertEqual(self.psu._connection.get_last_commands_list(),
+                         ["TRIG:SOUR BUS", "VOLT:TRIG 1;:INIT", "*TRG", "VOLT:TRIG 2;:INIT"])
+        self.assertEqual(self.psu.get_current(), 0)
+
+    def test_disarm(self):
+        self.psu.disarm_step()  # nothing armed: no command
+        self.psu.arm_step(current=0.2)
+        self.psu.disarm_step()
+        self.assertEqual(self.psu._connection.get_last_commands_list(),
+                         ["TRIG:SOUR BUS", "CURR:TRIG 0.2;:INIT", "ABOR"])
+        self.assertEqual(self.psu.get_current(), 0)
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from labequipment.device.PSU.dummyPSU import dummyPSU
+from labequipment.framework import exceptions
+
+
+class TestDummyPSU(TestCase):
+    def setUp(self):
+        self.psu = dummyPSU(output_states=[False, False, False], get_measured_currents=[0.1], count_type=1)
+        self.psu.connect()
+        self.assertEqual(self.psu.get_ok(), True)
+
+    def test_bulk_set_and_measure(self):
+        self.psu.set_voltages([1.0, 2.0, 3.0])
+        self.psu.set_currents([0.5, 0.5, 1.0])
+        self.psu.enable_outputs([True, False, True])
+        voltages, currents = self.psu.measure_outputs()
+        self.assertEqual(list(voltages), [1.0, 0.0, 3.0])
+        self.assertEqual(list(currents), [0.1, 0.1, 0.1])
+        self.assertEqual(self.psu.get_current(3), 1.0)
+
+    def test_single_output(self):
+        self.psu.set_voltage(5, 2)
+        self.psu.enable_output(2)
+        self.assertEqual(self.psu.get_measured_voltage(2), 5)
+        self.assertEqual(self.psu.measure_all(2).voltage, 5)
+        with self.assertRaises(exceptions.InvalidDeviceParameter):
+            self.psu.get_voltage(0)
+
+    def test_arm_and_fire(self):
+        self.psu.arm_step(voltage=2.5, output_nr=3)
+        self.assertEqual(self.psu.get_voltage(3), 0)
+        self.psu.fire_step()
+        self.assertEqual(self.psu.get_voltage(3), 2.5)
+        self.assertEqual(self.psu.get_current(3), 0)
+        self.psu.fire_step()  # nothing armed
+        self.assertEqual(self.psu.get_voltage(3), 2.5)
+
+    def test_wrong_count(self):
+        self.psu.set_voltages([1.0])
+        self.assertEqual(self.psu.get_voltage(1), 0)
@@ -54,3 +54,20 @@ class TestHP8954A_INTERACTIVE(TestHP8954A):
         self.switch.rf_monitor_select(HP8954A.RFMon.Mon1)
         print("RF monitor 1 selected")
         self.assertEqual(ask_user_if_ok(), True)
+
+
+class TestRelayMask(TestCase):
+    def setUp(self):
+        self.switch = HP8954A()
+        self.switch.connect()
+        self.switch._connection.clear_last_command_list()
+
+    def test_set_multiple_relays(self):
+        pattern = {rly: idx % 2 == 0 for idx, rly in enumerate(HP8954A.relay_names)}
+        self.switch.set_multiple_relays(pattern)
+        self.switch.set_multiple_relays(pattern)
+        self.switch.set_multiple_relays({1: True, 2: True, 'a': False})
+        self.assertEqual(self.switch._connection.get_last_commands_list(),
+                         ["V1U2V3U4V5U6V7U8V9UAVBUCVDUEVFUG", "V2"])
+        self.assertEqual(self.switch.aux_relays['C'], False)
+        self.assertEqual(self.switch.aux_relays[2], True)
@@ -0,0 +1,52 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from labequipment.framework.handshake_cache import HandshakeCache
+
+resource = "USB::0x03eb::0x2065::GPIB_22::INSTR"
+identity = "HEWLETT-PACKARD,6632B,0,A.01.05"
+
+
+class TestHandshakeCache(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sub", "handshake_cache.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit(self):
+        HandshakeCache(self.path).store(resource, identity, state={"display_normal": True})
+        entry = HandshakeCache(self.path).get(resource)  # reloaded from disk
+        self.assertEqual(entry["identity"], identity)
+        self.assertEqual(entry["state"], {"display_normal": True})
+        self.assertIsNone(HandshakeCache(self.path).get("USB::other::INSTR"))
+
+    def test_invalidate(self):
+        cache = HandshakeCache(self.path)
+        cache.store(resource, identity)
+        cache.invalidate(resource)
+        self.assertIsNone(cache.get(resource))
+        self.assertIsNone(HandshakeCache(self.path).get(resource))
+
+    def test_identity_change(self):
+        cache = HandshakeCache(self.path)
+        cache.store(resource, identity, adaptor={"read_term": "lf"}, state={"display_normal": False})
+        cache.store(resource, "HEWLETT-PACKARD,6632B,0,A.01.06")  # firmware changed: old settings are dropped
+        entry = cache.get(resource)
+        self.assertEqual(entry["adaptor"], {})
+        self.assertEqual(entry["state"], {})
+
+    def test_write_only_on_change(self):
+        cache = HandshakeCache(self.path)
+        cache.store(resource, identity, state={"display_normal": True})
+        mtime = os.stat(self.path).st_mtime_ns
+        os.utime(self.path, ns=(0, 0))
+        cache.store(resource, identity, state={"display_normal": True})
+        cache.update_state(resource, {"display_normal": False})
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)  # state updates are written by flush()
+        cache.flush()
+        self.assertNotEqual(os.stat(self.path).st_mtime_ns, 0)
+        self.assertGreaterEqual(os.stat(self.path).st_mtime_ns, mtime)
+        self.assertEqual(HandshakeCache(self.path).get(resource)["state"], {"display_normal": False})
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from labequipment.framework.readingbuffer import ReadingBuffer, FLAG_OVERLOAD
+
+
+class TestReadingBuffer(TestCase):
+    def setUp(self):
+        self.buffer = ReadingBuffer(capacity=4)
+        for i in range(3000):
+            self.buffer.append(float(i), i * 0.5, channel=i % 3)
+
+    def test_growth(self):
+        self.assertEqual(len(self.buffer), 3000)
+        self.assertEqual(self.buffer.capacity() % ReadingBuffer.chunk_size, 0)
+        self.assertEqual(self.buffer[2999], (2999.0, 1499.5, 2, 0))
+
+    def test_view_survives_growth(self):
+        view = self.buffer[10:12]
+        for i in range(5000):
+            self.buffer.append(0, 0, flags=FLAG_OVERLOAD)
+        self.assertEqual(list(view), [(10.0, 5.0, 1, 0), (11.0, 5.5, 2, 0)])
+
+    def test_extend_from_stream(self):
+        buffer = ReadingBuffer()
+        buffer.extend([(1.0, 2.0), (3.0, 4.0)], channel=7)
+        self.assertEqual(list(buffer.channels), [7, 7])
+        self.assertEqual(list(buffer.values), [2.0, 4.0])
+
+    def test_clear_keeps_capacity(self):
+        capacity = self.buffer.capacity()
+        view = self.buffer[0:2]
+        self.buffer.clear()
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.capacity(), capacity)
+        self.assertEqual(list(view), [(0.0, 0.0, 0, 0), (1.0, 0.5, 1, 0)])
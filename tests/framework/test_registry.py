@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+from labequipment.framework.registry import Bench, available_drivers, get_driver_class
+
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+bench_dict = {
+    "adaptors": {"gpib0": {"transport": "dummy", "address": "GPIB0"}},
+    "instruments": {
+        "dmm": {"driver": "HP3457A", "adaptor": "gpib0"},
+        "generator": {"driver": "MARCONI_2019", "adaptor": "gpib0"},
+        "psu": {"driver": "dummyPSU", "options": {"output_states": [False, False], "count_type": 1}},
+    },
+}
+
+
+class TestRegistry(TestCase):
+    def test_lazy_import(self):
+        """Importing the registry and reading a bench must not import any driver module"""
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys\nfrom labequipment.framework.registry import Bench\n"
+                                   "Bench({'instruments': {'dmm': {'driver': 'HP3457A'}}})\n"
+                                   "print(','.join(m for m in sys.modules if m.startswith('labequipment.device')))"],
+            cwd=repo_root, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_drivers(self):
+        self.assertIn("HP6632B", available_drivers())
+        self.assertEqual(get_driver_class("dummyPSU").__name__, "dummyPSU")
+        with self.assertRaises(ValueError):
+            get_driver_class("HP9999")
+
+    def test_bench(self):
+        bench = Bench(bench_dict)
+        self.assertEqual(bench.connected(), {})
+        psu = bench["psu"]
+        self.assertTrue(psu.get_ok())
+        self.assertEqual(psu.num_outputs, 2)
+        self.assertIs(bench["psu"], psu)
+        self.assertEqual(list(bench.connected()), ["psu"])
+        bench.close()
+
+    def test_shared_transport(self):
+        bench = Bench(bench_dict)
+        dmm = bench["dmm"]
+        generator = bench["generator"]
+        self.assertIs(dmm._connection, generator._connection)
+        self.assertIs(dmm._lock, generator._lock)
+        self.assertIsNot(dmm._connection, bench["psu"]._connection)
+        bench.close()
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Bench({"instruments": {"dmm": {"driver": "HP3457A", "adaptor": "missing"}}})
+        with self.assertRaises(ValueError):
+            Bench({"instruments": {"dmm": {"driver": "HP3457A", "transport": "telnet", "address": "x"}}})
+        with self.assertRaises(ValueError):
+            # No driver supports serial connections yet
+            Bench({"instruments": {"psu": {"driver": "HP6632B", "transport": "serial", "address": "/dev/ttyUSB0"}}})
+        with self.assertRaises(ValueError):
+            # One USBTMC resource is one instrument
+            resource = "USB::0x03eb::0x2065::GPIB_22_42231343530351E0D1A0::INSTR"
+            Bench({"adaptors": {"gpib22": {"address": resource}},
+                   "instruments": {"dmm": {"driver": "HP3457A", "adaptor": "gpib22"},
+                                   "psu": {"driver": "HP6632B", "adaptor": "gpib22"}}})
+        with self.assertRaises(KeyError):
+            Bench(bench_dict).get("missing")
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+driver_module = "labequipment.device.DMM.HP34401A"
+import_budget_us = 150000  # cumulative import time of the driver module in microseconds
+backend_modules = ["telnetlib", "usbtmc", "usb", "serial"]
+
+
+def _run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=repo_root, capture_output=True, text=True, check=True)
+
+
+class TestImportTime(TestCase):
+    def test_no_backend_imported(self):
+        """Importing a driver (dummy backend only) must not pull in any transport backend"""
+        result = _run_python("-c", f"import sys, {driver_module}; "
+                                   f"print(','.join(m for m in {backend_modules} if m in sys.modules))")
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_import_time_budget(self):
+        """Use 'python -X importtime' to check the cumulative import time of a driver against the budget"""
+        result = _run_python("-X", "importtime", "-c", f"import {driver_module}")
+        cumulative_us = None
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == driver_module:
+                cumulative_us = int(fields[1])
+        self.assertIsNotNone(cumulative_us)
+        self.assertLess(cumulative_us, import_budget_us)
@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+from labequipment.device.AWG.MARCONI_2019 import MARCONI_2019
+from labequipment.device.DMM.HP34401A import HP34401A
+from labequipment.utils.freq_response import frequency_response
+
+
+class TestFrequencyResponse(TestCase):
+    def setUp(self):
+        self.dmm = HP34401A()
+        self.dmm._connection.connect()  # connect() needs an *IDN? answer, only open the dummy connection
+        self.dmm._ok = True
+        self.awg = MARCONI_2019()
+        self.awg._connection.connect()
+        self.awg._ok = True
+
+    def test_order(self):
+        self.dmm._connection.receive_data = lambda: "+1.0E-01"
+        result = frequency_response(self.awg, self.dmm, [1E6, 1E5], meas_range=10, settle_periods=0)
+        # Function first, then the filter, readings with READ? (MEAS? would reset the filter)
+        self.assertEqual(self.dmm._connection.get_last_commands_list(),
+                         ["CONF:VOLT:AC 10", "DET:BAND 200", "READ?", "READ?"])
+        self.assertEqual(list(result.magnitudes), [0.1, 0.1])
@@ -0,0 +1,70 @@
+import math
+from unittest import TestCase
+
+from labequipment.device.DMM.DMM import MeasFunction
+from labequipment.device.DMM.HP34401A import HP34401A
+from labequipment.device.DMM.HP3457A import HP3457A
+from labequipment.device.PSU.HP6632B import HP6632B
+from labequipment.device.PSU.dummyPSU import dummyPSU
+from labequipment.utils.iv_sweep import iv_sweep
+
+
+class TestIVSweep(TestCase):
+    def setUp(self):
+        self.psu = dummyPSU(output_states=[False], get_voltages=[1.5], get_currents=[0.5], count_type=0)
+        self.psu.connect()
+        self.dmm = HP3457A()
+        self.dmm.connect()
+        self.dmm._connection.receive_data = lambda: "+1.0E+00"
+
+    def test_sweep(self):
+        result = iv_sweep(self.psu, [self.dmm], [1.0, 2.0, 3.0], current_limit=0.1)
+        self.assertEqual(list(result["setpoint"]), [1.0, 2.0, 3.0])
+        self.assertEqual(list(result["psu_voltage"]), [1.0, 2.0, 3.0])
+        self.assertEqual(list(result["dmm0"]), [1.0, 1.0, 1.0])
+        self.assertFalse(any(result["compliance"]))
+
+    def test_output_restored(self):
+        iv_sweep(self.psu, [self.dmm], [1.0, 2.0], current_limit=0.1)
+        self.assertFalse(self.psu.get_output_state(0))
+        self.assertEqual((self.psu.get_voltage(0), self.psu.get_current(0)), (1.5, 0.5))
+
+    def test_output_restored_on_error(self):
+        def fail():
+            raise RuntimeError("no reading")
+        self.dmm._connection.receive_data = fail
+        with self.assertRaises(RuntimeError):
+            iv_sweep(self.psu, [self.dmm], [1.0, 2.0], current_limit=0.1)
+        self.assertFalse(self.psu.get_output_state(0))
+        self.assertEqual(self.psu._armed_step, (None, None, 0))
+        self.assertEqual(self.psu.get_voltage(0), 1.5)
+
+    def test_stop_on_compliance(self):
+        self.psu._cc_status[0] = True
+        self.psu.enable_output(0)
+        result = iv_sweep(self.psu, [self.dmm], [1.0, 2.0, 3.0], current_limit=0.1, stop_on_compliance=True)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(self.psu._armed_step, (None, None, 0))  # next setpoint was staged
+        self.assertTrue(self.psu.get_output_state(0))  # was enabled before the sweep
+        self.assertEqual(self.psu.get_voltage(0), 1.5)
+
+    def test_unsupported_function(self):
+        dmm = HP34401A()  # measure() of this driver has no frequency readings
+        with self.assertRaises(ValueError):
+            iv_sweep(self.psu, [self.dmm, dmm], [1.0], current_limit=0.1,
+                     functions=[MeasFunction.OHM, MeasFunction.FREQ])
+        with self.assertRaises(ValueError):
+            iv_sweep(self.psu, [self.dmm], [1.0], current_limit=0.1, functions=[])
+        self.assertFalse(self.psu.get_output_state(0))
+        self.assertEqual(self.psu.get_current(0), 0.5)
+
+    def test_failed_readback(self):
+        psu = HP6632B()
+        psu._connection.connect()
+        psu._ok = True  # the dummy answers "DUMMY": every readback fails
+        result = iv_sweep(psu, [self.dmm], [1.0, 2.0], current_limit=0.5, stop_on_compliance=True)
+        self.assertEqual(len(result), 2)  # not stopped: a failed readback is no compliance
+        self.assertFalse(any(result["compliance"]))
+        self.assertTrue(all(math.isnan(v) for v in result["psu_voltage"]))
+        self.assertTrue(all(math.isnan(i) for i in result["psu_current"]))
+        self.assertEqual(list(result["dmm0"]), [1.0, 1.0])
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from labequipment.device.DMM.HP3457A import HP3457A
+from labequipment.device.PSU.dummyPSU import dummyPSU
+from labequipment.framework.registry import Bench
+from labequipment.utils.measurement_plan import MeasurementPlan, compile_plan, run_schedule
+from labequipment.utils.timing_model import predict
+
+plan_dict = {
+    "instruments": {"psu": {"driver": "dummyPSU"}, "dmm": {"driver": "HP3457A"}},
+    "steps": [
+        {"name": "5v", "instrument": "psu", "set": {"voltage": 5.0, "output": True}},
+        {"name": "vout", "instrument": "dmm", "measure": "DCV", "range": 30},
+        {"name": "r_load", "instrument": "dmm", "measure": "OHM"},
+        {"name": "vref", "instrument": "dmm", "measure": "DCV", "range": 3},
+        {"name": "vout2", "instrument": "dmm", "measure": "DCV", "range": 30},
+        {"name": "12v", "instrument": "psu", "set": {"voltage": 12.0}},
+        {"name": "vout_12", "instrument": "dmm", "measure": "DCV", "range": 30},
+        {"name": "r_ref", "instrument": "dmm", "measure": "OHM", "after": []},
+    ],
+}
+
+
+class TestMeasurementPlan(TestCase):
+    def setUp(self):
+        self.plan = MeasurementPlan.from_dict(plan_dict)
+        self.schedule = compile_plan(self.plan)
+
+    def test_order(self):
+        order = [s.name for s in self.schedule.steps]
+        self.assertEqual(order, ["r_ref", "5v", "r_load", "vout", "vout2", "vref", "12v", "vout_12"])
+        self.assertLess(self.schedule.mode_switches(), self.schedule.mode_switches(self.plan.steps))
+        self.assertLess(self.schedule.predict(), self.schedule.predict(self.plan.steps))
+
+    def test_setpoint_barrier(self):
+        order = [s.name for s in self.schedule.steps]
+        for name in ["vout", "r_load", "vref", "vout2"]:
+            self.assertLess(order.index("5v"), order.index(name))
+            self.assertLess(order.index(name), order.index("12v"))
+
+    def test_run(self):
+        psu = dummyPSU(output_states=[False], count_type=0)
+        dmm = HP3457A()
+        psu.connect()
+        dmm.connect()
+        results = run_schedule(self.schedule, {"psu": psu, "dmm": dmm}, verbose=False)
+        self.assertEqual(set(results), {"vout", "r_load", "vref", "vout2", "vout_12", "r_ref"})
+        self.assertEqual(psu.get_voltage(0), 12.0)
+        self.assertIsNotNone(self.schedule.actual_time)
+
+    def test_predict(self):
+        self.assertAlmostEqual(self.schedule.predict(), predict(self.plan).total)
+        self.assertAlmostEqual(self.schedule.predict(self.plan.steps), predict(self.plan, compiled=False).total)
+
+    def test_run_closes_bench(self):
+        benches = []
+
+        class RecordingBench(Bench):
+            def __init__(self, description):
+                super().__init__(description)
+                benches.append(self)
+
+        with patch("labequipment.utils.measurement_plan.Bench", RecordingBench):
+            results = run_schedule(self.schedule, verbose=False)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(len(benches), 1)
+        self.assertEqual(benches[0].connected(), {})
@@ -0,0 +1,83 @@
+import time
+from unittest import TestCase
+
+from labequipment.utils.poller import OverrunPolicy, PeriodicPoller
+
+
+class FakeClock:
+    """
+    Clock of the poller that only advances when the test sets it
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def wait_for(condition, timeout: float = 1.0) -> bool:
+    t_end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > t_end:
+            return False
+        time.sleep(1E-3)
+    return True
+
+
+class TestPeriodicPoller(TestCase):
+    def test_fixed_rate(self):
+        poller = PeriodicPoller()
+        instants = []
+        # The sample takes 60% of the interval: a sleep(interval) loop would run at 1/1.6 of the rate (~19 samples)
+        poller.add_job("fast", lambda: instants.append(time.monotonic()) or time.sleep(0.012), interval=0.02)
+        poller.start()
+        time.sleep(0.6)
+        poller.stop()
+        self.assertGreaterEqual(poller.get_stats()["fast"].samples, 25)  # 30 deadlines, margin for a loaded machine
+
+    def test_no_drift(self):
+        clock = FakeClock()
+        interval = 0.02
+        instants = []
+        poller = PeriodicPoller(clock=clock)
+        poller.add_job("job", lambda: instants.append(clock()), interval=interval)
+        poller.start()
+        for k in range(10):
+            # Each sample runs at t_0 + k * interval, the execution time of the previous sample does not add up
+            clock.now = k * interval
+            self.assertTrue(wait_for(lambda: len(instants) == k + 1), f"sample {k} not run")
+            self.assertLess(abs(instants[k] - k * interval), 1E-9)
+            clock.now += 0.6 * interval  # execution time of the sample
+            time.sleep(2 * interval)  # the scheduler waits at most <interval> (real time) before it checks again
+            self.assertEqual(len(instants), k + 1, f"sample {k + 1} before its deadline")
+        poller.stop()
+        stats = poller.get_stats()["job"]
+        self.assertEqual((stats.samples, stats.skipped, stats.overruns), (10, 0, 0))
+
+    def test_slow_job_isolated(self):
+        poller = PeriodicPoller()
+        poller.add_job("slow", lambda: time.sleep(0.05), interval=0.02, policy=OverrunPolicy.SKIP)
+        poller.add_job("fast", lambda: 1, interval=0.01)
+        poller.start()
+        time.sleep(0.3)
+        poller.stop()
+        stats = poller.get_stats()
+        self.assertGreater(stats["slow"].overruns, 0)
+        self.assertGreater(stats["slow"].skipped, 0)
+        self.assertGreaterEqual(stats["fast"].samples, 20)  # 30 deadlines, margin for a loaded machine
+        self.assertEqual(stats["fast"].overruns, 0)
+        self.assertEqual(poller.get_last_values()["fast"], 1)
+
+    def test_catch_up(self):
+        poller = PeriodicPoller()
+        durations = [0.05] + [0] * 100
+        poller.add_job("job", lambda: time.sleep(durations.pop(0)), interval=0.01, policy=OverrunPolicy.CATCH_UP,
+                       max_catch_up=10)
+        poller.start()
+        time.sleep(0.2)
+        poller.stop()
+        stats = poller.get_stats()["job"]
+        self.assertGreater(stats.overruns, 0)
+        self.assertEqual(stats.skipped, 0)
+        self.assertGreater(stats.jitter_max, 0.03)  # the missed samples ran late
@@ -0,0 +1,63 @@
+import io
+import time
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from labequipment.device.PSU.dummyPSU import dummyPSU
+from labequipment.utils.step_sequence import print_step_report, run_step_sequence
+
+
+class RecordingPSU(dummyPSU):
+    """dummyPSU that records the arm / fire calls, arm_step takes <arm_time> s"""
+    def __init__(self, arm_time: float = 0):
+        super().__init__(output_states=[False], count_type=0)
+        self.arm_time = arm_time
+        self.calls = []
+
+    def arm_step(self, voltage=None, current=None, output_nr=0):
+        self.calls.append(("arm", voltage, current))
+        time.sleep(self.arm_time)
+        super().arm_step(voltage, current, output_nr)
+
+    def fire_step(self):
+        self.calls.append(("fire",))
+        super().fire_step()
+
+
+class TestStepSequence(TestCase):
+    def setUp(self):
+        self.psu = RecordingPSU()
+        self.psu.connect()
+
+    def test_order(self):
+        results = run_step_sequence(self.psu, [(0, 5, 0.1), (0.02, 12, None), (0.04, None, 0.5)])
+        self.assertEqual(self.psu.calls, [("arm", 5, 0.1), ("fire",), ("arm", 12, None), ("fire",),
+                                          ("arm", None, 0.5), ("fire",)])
+        self.assertEqual(self.psu.get_voltage(0), 12)
+        self.assertEqual(self.psu.get_current(0), 0.5)
+
+        self.assertEqual([r.planned for r in results], [0, 0.02, 0.04])
+        self.assertEqual([(r.voltage, r.current) for r in results], [(5, 0.1), (12, None), (None, 0.5)])
+        for r in results:
+            self.assertGreaterEqual(r.actual, r.planned)
+
+    def test_empty(self):
+        self.assertEqual(run_step_sequence(self.psu, []), [])
+        self.assertEqual(self.psu.calls, [])
+
+    def test_late(self):
+        self.psu.arm_time = 0.05
+        with self.assertLogs('root', level='WARNING') as logs:
+            results = run_step_sequence(self.psu, [(0, 5, None), (0.01, 6, None), (0.02, 7, None)])
+        self.assertEqual(len(results), 3)
+        self.assertGreater(results[1].error, 0.03)
+        self.assertIn("2 of 3 steps late", logs.output[0])
+        self.assertEqual(self.psu.get_voltage(0), 7)
+
+    def test_report(self):
+        results = run_step_sequence(self.psu, [(0, 5, None), (0.01, None, 0.2)])
+        with redirect_stdout(io.StringIO()) as out:
+            print_step_report(results)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[-1].startswith("max. error:"))
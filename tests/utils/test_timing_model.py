@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from labequipment.device.DMM.HP3457A import HP3457A
+from labequipment.utils.measurement_plan import MeasurementPlan
+from labequipment.utils.timing_model import TimingModel, predict
+
+plan_dict = {
+    "instruments": {"psu": {"driver": "dummyPSU"}, "dmm": {"driver": "HP3457A"}},
+    "steps": [
+        {"name": "5v", "instrument": "psu", "set": {"voltage": 5.0, "output": True}, "settle": 0.1},
+        {"name": "vout", "instrument": "dmm", "measure": "DCV", "range": 30, "count": 10},
+        {"name": "r_load", "instrument": "dmm", "measure": "OHM"},
+        {"name": "vout2", "instrument": "dmm", "measure": "DCV", "range": 30},
+    ],
+}
+
+
+class TestTimingModel(TestCase):
+    def setUp(self):
+        self.plan = MeasurementPlan.from_dict(plan_dict)
+
+    def test_predict(self):
+        prediction = predict(self.plan)
+        self.assertEqual(prediction.bottleneck, "dmm")
+        self.assertAlmostEqual(prediction.total, sum(prediction.per_instrument.values()))
+        # 12 readings at 10 NPLC with autozero
+        self.assertGreater(prediction.per_instrument["dmm"], 12 * 2 * 10 / 50)
+        self.assertLess(prediction.total, predict(self.plan, compiled=False).total)
+
+    def test_calibration(self):
+        dmm = HP3457A()
+        dmm.connect()
+        for _ in range(TimingModel.min_latency_samples):
+            dmm.send_command("END ALWAYS")
+            dmm.receive_data()
+        model = TimingModel(self.plan, {"dmm": dmm})
+        self.assertLess(model.round_trip_time("dmm"), HP3457A.bus_write_time + HP3457A.bus_read_time)
+        self.assertEqual(model.round_trip_time("psu"), TimingModel(self.plan).round_trip_time("psu"))
+
+    def test_measurement_reads_not_calibrated(self):
+        dmm = HP3457A()
+        dmm.connect()
+        stats = dmm._connection.get_latency_stats()
+        stats.clear()
+        dmm._connection.receive_data = lambda: "+1.0E+00"
+        for _ in range(TimingModel.min_latency_samples):
+            dmm.voltage()  # the answer includes the integration time
+        self.assertIsNone(stats.get("read"))
+        self.assertIsNotNone(stats.get("write"))
+        dmm.send_command("NPLC?")
+        dmm.receive_data()
+        self.assertEqual(stats.get("read")["count"], 1)